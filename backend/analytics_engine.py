@@ -0,0 +1,120 @@
+"""Vectorized time-series insights over a user's daily totals.
+
+The daily series comes from the day rollups (one document per active day), is
+loaded into a pandas frame indexed by calendar day, and every statistic is a
+column operation on that frame. numpy/pandas are imported on first use so the
+API worker does not pay for them at startup.
+"""
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from categories import CATEGORY_VALUES
+
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+SERIES = CATEGORY_VALUES + ("net",)
+
+
+class InsightsCache:
+    """Per-user LRU of computed insights, valid for one calendar day or until the
+    user writes through this worker."""
+
+    def __init__(self, maxsize: int = 2048):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, Tuple[str, Dict[int, dict]]]" = OrderedDict()
+
+    def get(self, user_id: str, day: str, horizon: int) -> Optional[dict]:
+        entry = self._entries.get(user_id)
+        if entry is None or entry[0] != day:
+            return None
+        self._entries.move_to_end(user_id)
+        return entry[1].get(horizon)
+
+    def put(self, user_id: str, day: str, horizon: int, value: dict):
+        entry = self._entries.get(user_id)
+        if entry is None or entry[0] != day:
+            entry = (day, {})
+            self._entries[user_id] = entry
+        entry[1][horizon] = value
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str):
+        self._entries.pop(user_id, None)
+
+
+def daily_frame(rollups: List[dict], first: date, last: date):
+    """Frame of sales/purchase/expense/net per calendar day in [first, last]; missing days are 0."""
+    import pandas as pd
+
+    index = pd.date_range(first, last, freq="D")
+    if rollups:
+        frame = pd.DataFrame.from_records(rollups, columns=["start", *CATEGORY_VALUES])
+        frame.index = pd.to_datetime(frame.pop("start"))
+        frame = frame.reindex(index, fill_value=0.0).fillna(0.0)
+    else:
+        frame = pd.DataFrame(0.0, index=index, columns=list(CATEGORY_VALUES))
+    frame["net"] = frame["sales"] - frame["purchase"] - frame["expense"]
+    return frame.astype(float)
+
+
+def _round(values) -> List[float]:
+    return [round(float(v), 2) for v in values]
+
+
+def compute_insights(rollups: List[dict], today: date, lookback_days: int = 365, horizon: int = 14) -> dict:
+    import numpy as np
+
+    first = today - timedelta(days=lookback_days - 1)
+    frame = daily_frame(rollups, first, today)
+
+    ma7 = frame.rolling(7, min_periods=1).mean()
+    ma30 = frame.rolling(30, min_periods=1).mean()
+    recent = frame.tail(90)
+
+    # Week over week: the last 7 days against the 7 before them.
+    this_week = frame.iloc[-7:].sum()
+    last_week = frame.iloc[-14:-7].sum()
+    growth = ((this_week - last_week) / last_week.abs().replace(0, np.nan) * 100).round(2)
+
+    # Weekday seasonality: each weekday's mean relative to the overall daily mean.
+    weekday_means = frame.groupby(frame.index.dayofweek).mean().reindex(range(7), fill_value=0.0)
+    overall = frame.mean().replace(0, np.nan)
+    seasonality = (weekday_means / overall).fillna(1.0).round(3)
+
+    # Cash-flow forecast: linear trend over the last 90 days plus the weekday offset.
+    x = np.arange(len(recent), dtype=float)
+    slope, intercept = np.polyfit(x, recent["net"].to_numpy(), 1) if len(recent) > 1 else (0.0, float(recent["net"].mean()))
+    future_x = np.arange(len(recent), len(recent) + horizon, dtype=float)
+    future_days = [today + timedelta(days=i) for i in range(1, horizon + 1)]
+    weekday_offset = (recent["net"].groupby(recent.index.dayofweek).mean() - recent["net"].mean()).reindex(range(7), fill_value=0.0)
+    forecast = slope * future_x + intercept + weekday_offset.to_numpy()[[d.weekday() for d in future_days]]
+
+    return {
+        "as_of": today.isoformat(),
+        "lookback_days": lookback_days,
+        "moving_averages": {
+            "dates": [d.date().isoformat() for d in frame.index[-30:]],
+            **{f"{name}_ma7": _round(ma7[name].iloc[-30:]) for name in SERIES},
+            **{f"{name}_ma30": _round(ma30[name].iloc[-30:]) for name in SERIES},
+        },
+        "week_over_week": {
+            name: {
+                "this_week": round(float(this_week[name]), 2),
+                "last_week": round(float(last_week[name]), 2),
+                "growth_pct": None if np.isnan(growth[name]) else float(growth[name]),
+            }
+            for name in SERIES
+        },
+        "weekday_seasonality": {
+            name: dict(zip(WEEKDAYS, (float(v) for v in seasonality[name]))) for name in SERIES
+        },
+        "forecast": {
+            "method": "linear trend over last 90 days + weekday offset",
+            "trend_per_day": round(float(slope), 2),
+            "dates": [d.isoformat() for d in future_days],
+            "net": _round(forecast),
+            "cumulative_net": _round(np.cumsum(forecast)),
+        },
+    }
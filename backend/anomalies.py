@@ -0,0 +1,141 @@
+"""Running per-user statistics of daily totals, for flagging unusual days.
+
+For every user and category `daily_stats` keeps n (days with activity), the
+sum of daily totals and the sum of their squares. Each transaction write moves
+one day's total from T - a to T, so the moments change by a and T² - (T - a)²,
+which are applied with a single `$inc`: O(1) per write, atomic, and exact under
+concurrent writers because the day rollup update that returns T is itself
+serialized per document.
+
+To score a day, its own total is taken back out of the moments, and the
+remaining days give the mean and standard deviation it is compared against.
+"""
+import math
+import os
+from typing import Dict, Iterable, List, Optional
+
+from pymongo import UpdateOne
+
+from categories import CATEGORY_VALUES
+
+Z_THRESHOLD = float(os.environ.get('ANOMALY_Z_THRESHOLD', '3.0'))
+# The sample standard deviation needs at least two other days.
+MIN_DAYS = max(2, int(os.environ.get('ANOMALY_MIN_DAYS', '7')))
+
+
+def stats_increment(category: str, amount: float, new_total: float, new_count: int, count_delta: int) -> dict:
+    """`$inc` for daily_stats after a day's `category` total moved by `amount` to `new_total`."""
+    previous_total = new_total - amount
+    inc = {
+        f"{category}.sum": amount,
+        f"{category}.sumsq": new_total * new_total - previous_total * previous_total,
+    }
+    if count_delta > 0 and new_count == count_delta:
+        inc[f"{category}.n"] = 1
+    elif count_delta < 0 and new_count == 0:
+        inc[f"{category}.n"] = -1
+    return inc
+
+
+async def apply_day_change(db, user_id: str, category: str, amount: float, day_rollup: dict, count_delta: int):
+    await db.daily_stats.update_one(
+        {"user_id": user_id},
+        {"$inc": stats_increment(category, amount, day_rollup.get(category, 0), day_rollup.get(f"count_{category}", 0), count_delta)},
+        upsert=True,
+    )
+
+
+async def apply_day_changes(db, changes: Iterable[tuple]):
+    """apply_day_change for many (user_id, category, amount, day_rollup, count_delta)
+    at once: one `$inc` per user, in one bulk write."""
+    per_user: Dict[str, dict] = {}
+    for user_id, category, amount, day_rollup, count_delta in changes:
+        inc = per_user.setdefault(user_id, {})
+        new_total, new_count = day_rollup.get(category, 0), day_rollup.get(f"count_{category}", 0)
+        for field, value in stats_increment(category, amount, new_total, new_count, count_delta).items():
+            inc[field] = inc.get(field, 0) + value
+    if per_user:
+        await db.daily_stats.bulk_write(
+            [UpdateOne({"user_id": user_id}, {"$inc": inc}, upsert=True) for user_id, inc in per_user.items()],
+            ordered=False,
+        )
+
+
+async def read_stats(db, user_id: str) -> dict:
+    return await db.daily_stats.find_one({"user_id": user_id}, {"_id": 0}) or {}
+
+
+def score_day(stats: dict, day_rollup: dict) -> List[dict]:
+    """Anomalies on one day: categories whose total is more than Z_THRESHOLD
+    standard deviations from the user's other active days."""
+    flags = []
+    for category in CATEGORY_VALUES:
+        moments = stats.get(category) or {}
+        count = day_rollup.get(f"count_{category}", 0)
+        if not count:
+            continue
+        total = day_rollup.get(category, 0)
+        n = moments.get("n", 0) - 1
+        if n < MIN_DAYS:
+            continue
+        rest_sum = moments.get("sum", 0) - total
+        rest_sumsq = moments.get("sumsq", 0) - total * total
+        mean = rest_sum / n
+        variance = max((rest_sumsq - n * mean * mean) / (n - 1), 0.0)
+        std = math.sqrt(variance)
+        if std == 0:
+            continue
+        z = (total - mean) / std
+        if abs(z) >= Z_THRESHOLD:
+            flags.append({
+                "date": day_rollup.get("period") or day_rollup.get("start"),
+                "category": category,
+                "amount": round(total, 2),
+                "mean": round(mean, 2),
+                "std": round(std, 2),
+                "z": round(z, 2),
+                "direction": "high" if z > 0 else "low",
+            })
+    return flags
+
+
+def score_days(stats: dict, day_rollups: List[dict]) -> List[dict]:
+    return [flag for rollup in day_rollups for flag in score_day(stats, rollup)]
+
+
+def describe(flags: List[dict]) -> Optional[str]:
+    """One line per anomaly, for the daily report prompt."""
+    if not flags:
+        return None
+    return "\n".join(
+        f"- {f['category'].title()} ₹{f['amount']:,.2f} is {abs(f['z']):.1f}σ {'above' if f['z'] > 0 else 'below'} "
+        f"the usual ₹{f['mean']:,.2f}"
+        for f in flags
+    )
+
+
+def build_daily_stats(day_rollups: Iterable[dict]) -> List[dict]:
+    """daily_stats documents, one per user, from that user's day rollups."""
+    stats: Dict[str, dict] = {}
+    for rollup in day_rollups:
+        doc = stats.setdefault(rollup["user_id"], {"user_id": rollup["user_id"]})
+        for category in CATEGORY_VALUES:
+            if rollup.get(f"count_{category}", 0) <= 0:
+                continue
+            total = rollup.get(category, 0)
+            moments = doc.setdefault(category, {"n": 0, "sum": 0.0, "sumsq": 0.0})
+            moments["n"] += 1
+            moments["sum"] += total
+            moments["sumsq"] += total * total
+    return list(stats.values())
+
+
+async def rebuild_daily_stats(db, user_id: str = None):
+    """Recompute daily_stats from the day rollups (all users, or one)."""
+    match = {"granularity": "day"}
+    if user_id:
+        match["user_id"] = user_id
+    docs = build_daily_stats(await db.rollups.find(match, {"_id": 0}).to_list(None))
+    await db.daily_stats.delete_many({"user_id": user_id} if user_id else {})
+    if docs:
+        await db.daily_stats.insert_many(docs, ordered=False)
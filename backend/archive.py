@@ -0,0 +1,228 @@
+"""Cold storage for old transactions.
+
+Transactions older than ARCHIVE_AFTER_DAYS are moved out of the database into
+one zstd-compressed Parquet file per user and month
+(ARCHIVE_DIR/<user_id>/<YYYY-MM>.parquet), so the live collection and its
+indexes hold only the recent data nearly every read touches. Nothing about
+the totals changes: rollups keep counting archived transactions, rebuilds
+add the archive's daily totals back in, and search merges archived matches
+into its pages.
+
+Run the job from one process (cron), never from every web worker:
+
+    python archive.py --older-than-days 365
+"""
+import argparse
+import asyncio
+import logging
+import os
+import re
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from categories import CATEGORY_VALUES
+from search import search_tokens
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ["id", "user_id", "category", "amount", "description", "date", "created_at", "version"]
+SAFE_USER_ID = re.compile(r"[A-Za-z0-9_-]+")
+MONTH_FILE = re.compile(r"\d{4}-\d{2}\.parquet")
+
+
+class TransactionArchive:
+    """Per-user, per-month Parquet partitions. Methods block; call them from a thread."""
+
+    def __init__(self, root: Path, compression: str = "zstd"):
+        self.root = Path(root)
+        self.compression = compression
+        self._newest: Dict[str, tuple] = {}
+
+    @classmethod
+    def from_env(cls, root_dir: Path) -> "TransactionArchive":
+        return cls(Path(os.environ.get('ARCHIVE_DIR') or root_dir / 'archive'))
+
+    def user_dir(self, user_id: str) -> Path:
+        if not SAFE_USER_ID.fullmatch(user_id):
+            raise ValueError(f"Cannot archive user id {user_id!r}")
+        return self.root / user_id
+
+    def months(self, user_id: str) -> List[str]:
+        """Archived months ("YYYY-MM"), oldest first."""
+        if not SAFE_USER_ID.fullmatch(user_id):
+            return []
+        directory = self.user_dir(user_id)
+        if not directory.is_dir():
+            return []
+        return sorted(path.stem for path in directory.iterdir() if MONTH_FILE.fullmatch(path.name))
+
+    def users(self) -> List[str]:
+        if not self.root.is_dir():
+            return []
+        return sorted(path.name for path in self.root.iterdir() if path.is_dir() and SAFE_USER_ID.fullmatch(path.name))
+
+    def write(self, user_id: str, month: str, docs: List[dict]):
+        """Add `docs` to the month's partition. Rows already archived (same id)
+        are kept once, so re-running after a crash between write and delete is safe."""
+        import pandas as pd
+
+        path = self.user_dir(user_id) / f"{month}.parquet"
+        frame = pd.DataFrame.from_records(docs).reindex(columns=COLUMNS)
+        if path.exists():
+            frame = pd.concat([pd.read_parquet(path), frame], ignore_index=True)
+        frame = frame.drop_duplicates("id", keep="first").sort_values(["date", "id"], ignore_index=True)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        frame.to_parquet(tmp, compression=self.compression, index=False)
+        os.replace(tmp, path)
+
+    def read(self, user_id: str, months: Optional[Iterable[str]] = None, columns: Optional[List[str]] = None):
+        import pandas as pd
+
+        months = self.months(user_id) if months is None else months
+        directory = self.user_dir(user_id)
+        frames = [pd.read_parquet(directory / f"{month}.parquet", columns=columns) for month in months]
+        if not frames:
+            return pd.DataFrame(columns=columns or COLUMNS)
+        return pd.concat(frames, ignore_index=True)
+
+    def newest_date(self, user_id: str) -> Optional[str]:
+        """Latest archived `date`; live rows newer than this cannot be in the archive.
+
+        Cached per newest file and its mtime, since the job runs in another process."""
+        months = self.months(user_id)
+        if not months:
+            return None
+        stamp = (months[-1], (self.user_dir(user_id) / f"{months[-1]}.parquet").stat().st_mtime_ns)
+        cached = self._newest.get(user_id)
+        if cached is None or cached[0] != stamp:
+            cached = (stamp, self.read(user_id, months[-1:], ["date"])["date"].max())
+            self._newest[user_id] = cached
+        return cached[1]
+
+    def daily_totals(self, user_id: Optional[str] = None) -> List[dict]:
+        """(user_id, day, category, total, count) rows, as rollups.build_rollups takes them."""
+        rows = []
+        for uid in [user_id] if user_id else self.users():
+            frame = self.read(uid, columns=["date", "category", "amount"])
+            frame = frame[frame["category"].isin(CATEGORY_VALUES)]
+            if frame.empty:
+                continue
+            frame["day"] = frame["date"].str.slice(0, 10)
+            grouped = frame.groupby(["day", "category"])["amount"].agg(["sum", "count"]).reset_index()
+            rows.extend(
+                {"user_id": uid, "day": row.day, "category": row.category, "total": float(row.sum), "count": int(row.count)}
+                for row in grouped.itertuples(index=False)
+            )
+        return rows
+
+    def search(self, user_id: str, criteria, limit: int) -> List[dict]:
+        """Archived matches for a storage.TransactionFilter, (date, id) descending.
+
+        Months are read newest first and reading stops once `limit` matches are
+        found: every row of an older month sorts after every row of a newer one."""
+        import pandas as pd
+
+        months = [
+            month for month in self.months(user_id)
+            if (not criteria.date_from or month >= criteria.date_from[:7])
+            and (not criteria.date_before or month <= criteria.date_before[:7])
+            and (not criteria.after or month <= criteria.after[0][:7])
+        ]
+        pages, found = [], 0
+        for month in reversed(months):
+            if found >= limit:
+                break
+            page = matching(self.read(user_id, [month]), criteria)
+            pages.append(page)
+            found += len(page)
+        if not pages:
+            return []
+        frame = pd.concat(pages, ignore_index=True).sort_values(["date", "id"], ascending=False).head(limit)
+        return [to_doc(record) for record in frame.to_dict("records")]
+
+
+def matching(frame, criteria):
+    """Rows of `frame` that satisfy a storage.TransactionFilter."""
+    keep = frame["date"].notna()
+    if criteria.category:
+        keep &= frame["category"] == criteria.category
+    if criteria.date_from:
+        keep &= frame["date"] >= criteria.date_from
+    if criteria.date_before:
+        keep &= frame["date"] < criteria.date_before
+    if criteria.amount_min is not None:
+        keep &= frame["amount"] >= criteria.amount_min
+    if criteria.amount_max is not None:
+        keep &= frame["amount"] <= criteria.amount_max
+    if criteria.after:
+        date_value, transaction_id = criteria.after
+        keep &= (frame["date"] < date_value) | ((frame["date"] == date_value) & (frame["id"] < transaction_id))
+    frame = frame[keep]
+    if criteria.tokens:
+        wanted = set(criteria.tokens)
+        frame = frame[frame["description"].map(lambda text: wanted.issubset(search_tokens(text)))]
+    return frame
+
+
+def to_doc(record: dict) -> dict:
+    """A Parquet row back in the shape the API returns (no NaN for missing values)."""
+    doc = {key: (None if value != value else value) for key, value in record.items()}
+    doc["amount"] = float(doc["amount"])
+    if doc.get("version") is not None:
+        doc["version"] = int(doc["version"])
+    return doc
+
+
+def merge_pages(live: List[dict], archived: List[dict], limit: int) -> List[dict]:
+    return sorted(live + archived, key=lambda doc: (doc["date"], doc["id"]), reverse=True)[:limit]
+
+
+async def archive_transactions(store, archive: TransactionArchive, before: date, batch_size: int = 5000) -> int:
+    """Move every transaction dated before `before` into the archive; returns how many."""
+    moved = 0
+    for user_id in await store.transactions.user_ids():
+        if not SAFE_USER_ID.fullmatch(user_id):
+            logger.warning("Not archiving transactions of user id %r: not usable as a directory name", user_id)
+            continue
+        while True:
+            docs = await store.transactions.older_than(user_id, before.isoformat(), batch_size)
+            if not docs:
+                break
+            by_month = defaultdict(list)
+            for doc in docs:
+                by_month[doc["date"][:7]].append(doc)
+            await asyncio.to_thread(lambda: [archive.write(user_id, month, rows) for month, rows in by_month.items()])
+            await store.transactions.delete_many(user_id, [doc["id"] for doc in docs])
+            moved += len(docs)
+    return moved
+
+
+async def main(argv=None):
+    from dotenv import load_dotenv
+
+    root_dir = Path(__file__).parent
+    load_dotenv(root_dir / '.env')
+    # After load_dotenv: storage's imports read their settings at import time.
+    from storage import create_storage
+
+    parser = argparse.ArgumentParser(description="Move old transactions to Parquet.")
+    parser.add_argument("--older-than-days", type=int, default=int(os.environ.get('ARCHIVE_AFTER_DAYS', '365')))
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    store = create_storage(root_dir)
+    await store.open()
+    try:
+        before = datetime.now(timezone.utc).date() - timedelta(days=args.older_than_days)
+        moved = await archive_transactions(store, store.archive, before, args.batch_size)
+        logger.info("Archived %d transactions dated before %s", moved, before)
+    finally:
+        await store.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
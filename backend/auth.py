@@ -0,0 +1,108 @@
+"""Stateless access tokens.
+
+Login issues an HS256 JWT whose `sub` is the user id. Every other API call
+verifies it in-process against a small key set read once from the
+environment, so authenticating a request costs an HMAC and no database round
+trip. AUTH_SIGNING_KEYS holds `kid:secret` pairs separated by commas. The
+first pair signs new tokens and all of them verify, so keys rotate by adding
+a new key in front and dropping the old one once its tokens have expired.
+"""
+import os
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Optional
+
+import jwt
+from fastapi import HTTPException, WebSocketException, status
+from starlette.requests import HTTPConnection
+
+ALGORITHM = "HS256"
+MIN_SECRET_LENGTH = 32
+ACCESS_TOKEN_TTL = int(os.environ.get('ACCESS_TOKEN_TTL', str(12 * 3600)))
+
+
+@dataclass(frozen=True)
+class KeySet:
+    signing_kid: str
+    keys: Dict[str, bytes]
+
+    @classmethod
+    def parse(cls, spec: str) -> "KeySet":
+        keys = {}
+        for entry in spec.split(","):
+            kid, sep, secret = entry.strip().partition(":")
+            if not sep or not kid or not secret:
+                raise ValueError("AUTH_SIGNING_KEYS entries must look like kid:secret")
+            if len(secret) < MIN_SECRET_LENGTH:
+                raise ValueError(f"AUTH_SIGNING_KEYS secret for '{kid}' is shorter than {MIN_SECRET_LENGTH} characters")
+            keys[kid] = secret.encode()
+        return cls(next(iter(keys)), keys)
+
+
+@lru_cache(maxsize=1)
+def key_set() -> KeySet:
+    spec = os.environ.get('AUTH_SIGNING_KEYS', '')
+    if not spec:
+        # A per-process random key would make every worker reject the others' tokens.
+        raise RuntimeError("AUTH_SIGNING_KEYS is not set; see backend/.env for the kid:secret format")
+    return KeySet.parse(spec)
+
+
+def issue_token(user_id: str, ttl: int = ACCESS_TOKEN_TTL) -> str:
+    keys = key_set()
+    now = int(time.time())
+    return jwt.encode(
+        {"sub": user_id, "iat": now, "exp": now + ttl},
+        keys.keys[keys.signing_kid], algorithm=ALGORITHM, headers={"kid": keys.signing_kid},
+    )
+
+
+def verify_token(token: str) -> str:
+    """The user id in a valid token; 401 for anything else."""
+    keys = key_set()
+    try:
+        key = keys.keys.get(jwt.get_unverified_header(token).get("kid"))
+        if key is None:
+            raise jwt.InvalidTokenError("unknown kid")
+        claims = jwt.decode(token, key, algorithms=[ALGORITHM], options={"require": ["sub", "exp"]})
+    except jwt.ExpiredSignatureError as exc:
+        raise HTTPException(status_code=401, detail="Token expired",
+                            headers={"WWW-Authenticate": "Bearer"}) from exc
+    except jwt.InvalidTokenError as exc:
+        raise HTTPException(status_code=401, detail="Invalid token",
+                            headers={"WWW-Authenticate": "Bearer"}) from exc
+    return claims["sub"]
+
+
+def bearer_token(connection: HTTPConnection) -> Optional[str]:
+    scheme, _, token = connection.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        return token
+    # Browsers cannot set headers on WebSocket or <audio> requests.
+    return connection.query_params.get("access_token")
+
+
+def authenticated_user(connection: HTTPConnection) -> str:
+    """Router dependency: the caller's user id. A `user_id` in the path or
+    query string must be the caller's own."""
+    try:
+        token = bearer_token(connection)
+        if not token:
+            raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+        user_id = verify_token(token)
+        claimed = connection.path_params.get("user_id") or connection.query_params.get("user_id")
+        require_same_user(claimed, user_id)
+    except HTTPException as exc:
+        if connection.scope["type"] == "websocket":
+            raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason=exc.detail) from exc
+        raise
+    connection.state.user_id = user_id
+    return user_id
+
+
+def require_same_user(claimed: Optional[str], user_id: str) -> str:
+    """For user ids sent in a form or JSON body, which the dependency cannot see."""
+    if claimed and claimed != user_id:
+        raise HTTPException(status_code=403, detail="Not allowed for this user")
+    return user_id
@@ -0,0 +1,86 @@
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, List, Optional, Sequence, Tuple
+
+from metrics import REGISTRY, Histogram
+
+WRITE_BATCH_SIZE = REGISTRY.register(Histogram(
+    "write_batch_size", "Documents per coalesced insert, by collection.", ("collection",),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512)))
+
+
+class WriteBatcher:
+    """Coalesces single-document writes into bulk ones.
+
+    The first `submit` opens a batch; it is flushed after `max_delay` seconds or
+    as soon as it holds `max_size` documents, whichever comes first. Each caller
+    awaits its own document's outcome, so a request is acknowledged only once the
+    batch that carried it has committed, and a failure on one document (e.g. a
+    duplicate key) fails only that caller.
+
+    `flush(docs)` must write the documents and return one outcome per document,
+    in order: an exception, which that caller's `submit` raises, or the value it
+    returns (e.g. the transaction's day rollup, see server.store_transactions).
+    """
+
+    def __init__(
+        self,
+        flush: Callable[[List[dict]], Awaitable[Sequence[Any]]],
+        max_delay: float,
+        max_size: int,
+        name: str = "transactions",
+    ):
+        self.flush_fn = flush
+        self.max_delay = max_delay
+        self.max_size = max_size
+        self.name = name
+        self._pending: List[Tuple[dict, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushes = set()
+
+    @classmethod
+    def from_env(cls, flush) -> Optional["WriteBatcher"]:
+        """Batcher configured by TRANSACTION_BATCH_MS / TRANSACTION_BATCH_SIZE, or None if disabled (0 ms)."""
+        delay_ms = float(os.environ.get('TRANSACTION_BATCH_MS', '0'))
+        if delay_ms <= 0:
+            return None
+        return cls(flush, delay_ms / 1000, int(os.environ.get('TRANSACTION_BATCH_SIZE', '100')))
+
+    async def submit(self, doc: dict) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((doc, future))
+        if len(self._pending) >= self.max_size:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._start_flush)
+        return await future
+
+    def _start_flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._flush(batch))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, batch: List[Tuple[dict, asyncio.Future]]):
+        WRITE_BATCH_SIZE.labels(self.name).observe(len(batch))
+        try:
+            outcomes = await self.flush_fn([doc for doc, _ in batch])
+        except Exception as exc:
+            outcomes = [exc] * len(batch)
+        for (_, future), outcome in zip(batch, outcomes):
+            if future.done():
+                continue
+            if isinstance(outcome, BaseException):
+                future.set_exception(outcome)
+            else:
+                future.set_result(outcome)
+
+    async def drain(self):
+        """Flush whatever is pending and wait for in-progress flushes (shutdown)."""
+        self._start_flush()
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
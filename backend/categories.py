@@ -0,0 +1,34 @@
+from enum import Enum
+
+
+class Category(str, Enum):
+    SALES = "sales"
+    PURCHASE = "purchase"
+    EXPENSE = "expense"
+
+
+CATEGORY_VALUES = tuple(c.value for c in Category)
+
+# Spellings seen from forms, OCR and voice entry, mapped onto the enum.
+CATEGORY_ALIASES = {
+    "sale": "sales",
+    "बिक्री": "sales",
+    "बिकरी": "sales",
+    "purchases": "purchase",
+    "खरीद": "purchase",
+    "खरीदी": "purchase",
+    "expenses": "expense",
+    "खर्च": "expense",
+    "खर्चा": "expense",
+}
+
+
+def normalize_category(value) -> str:
+    """Map free-form category input onto a Category value; raises ValueError if unknown."""
+    if isinstance(value, Category):
+        return value.value
+    key = str(value).strip().lower()
+    key = CATEGORY_ALIASES.get(key, key)
+    if key not in CATEGORY_VALUES:
+        raise ValueError(f"Unknown category '{value}', expected one of: {', '.join(CATEGORY_VALUES)}")
+    return key
@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, List
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from metrics import MongoCommandMetrics
+
+logger = logging.getLogger(__name__)
+
+
+def mongo_client_options() -> dict:
+    """Pool, timeout and compression settings for the Mongo client, from the environment."""
+    options = {
+        "maxPoolSize": int(os.environ.get('MONGO_MAX_POOL_SIZE', '100')),
+        "minPoolSize": int(os.environ.get('MONGO_MIN_POOL_SIZE', '10')),
+        "maxIdleTimeMS": int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', '300000')),
+        "waitQueueTimeoutMS": int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', '5000')),
+        "connectTimeoutMS": int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', '5000')),
+        "serverSelectionTimeoutMS": int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000')),
+        "socketTimeoutMS": int(os.environ.get('MONGO_SOCKET_TIMEOUT_MS', '20000')),
+    }
+    compressors = os.environ.get('MONGO_COMPRESSORS', '')
+    if compressors:
+        options["compressors"] = compressors
+        if "zlib" in compressors:
+            options["zlibCompressionLevel"] = int(os.environ.get('MONGO_ZLIB_LEVEL', '6'))
+    return options
+
+
+def create_mongo_client(mongo_url: str) -> AsyncIOMotorClient:
+    return AsyncIOMotorClient(mongo_url, event_listeners=[MongoCommandMetrics()], **mongo_client_options())
+
+
+# Every index the app relies on, by collection. ensure_indexes applies this at
+# startup; tests/test_indexes.py checks that each endpoint's queries use one.
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        # Registration relies on this to reject a second account for an email.
+        IndexModel([("email", ASCENDING)], unique=True),
+    ],
+    "transactions": [
+        # Serves get_transactions' date sort, the archive job's oldest-first scan and
+        # filter-only searches, which page on (date, id).
+        IndexModel([("user_id", ASCENDING), ("date", DESCENDING), ("id", DESCENDING)]),
+        # Prefix search: one index key per description-word prefix, newest first within a token.
+        IndexModel([("user_id", ASCENDING), ("search_tokens", ASCENDING), ("date", DESCENDING), ("id", DESCENDING)]),
+        # Idempotent creates derive the id from the client's Idempotency-Key; a retry must collide.
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("user_id", ASCENDING), ("version", ASCENDING)]),
+    ],
+    "rollups": [
+        IndexModel([("user_id", ASCENDING), ("granularity", ASCENDING), ("start", ASCENDING)], unique=True),
+    ],
+    "daily_stats": [
+        IndexModel([("user_id", ASCENDING)], unique=True),
+    ],
+    "daily_reports": [
+        IndexModel([("user_id", ASCENDING), ("date", DESCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("version", ASCENDING)]),
+    ],
+    "tombstones": [
+        IndexModel([("user_id", ASCENDING), ("version", ASCENDING)]),
+    ],
+    "document_scans": [
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+}
+
+# Indexes nothing queries any more, by collection; ensure_indexes drops them.
+RETIRED_INDEXES: Dict[str, List[str]] = {
+    "transactions": ["user_id_1_date_-1_category_1_amount_1", "user_id_1_date_-1"],
+}
+
+# Options that change what an index enforces or holds; an existing index with
+# the same keys but different values here is rebuilt.
+INDEX_OPTIONS = ("unique", "sparse", "partialFilterExpression", "expireAfterSeconds")
+
+
+async def ensure_indexes(db, indexes: Dict[str, List[IndexModel]] = INDEXES,
+                         retired: Dict[str, List[str]] = RETIRED_INDEXES):
+    """Create the declared indexes; safe to run on every start.
+
+    An index whose options were changed in the registry (e.g. made unique) is
+    dropped and rebuilt. A build that fails, such as a unique index over
+    existing duplicates, is logged and the old definition restored so the app
+    still starts. Retired indexes are dropped; other undeclared ones are left alone."""
+    for collection, names in retired.items():
+        existing = await db[collection].index_information()
+        for name in names:
+            if name in existing:
+                logger.info("Dropping retired index %s.%s", collection, name)
+                await db[collection].drop_index(name)
+    for collection, models in indexes.items():
+        existing = await db[collection].index_information()
+        for model in models:
+            spec = model.document
+            current = existing.get(spec["name"])
+            if current is not None:
+                if all(current.get(option) == spec.get(option) for option in INDEX_OPTIONS):
+                    continue
+                logger.info("Rebuilding index %s.%s with new options", collection, spec["name"])
+                await db[collection].drop_index(spec["name"])
+            try:
+                await db[collection].create_indexes([model])
+            except OperationFailure as exc:
+                logger.error("Could not build index %s.%s: %s", collection, spec["name"], exc)
+                if current is not None:
+                    # Put the old definition back rather than leave the queries unindexed.
+                    options = {option: current[option] for option in INDEX_OPTIONS if option in current}
+                    await db[collection].create_index(list(current["key"]), name=spec["name"], **options)
+
+
+async def warm_up(db, connections: int):
+    """Open `connections` pooled connections and make sure indexes exist.
+
+    Concurrent pings force the pool to dial that many sockets now, so the first
+    requests after a deploy don't pay TCP/TLS/auth handshakes.
+    """
+    start = time.perf_counter()
+    await db.command("ping")
+    if connections > 1:
+        await asyncio.gather(*(db.command("ping") for _ in range(connections)))
+    await ensure_indexes(db)
+    logger.info("Mongo warm-up finished in %.1f ms (%d connections)", (time.perf_counter() - start) * 1000, connections)
@@ -0,0 +1,90 @@
+"""Live dashboard updates.
+
+Writes publish the user's updated day totals to an in-process hub, and every
+connected dashboard of that user gets them over `/api/live/{user_id}`, with
+no polling and no recomputation. With several workers, a write only reaches
+the sockets held by the worker that served it. Set LIVE_EVENTS=changestream
+(Mongo replica sets only) to feed every worker's hub from a change stream on
+`rollups` instead; with the SQLite backend that setting falls back to the
+in-process hub.
+"""
+import asyncio
+import logging
+from contextlib import contextmanager
+from typing import Dict, Iterator, Set
+
+from categories import CATEGORY_VALUES
+from metrics import REGISTRY, Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+LIVE_SUBSCRIBERS = REGISTRY.register(Gauge(
+    "live_subscribers", "Open live dashboard connections.", ()))
+LIVE_DROPPED = REGISTRY.register(Counter(
+    "live_events_dropped_total", "Live events dropped because a client fell behind.", ()))
+
+QUEUE_SIZE = 32
+
+
+def day_event(rollup: dict) -> dict:
+    """A day rollup shaped like an /analytics chart_data entry."""
+    return {
+        "type": "day",
+        "date": rollup["period"],
+        "start": rollup["start"],
+        **{category: rollup.get(category, 0) for category in CATEGORY_VALUES},
+    }
+
+
+class EventHub:
+    """Per-user fan-out of events to bounded queues, one per connection.
+
+    A slow client never blocks a write: when its queue is full the oldest
+    event is dropped, which is harmless because every event carries absolute
+    totals rather than increments.
+    """
+
+    def __init__(self, queue_size: int = QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._queues: Dict[str, Set[asyncio.Queue]] = {}
+
+    @contextmanager
+    def subscribe(self, user_id: str) -> Iterator[asyncio.Queue]:
+        queue = asyncio.Queue(self.queue_size)
+        self._queues.setdefault(user_id, set()).add(queue)
+        LIVE_SUBSCRIBERS.labels().inc()
+        try:
+            yield queue
+        finally:
+            LIVE_SUBSCRIBERS.labels().dec()
+            queues = self._queues.get(user_id)
+            queues.discard(queue)
+            if not queues:
+                del self._queues[user_id]
+
+    def subscribers(self, user_id: str) -> int:
+        return len(self._queues.get(user_id, ()))
+
+    def publish(self, user_id: str, event: dict):
+        for queue in self._queues.get(user_id, ()):
+            if queue.full():
+                queue.get_nowait()
+                LIVE_DROPPED.labels().inc()
+            queue.put_nowait(event)
+
+
+async def relay_rollup_changes(db, hub: EventHub):
+    """Publish every day-rollup change in the database to `hub` (runs until cancelled)."""
+    pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace"]},
+                            "fullDocument.granularity": "day"}}]
+    while True:
+        try:
+            async with db.rollups.watch(pipeline, full_document="updateLookup") as stream:
+                async for change in stream:
+                    rollup = change["fullDocument"]
+                    hub.publish(rollup["user_id"], day_event(rollup))
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Rollup change stream failed; reconnecting")
+            await asyncio.sleep(1)
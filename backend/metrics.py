@@ -0,0 +1,281 @@
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from pymongo import monitoring
+from starlette.routing import Match
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_lock = threading.Lock()
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+
+    def labels(self, *values: str):
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with _lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}", *self._samples()]
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        with _lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        with _lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def _samples(self):
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+            for key, child in sorted(self._children.items())
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        with _lock:
+            self.sum += value
+            self.count += 1
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+                    break
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets) + (float("inf"),)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def _samples(self):
+        lines = []
+        for key, child in sorted(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, child.counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(child.sum)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {child.count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], List[_Metric]]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], List[_Metric]]):
+        """Register a callback producing metrics computed at scrape time."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        metrics = list(self._metrics)
+        for collector in self._collectors:
+            metrics.extend(collector())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    "http_requests_total", "HTTP requests by route and status.", ("method", "route", "status")))
+HTTP_LATENCY = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.", ("method", "route")))
+HTTP_IN_FLIGHT = REGISTRY.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served.", ("route",)))
+
+MONGO_LATENCY = REGISTRY.register(Histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency by collection.", ("collection", "command"),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)))
+MONGO_FAILURES = REGISTRY.register(Counter(
+    "mongo_command_failures_total", "Failed MongoDB commands by collection.", ("collection", "command")))
+
+LLM_LATENCY = REGISTRY.register(Histogram(
+    "llm_request_duration_seconds", "LLM call latency by endpoint.", ("endpoint",),
+    buckets=(0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)))
+LLM_REQUESTS = REGISTRY.register(Counter(
+    "llm_requests_total", "LLM calls by endpoint and outcome.", ("endpoint", "outcome")))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "llm_tokens_estimated_total", "Estimated LLM tokens (~4 chars/token) by endpoint and direction.",
+    ("endpoint", "direction")))
+LLM_IN_FLIGHT = REGISTRY.register(Gauge(
+    "llm_requests_in_flight", "LLM calls currently awaiting a response.", ("endpoint",)))
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text or "") + 3) // 4
+
+
+class LLMCall:
+    __slots__ = ("response",)
+
+    def __init__(self):
+        self.response = ""
+
+
+@asynccontextmanager
+async def track_llm_call(endpoint: str, prompt: str):
+    """Time one LLM call. The body should assign the reply text to `call.response`."""
+    call = LLMCall()
+    LLM_IN_FLIGHT.labels(endpoint).inc()
+    start = time.perf_counter()
+    try:
+        yield call
+    except Exception:
+        LLM_REQUESTS.labels(endpoint, "error").inc()
+        raise
+    else:
+        LLM_REQUESTS.labels(endpoint, "ok").inc()
+        LLM_TOKENS.labels(endpoint, "completion").inc(estimate_tokens(call.response))
+    finally:
+        LLM_LATENCY.labels(endpoint).observe(time.perf_counter() - start)
+        LLM_TOKENS.labels(endpoint, "prompt").inc(estimate_tokens(prompt))
+        LLM_IN_FLIGHT.labels(endpoint).dec()
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """pymongo command listener recording per-collection command latency."""
+
+    def __init__(self):
+        self._pending: Dict[Tuple[object, int], str] = {}
+
+    @staticmethod
+    def _collection(event) -> str:
+        command = event.command
+        if event.command_name == "getMore":
+            return str(command.get("collection", "unknown"))
+        target = command.get(event.command_name)
+        return target if isinstance(target, str) else "admin"
+
+    def started(self, event):
+        self._pending[(event.connection_id, event.request_id)] = self._collection(event)
+
+    def _finish(self, event) -> Tuple[str, str]:
+        collection = self._pending.pop((event.connection_id, event.request_id), "unknown")
+        MONGO_LATENCY.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+        return collection, event.command_name
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        MONGO_FAILURES.labels(*self._finish(event)).inc()
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status and in-flight count per route template."""
+
+    def __init__(self, app, routes_source: Callable[[], Sequence]):
+        self.app = app
+        self.routes_source = routes_source
+
+    def _route_for(self, scope) -> str:
+        for route in self.routes_source():
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return getattr(route, "path", "unknown")
+        return "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route = self._route_for(scope)
+        method = scope["method"]
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        in_flight = HTTP_IN_FLIGHT.labels(route)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_LATENCY.labels(method, route).observe(time.perf_counter() - start)
+            HTTP_REQUESTS.labels(method, route, status["code"]).inc()
+            in_flight.dec()
@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from pymongo.errors import DuplicateKeyError
+
+from categories import CATEGORY_ALIASES, CATEGORY_VALUES
+from anomalies import rebuild_daily_stats
+from rollups import rebuild_rollups
+from search import backfill_search_tokens
+from sync import assign_sync_versions
+
+logger = logging.getLogger(__name__)
+
+# A claim not renewed for this long belongs to a dead worker and is taken over.
+LEASE_SECONDS = 120.0
+POLL_SECONDS = 1.0
+
+
+async def normalize_transaction_categories(db):
+    """Rewrite legacy free-form categories ("Sales", " EXPENSE ", "खर्च") to enum values."""
+    result = await db.transactions.update_many(
+        {"category": {"$nin": list(CATEGORY_VALUES)}},
+        [{"$set": {"category": {"$toLower": {"$trim": {"input": "$category"}}}}}],
+    )
+    fixed = result.modified_count
+    for alias, value in CATEGORY_ALIASES.items():
+        result = await db.transactions.update_many({"category": alias}, {"$set": {"category": value}})
+        fixed += result.modified_count
+    unknown = await db.transactions.count_documents({"category": {"$nin": list(CATEGORY_VALUES)}})
+    logger.info("Normalized %d transaction categories", fixed)
+    if unknown:
+        logger.warning("%d transactions have categories outside %s and are excluded from totals", unknown, CATEGORY_VALUES)
+
+
+# Applied once per database, in order. Append new migrations; never reorder or rename.
+MIGRATIONS = [
+    ("2026-10-normalize-transaction-categories", normalize_transaction_categories),
+    ("2026-10-build-rollups", rebuild_rollups),
+    ("2026-10-build-daily-stats", rebuild_daily_stats),
+    ("2026-10-backfill-search-tokens", backfill_search_tokens),
+    ("2026-10-assign-sync-versions", assign_sync_versions),
+]
+
+
+async def claim_migration(db, name: str, owner: str, lease: float) -> bool:
+    """Take `name` for `owner`: a fresh claim, or one whose holder stopped renewing its lease."""
+    now = datetime.now(timezone.utc)
+    lease_until = (now + timedelta(seconds=lease)).isoformat()
+    try:
+        await db.migrations.insert_one({"_id": name, "state": "running", "owner": owner,
+                                        "started_at": now.isoformat(), "lease_until": lease_until})
+        return True
+    except DuplicateKeyError:
+        pass
+    result = await db.migrations.update_one(
+        {"_id": name, "state": "running",
+         "$or": [{"lease_until": {"$lt": now.isoformat()}}, {"lease_until": {"$exists": False}}]},
+        {"$set": {"owner": owner, "started_at": now.isoformat(), "lease_until": lease_until}},
+    )
+    if result.modified_count:
+        logger.warning("Taking over migration %s from a worker whose lease expired", name)
+    return bool(result.modified_count)
+
+
+async def renew_lease(db, name: str, owner: str, lease: float):
+    """Keep extending the claim while the migration runs (until cancelled)."""
+    while True:
+        await asyncio.sleep(lease / 3)
+        lease_until = (datetime.now(timezone.utc) + timedelta(seconds=lease)).isoformat()
+        result = await db.migrations.update_one({"_id": name, "owner": owner}, {"$set": {"lease_until": lease_until}})
+        if not result.modified_count:
+            logger.warning("Lost the lease on migration %s", name)
+
+
+async def apply_migration(db, name: str, migration, owner: str, lease: float):
+    logger.info("Applying migration %s", name)
+    heartbeat = asyncio.create_task(renew_lease(db, name, owner, lease))
+    try:
+        await migration(db)
+    except Exception:
+        await db.migrations.delete_one({"_id": name, "owner": owner})
+        raise
+    finally:
+        heartbeat.cancel()
+    await db.migrations.update_one(
+        {"_id": name, "owner": owner},
+        {"$set": {"state": "applied", "applied_at": datetime.now(timezone.utc).isoformat()}},
+    )
+
+
+async def run_migrations(db, lease: float = LEASE_SECONDS, poll: float = POLL_SECONDS):
+    """Apply pending migrations, in order, exactly once across workers.
+
+    One worker claims each migration in `db.migrations` and renews a lease
+    while it runs; the others wait until it is applied, since serving requests
+    during e.g. a rollup rebuild would lose their increments. A claim whose
+    lease ran out (its worker died) is taken over and the migration rerun,
+    so migrations must be safe to run again from the start."""
+    owner = uuid.uuid4().hex
+    for name, migration in MIGRATIONS:
+        waiting = False
+        while True:
+            state = await db.migrations.find_one({"_id": name}, {"state": 1})
+            if state is not None and state.get("state") == "applied":
+                break
+            if await claim_migration(db, name, owner, lease):
+                await apply_migration(db, name, migration, owner, lease)
+                break
+            if not waiting:
+                logger.info("Waiting for another worker to apply migration %s", name)
+                waiting = True
+            await asyncio.sleep(poll)
@@ -0,0 +1,120 @@
+import hmac
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+
+PROFILE_ID_LENGTH = 32
+
+
+def profile_path(profile_dir: Path, profile_id: str) -> Optional[Path]:
+    """Location of a stored profile, or None if `profile_id` is not a valid id."""
+    if len(profile_id) != PROFILE_ID_LENGTH or any(c not in "0123456789abcdef" for c in profile_id):
+        return None
+    return Path(profile_dir) / f"{profile_id}.folded"
+
+
+def token_matches(supplied: Optional[str], token: str) -> bool:
+    return bool(token) and supplied is not None and hmac.compare_digest(supplied.encode(), token.encode())
+
+
+class SamplingProfiler:
+    """Samples one thread's Python stack on a timer and aggregates folded stacks.
+
+    On the event loop thread that means every coroutine running there, not only
+    the request that started the profiler: a profile taken under load mixes in
+    the stacks of whatever other requests the loop was serving.
+
+    Output is in the "folded" format (`frame;frame;frame count` per line), which
+    flamegraph.pl, speedscope and inferno read directly. Only the sampler thread
+    does work, so the profiled thread pays nothing but the GIL hand-offs.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.005, max_seconds: float = 30.0):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _fold(frame) -> str:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        return ";".join(reversed(stack))
+
+    def _run(self):
+        deadline = time.monotonic() + self.max_seconds
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples[self._fold(frame)] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> str:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+class ProfilingMiddleware:
+    """Profiles the event loop while a request carrying the admin profiling token runs.
+
+    Triggered by an `X-Profile-Token` header matching PROFILE_TOKEN (never a
+    query parameter, which would land in access logs). The folded profile is
+    written to `profile_dir` and its id returned in the `X-Profile-Id` response
+    header. Profiles are loop-wide (see SamplingProfiler), so take them on an
+    otherwise idle worker to see one request alone. Only one request is
+    profiled at a time; others pass through untouched. Only install this
+    middleware when a token is configured so that disabled profiling costs
+    nothing.
+    """
+
+    def __init__(self, app, token: str, profile_dir: Path, interval: float = 0.005, max_seconds: float = 30.0):
+        self.app = app
+        self.token = token.encode()
+        self.profile_dir = Path(profile_dir)
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self._busy = threading.Lock()
+
+    def _requested(self, scope) -> bool:
+        for name, value in scope["headers"]:
+            if name == b"x-profile-token":
+                return hmac.compare_digest(value, self.token)
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._requested(scope) or not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        profiler = SamplingProfiler(threading.get_ident(), self.interval, self.max_seconds)
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            folded = profiler.stop()
+            self._busy.release()
+            self.profile_dir.mkdir(parents=True, exist_ok=True)
+            profile_path(self.profile_dir, profile_id).write_text(folded)
@@ -0,0 +1,150 @@
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException
+
+
+@asynccontextmanager
+async def unlimited():
+    """Stand-in for `LLMAdmission.capacity` where nothing needs admitting."""
+    yield
+
+
+class TokenBucket:
+    """Classic token bucket: `capacity` burst, refilled at `rate` tokens/second."""
+
+    __slots__ = ("capacity", "rate", "tokens", "updated")
+
+    def __init__(self, capacity: float, rate: float, now: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = now
+
+    def try_take(self, now: float) -> Tuple[bool, float]:
+        """Take one token. Returns (allowed, seconds until a token is available)."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True, 0.0
+        return False, (1 - self.tokens) / self.rate
+
+
+class LLMAdmission:
+    """Per-user token buckets plus a global in-flight cap for LLM-backed endpoints.
+
+    Requests over a user's rate, or arriving when the global cap is reached and
+    the short wait queue is full (or the wait times out), are rejected with 429
+    and a `Retry-After` header instead of piling up behind the LLM quota.
+    """
+
+    def __init__(
+        self,
+        rate_per_minute: float,
+        burst: int,
+        max_in_flight: int,
+        max_queue: int,
+        queue_timeout: float,
+        max_tracked_users: int = 10000,
+    ):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_tracked_users = max_tracked_users
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.in_flight = 0
+        self.queued = 0
+        self.counters: Dict[str, int] = {
+            "admitted": 0,
+            "rejected_user_rate": 0,
+            "rejected_queue_full": 0,
+            "rejected_queue_timeout": 0,
+        }
+
+    @classmethod
+    def from_env(cls) -> "LLMAdmission":
+        return cls(
+            rate_per_minute=float(os.environ.get('LLM_RATE_PER_MINUTE', '10')),
+            burst=int(os.environ.get('LLM_BURST', '5')),
+            max_in_flight=int(os.environ.get('LLM_MAX_IN_FLIGHT', '16')),
+            max_queue=int(os.environ.get('LLM_MAX_QUEUE', '32')),
+            queue_timeout=float(os.environ.get('LLM_QUEUE_TIMEOUT', '2.0')),
+        )
+
+    def _bucket(self, user_id: str, now: float) -> TokenBucket:
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = TokenBucket(self.burst, self.rate, now)
+            self._buckets[user_id] = bucket
+            if len(self._buckets) > self.max_tracked_users:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(user_id)
+        return bucket
+
+    def _reject(self, counter: str, retry_after: float, detail: str):
+        self.counters[counter] += 1
+        raise HTTPException(
+            status_code=429,
+            detail=detail,
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+    def charge(self, user_id: str):
+        """Count one request against the user's rate, or raise 429."""
+        now = time.monotonic()
+        allowed, retry_after = self._bucket(user_id, now).try_take(now)
+        if not allowed:
+            self._reject("rejected_user_rate", retry_after, "Too many AI requests, please retry later")
+
+    @asynccontextmanager
+    async def slot(self, user_id: str):
+        self.charge(user_id)
+        async with self.capacity():
+            yield
+
+    @asynccontextmanager
+    async def capacity(self):
+        """Hold one of the global in-flight places, waiting in the bounded queue if needed.
+        For sessions charged once (`charge`) that call the backend many times."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        if self._semaphore.locked():
+            if self.queued >= self.max_queue:
+                self._reject("rejected_queue_full", self.queue_timeout, "AI service is busy, please retry later")
+            self.queued += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self._reject("rejected_queue_timeout", self.queue_timeout, "AI service is busy, please retry later")
+            finally:
+                self.queued -= 1
+        else:
+            await self._semaphore.acquire()
+
+        self.counters["admitted"] += 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            **self.counters,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "tracked_users": len(self._buckets),
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+        }
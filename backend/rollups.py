@@ -0,0 +1,200 @@
+"""Pre-aggregated per-user totals at day, week, month and year granularity.
+
+Each rollup document holds the sales/purchase/expense sums and transaction
+counts of one user for one period:
+
+    {"user_id": ..., "granularity": "month", "start": "2026-10-01", "period": "2026-10",
+     "sales": 1200.0, "purchase": 300.0, "expense": 50.0,
+     "count_sales": 4, "count_purchase": 1, "count_expense": 2}
+
+`start` (the period's first day, ISO) orders documents and bounds range reads;
+`period` is the display label. Every transaction write `$inc`s the four
+documents containing its date (the day one returning its new totals, which
+feed the running statistics in anomalies.py), so reads never have to touch
+raw transactions. Batched writes (batching.py) merge their increments per
+document first.
+"""
+import asyncio
+from datetime import date, timedelta
+from itertools import chain
+from typing import Dict, Iterable, List, Tuple
+
+from pymongo import ReturnDocument, UpdateOne
+
+from anomalies import apply_day_change, apply_day_changes, rebuild_daily_stats
+from categories import CATEGORY_VALUES
+
+GRANULARITIES = ("day", "week", "month", "year")
+DEFAULT_PERIODS = {"day": 30, "week": 12, "month": 12, "year": 5}
+
+
+def period_start(granularity: str, day: date) -> date:
+    if granularity == "day":
+        return day
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    if granularity == "year":
+        return day.replace(month=1, day=1)
+    raise ValueError(f"Unknown granularity '{granularity}', expected one of: {', '.join(GRANULARITIES)}")
+
+
+def period_label(granularity: str, start: date) -> str:
+    if granularity == "day":
+        return start.isoformat()
+    if granularity == "week":
+        iso_year, iso_week, _ = start.isocalendar()
+        return f"{iso_year}-W{iso_week:02d}"
+    if granularity == "month":
+        return start.strftime("%Y-%m")
+    return str(start.year)
+
+
+def shift_period(granularity: str, start: date, periods: int) -> date:
+    """Start of the period `periods` steps after (or before, if negative) `start`."""
+    if granularity == "day":
+        return start + timedelta(days=periods)
+    if granularity == "week":
+        return start + timedelta(weeks=periods)
+    if granularity == "month":
+        months = start.year * 12 + start.month - 1 + periods
+        return date(months // 12, months % 12 + 1, 1)
+    return date(start.year + periods, 1, 1)
+
+
+def transaction_day(date_value: str) -> date:
+    """Calendar day of a stored transaction date (ISO string, as written by the API)."""
+    return date.fromisoformat(date_value[:10])
+
+
+def rollup_key(user_id: str, granularity: str, start: date) -> dict:
+    return {"user_id": user_id, "granularity": granularity, "start": start.isoformat()}
+
+
+def rollup_increments(user_id: str, day: date, category: str, amount: float, count: int = 1) -> List[Tuple[dict, dict]]:
+    """(filter, update) pairs adding one transaction's amount to its four rollups."""
+    pairs = []
+    for granularity in GRANULARITIES:
+        start = period_start(granularity, day)
+        pairs.append((
+            rollup_key(user_id, granularity, start),
+            {
+                "$inc": {category: amount, f"count_{category}": count},
+                "$setOnInsert": {"period": period_label(granularity, start)},
+            },
+        ))
+    return pairs
+
+
+async def apply_transaction(db, user_id: str, date_value: str, category: str, amount: float, count: int = 1) -> dict:
+    """Add (or with negative amount/count, remove) one transaction in every granularity
+    and in the user's daily statistics. Returns the updated day rollup."""
+    (day_filter, day_update), *coarser = rollup_increments(user_id, transaction_day(date_value), category, amount, count)
+    day_rollup, _ = await asyncio.gather(
+        db.rollups.find_one_and_update(
+            day_filter, day_update, upsert=True, return_document=ReturnDocument.AFTER, projection={"_id": 0}
+        ),
+        db.rollups.bulk_write([UpdateOne(f, u, upsert=True) for f, u in coarser], ordered=False),
+    )
+    await apply_day_change(db, user_id, category, amount, day_rollup, count)
+    return day_rollup
+
+
+def merged_increments(docs: Iterable[dict]) -> Dict[tuple, Tuple[dict, dict]]:
+    """rollup_increments of new transactions, merged into one update per rollup document."""
+    merged: Dict[tuple, Tuple[dict, dict]] = {}
+    for doc in docs:
+        for key, update in rollup_increments(doc["user_id"], transaction_day(doc["date"]), doc["category"], doc["amount"]):
+            _, merged_update = merged.setdefault(
+                tuple(key.values()), (key, {"$inc": {}, "$setOnInsert": update["$setOnInsert"]}),
+            )
+            inc = merged_update["$inc"]
+            for field, value in update["$inc"].items():
+                inc[field] = inc.get(field, 0) + value
+    return merged
+
+
+async def apply_transactions(db, docs: List[dict]) -> List[dict]:
+    """apply_transaction for a batch of new transactions: one returning update per
+    day touched, and one bulk write each for the coarser rollups and the daily
+    statistics. Returns each document's day rollup, with the whole batch applied."""
+    merged = merged_increments(docs)
+    days = [(key, update) for key, update in merged.values() if key["granularity"] == "day"]
+    coarser = [UpdateOne(key, update, upsert=True) for key, update in merged.values() if key["granularity"] != "day"]
+    day_rollups = await asyncio.gather(
+        *(db.rollups.find_one_and_update(key, update, upsert=True, return_document=ReturnDocument.AFTER, projection={"_id": 0})
+          for key, update in days),
+        db.rollups.bulk_write(coarser, ordered=False),
+    )
+    by_day = {}
+    changes = []
+    for (key, update), day_rollup in zip(days, day_rollups):
+        by_day[key["user_id"], key["start"]] = day_rollup
+        changes += [
+            (key["user_id"], category, update["$inc"][category], day_rollup, update["$inc"][f"count_{category}"])
+            for category in CATEGORY_VALUES if category in update["$inc"]
+        ]
+    await apply_day_changes(db, changes)
+    return [by_day[doc["user_id"], transaction_day(doc["date"]).isoformat()] for doc in docs]
+
+
+async def read_rollups(db, user_id: str, granularity: str, first: date, last: date) -> List[dict]:
+    """Rollups of `granularity` whose periods start within [first, last], oldest first."""
+    return await db.rollups.find(
+        {
+            "user_id": user_id,
+            "granularity": granularity,
+            "start": {"$gte": first.isoformat(), "$lte": last.isoformat()},
+        },
+        {"_id": 0, "period": 1, "start": 1, **{c: 1 for c in CATEGORY_VALUES}, **{f"count_{c}": 1 for c in CATEGORY_VALUES}},
+    ).sort("start", 1).to_list(None)
+
+
+def sum_totals(rollups: Iterable[dict]) -> Dict[str, float]:
+    totals = {c: 0 for c in CATEGORY_VALUES}
+    for rollup in rollups:
+        for category in CATEGORY_VALUES:
+            totals[category] += rollup.get(category, 0)
+    totals["net"] = totals["sales"] - totals["purchase"] - totals["expense"]
+    return totals
+
+
+def build_rollups(daily: Iterable[dict]) -> List[dict]:
+    """Rollup documents from per-(user, day, category) rows of total and count."""
+    docs: Dict[Tuple[str, str, str], dict] = {}
+    for row in daily:
+        day = date.fromisoformat(row["day"])
+        for granularity in GRANULARITIES:
+            start = period_start(granularity, day)
+            doc = docs.setdefault((row["user_id"], granularity, start.isoformat()), {
+                **rollup_key(row["user_id"], granularity, start),
+                "period": period_label(granularity, start),
+            })
+            doc[row["category"]] = doc.get(row["category"], 0) + row["total"]
+            doc[f"count_{row['category']}"] = doc.get(f"count_{row['category']}", 0) + row["count"]
+    return list(docs.values())
+
+
+async def rebuild_rollups(db, user_id: str = None, archived: Iterable[dict] = ()):
+    """Recompute rollups from raw transactions (all users, or one), plus
+    `archived` daily rows for transactions moved out to archive.py."""
+    match = {"category": {"$in": list(CATEGORY_VALUES)}}
+    if user_id:
+        match["user_id"] = user_id
+    daily = await db.transactions.aggregate([
+        {"$match": match},
+        {"$group": {
+            "_id": {"user_id": "$user_id", "day": {"$substr": ["$date", 0, 10]}, "category": "$category"},
+            "total": {"$sum": "$amount"},
+            "count": {"$sum": 1},
+        }},
+    ]).to_list(None)
+    docs = build_rollups(chain(
+        ({**row["_id"], "total": row["total"], "count": row["count"]} for row in daily), archived,
+    ))
+
+    await db.rollups.delete_many({"user_id": user_id} if user_id else {})
+    if docs:
+        await db.rollups.insert_many(docs, ordered=False)
+    await rebuild_daily_stats(db, user_id)
@@ -0,0 +1,69 @@
+"""Prefix search over transaction descriptions.
+
+Mongo's `$text` index only matches whole stemmed words and has no Hindi
+analyzer, so typing "बिक" or "elec" would find nothing. Instead each
+transaction stores `search_tokens`: every prefix (MIN_PREFIX..MAX_PREFIX code
+points) of every word in its description, NFC-normalized and casefolded. A
+query word is then an exact match on one array element, served by the
+(user_id, search_tokens, date, id) index without scanning the user's other
+transactions.
+"""
+import base64
+import re
+import unicodedata
+from typing import List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+MIN_PREFIX = 2
+MAX_PREFIX = 20
+
+# \w alone splits Devanagari words at vowel signs and viramas (they are marks,
+# not letters), so the block is added explicitly, minus the danda punctuation.
+WORD = re.compile(r"(?:[^\W_]|[\u0900-\u0963\u0966-\u097f])+")
+INVISIBLE = dict.fromkeys(map(ord, "\u200b\u200c\u200d\ufeff"))
+
+
+def words(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    text = unicodedata.normalize("NFC", text).translate(INVISIBLE).casefold()
+    return WORD.findall(text)
+
+
+def search_tokens(text: Optional[str]) -> List[str]:
+    """Every prefix of every word in `text`, for the `search_tokens` field."""
+    tokens = set()
+    for word in words(text):
+        for length in range(MIN_PREFIX, min(len(word), MAX_PREFIX) + 1):
+            tokens.add(word[:length])
+    return sorted(tokens)
+
+
+def query_tokens(query: str) -> List[str]:
+    """Tokens a transaction must all carry to match `query` (words shorter than
+    MIN_PREFIX are dropped, longer than MAX_PREFIX are truncated)."""
+    return sorted({word[:MAX_PREFIX] for word in words(query) if len(word) >= MIN_PREFIX})
+
+
+def encode_cursor(transaction: dict) -> str:
+    raw = f"{transaction['date']}|{transaction['id']}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    date_value, transaction_id = raw.split("|", 1)
+    return date_value, transaction_id
+
+
+async def backfill_search_tokens(db, batch_size: int = 1000):
+    """Add `search_tokens` to transactions written before search existed."""
+    batch = []
+    async for doc in db.transactions.find({"search_tokens": {"$exists": False}}, {"_id": 1, "description": 1}):
+        batch.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"search_tokens": search_tokens(doc.get("description"))}}))
+        if len(batch) >= batch_size:
+            await db.transactions.bulk_write(batch, ordered=False)
+            batch = []
+    if batch:
+        await db.transactions.bulk_write(batch, ordered=False)
@@ -1,30 +1,163 @@
-from fastapi import FastAPI, APIRouter, HTTPException, UploadFile, File, Form, Body, Query
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, APIRouter, HTTPException, UploadFile, File, Form, Body, Query, Depends, Header, WebSocket, WebSocketDisconnect, BackgroundTasks, Response
+from fastapi.responses import StreamingResponse, PlainTextResponse, FileResponse, ORJSONResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from contextlib import asynccontextmanager
 import os
+import asyncio
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional
+from pydantic import BaseModel, Field, ConfigDict, BeforeValidator
+from typing import List, Optional, Set, Annotated
 import uuid
 from datetime import datetime, timezone, timedelta
 import base64
 import io
-from emergentintegrations.llm.chat import LlmChat, UserMessage, ImageContent
+import importlib
+import orjson
+from functools import lru_cache
 
 ROOT_DIR = Path(__file__).parent
+# Before the local imports: auth, anomalies, voice and others read their settings at import time.
 load_dotenv(ROOT_DIR / '.env')
 
-mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ.get('DB_NAME', 'test_database')]
-
-app = FastAPI()
-api_router = APIRouter(prefix="/api")
+from rate_limit import LLMAdmission
+from batching import WriteBatcher
+from metrics import REGISTRY, Counter, Gauge, MetricsMiddleware, track_llm_call
+from profiler import ProfilingMiddleware, profile_path, token_matches
+from categories import Category, normalize_category
+from analytics_engine import InsightsCache, compute_insights
+from anomalies import describe as describe_anomalies, score_day, score_days
+from archive import merge_pages
+from search import MIN_PREFIX, decode_cursor, encode_cursor, query_tokens
+from storage import DuplicateKey, Storage, TransactionFilter, create_storage
+from auth import ACCESS_TOKEN_TTL, authenticated_user, issue_token, key_set, require_same_user
+from sync import VersionCache, etag, etag_matches, merge_changes
+from events import EventHub, day_event, relay_rollup_changes
+from tts import AUDIO_MEDIA_TYPE, AudioCache, OpenAITTS, audio_key, parse_range, read_range
+from voice import IDLE_TIMEOUT as VOICE_IDLE_TIMEOUT, MAX_AUDIO_BYTES, WhisperASR, parse_utterance
+from rollups import DEFAULT_PERIODS, GRANULARITIES, period_start, shift_period, sum_totals
+
+store: Optional[Storage] = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global store
+    key_set()  # refuse to start without signing keys rather than fail on the first login
+    store = create_storage(ROOT_DIR)
+    await store.open()
+    relay = start_live_relay(store)
+    yield
+    if relay is not None:
+        relay.cancel()
+    if transaction_batcher is not None:
+        await transaction_batcher.drain()
+    await asyncio.gather(*rollup_repairs, return_exceptions=True)
+    await store.close()
+
+def start_live_relay(store) -> Optional[asyncio.Task]:
+    """The change stream relay for LIVE_EVENTS=changestream, if the store has one to watch."""
+    global LIVE_EVENTS
+    if LIVE_EVENTS != "changestream":
+        return None
+    if not hasattr(store, "db"):
+        logger.warning("LIVE_EVENTS=changestream needs the Mongo backend; publishing live events in-process")
+        LIVE_EVENTS = "local"
+        return None
+    return asyncio.create_task(relay_rollup_changes(store.db, live_events))
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+# Everything on api_router needs an access token (auth.py); public_router is for the rest.
+api_router = APIRouter(prefix="/api", dependencies=[Depends(authenticated_user)])
+public_router = APIRouter(prefix="/api")
 
 EMERGENT_KEY = os.environ.get('EMERGENT_LLM_KEY', '')
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN', '')
+PROFILE_DIR = Path(os.environ.get('PROFILE_DIR', ROOT_DIR / 'profiles'))
+ANALYTICS_LOOKBACK_DAYS = int(os.environ.get('ANALYTICS_LOOKBACK_DAYS', '365'))
+TTS_CACHE_DIR = Path(os.environ.get('TTS_CACHE_DIR', ROOT_DIR / 'tts_cache'))
+IDEMPOTENCY_NAMESPACE = uuid.UUID("6f1c2a5e-8d3b-4c7a-9e21-3b5d0f4a7c19")
+REPORT_LANGUAGE = "hi"
+# "local": writes publish to this worker's hub; "changestream": a Mongo change stream does (see events.py).
+LIVE_EVENTS = os.environ.get('LIVE_EVENTS', 'local')
+
+insights_cache = InsightsCache()
+audio_cache = AudioCache(TTS_CACHE_DIR)
+live_events = EventHub()
+data_versions = VersionCache(float(os.environ.get('ETAG_VERSION_TTL', '2')))
+
+# Rollup rebuilds scheduled by store_transactions, kept referenced until they finish.
+rollup_repairs: Set[asyncio.Task] = set()
+
+def repair_rollups(user_ids: Set[str]):
+    for user_id in user_ids:
+        task = asyncio.create_task(store.rollups.rebuild(user_id))
+        rollup_repairs.add(task)
+        task.add_done_callback(rollup_repairs.discard)
+
+async def store_transactions(docs: List[dict]) -> list:
+    """WriteBatcher flush for new transactions: the inserts, then the rollup and
+    statistics increments of those that went in, each as one bulk write.
+    Returns each document's day rollup, or its insert error.
+
+    The transactions are stored once the inserts succeed, so a failure applying
+    the increments is not theirs: they get a None day rollup and their users'
+    rollups are rebuilt from the transactions in the background."""
+    errors = await store.transactions.insert_batch(docs)
+    inserted = [doc for doc, error in zip(docs, errors) if error is None]
+    try:
+        day_rollups = iter(await store.rollups.apply_many(inserted))
+    except Exception:
+        logger.exception("Applying rollups for %d transactions failed; rebuilding them", len(inserted))
+        repair_rollups({doc["user_id"] for doc in inserted})
+        day_rollups = iter([None] * len(inserted))
+    return [error if error is not None else next(day_rollups) for error in errors]
+
+# Optional write-behind for create_transaction (TRANSACTION_BATCH_MS > 0).
+transaction_batcher = WriteBatcher.from_env(store_transactions)
+
+llm_admission = LLMAdmission.from_env()
+
+async def llm_slot_for_user(user_id: str = Depends(authenticated_user)):
+    async with llm_admission.slot(user_id):
+        yield
+
+def llm_admission_metrics():
+    stats = llm_admission.stats()
+    admitted = Counter("llm_admission_admitted_total", "LLM requests admitted past rate limits.")
+    admitted.labels().set(stats["admitted"])
+    rejected = Counter("llm_admission_rejected_total", "LLM requests rejected with 429 by reason.", ("reason",))
+    for reason in ("user_rate", "queue_full", "queue_timeout"):
+        rejected.labels(reason).set(stats[f"rejected_{reason}"])
+    queued = Gauge("llm_admission_queued", "LLM requests waiting for a global in-flight slot.")
+    queued.labels().set(stats["queued"])
+    return [admitted, rejected, queued]
+
+REGISTRY.register_collector(llm_admission_metrics)
+
+@lru_cache(maxsize=None)
+def llm_chat_module():
+    # emergentintegrations pulls in litellm, openai and the Google SDKs; load them
+    # on the first LLM-backed request instead of at worker startup.
+    return importlib.import_module("emergentintegrations.llm.chat")
+
+async def load_llm_chat_module():
+    # The first import takes seconds; run it on a thread so the event loop keeps
+    # serving other requests meanwhile. Later calls hit the lru_cache.
+    return await asyncio.to_thread(llm_chat_module)
+
+@lru_cache(maxsize=None)
+def asr_backend():
+    return WhisperASR(EMERGENT_KEY)
+
+@lru_cache(maxsize=None)
+def tts_synthesizer():
+    return OpenAITTS(EMERGENT_KEY)
+
+async def send_llm_message(endpoint: str, chat, message) -> str:
+    async with track_llm_call(endpoint, message.text) as call:
+        call.response = await chat.send_message(message)
+    return call.response
 
 class User(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -43,18 +176,21 @@ class UserLogin(BaseModel):
     email: str
     password: str
 
+CategoryField = Annotated[Category, BeforeValidator(normalize_category)]
+
 class Transaction(BaseModel):
-    model_config = ConfigDict(extra="ignore")
+    model_config = ConfigDict(extra="ignore", use_enum_values=True)
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     user_id: str
-    category: str
+    category: CategoryField
     amount: float
     description: Optional[str] = None
     date: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class TransactionCreate(BaseModel):
-    category: str
+    model_config = ConfigDict(use_enum_values=True)
+    category: CategoryField
     amount: float
     description: Optional[str] = None
     date: Optional[datetime] = None
@@ -73,6 +209,9 @@ class DailyReport(BaseModel):
     net_amount: float
     insights: str
     action_points: List[str]
+    # /api/voice/audio URLs of the action points, synthesized in the background.
+    action_point_audio: List[str] = Field(default_factory=list)
+    anomalies: List[dict] = Field(default_factory=list)
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class DocumentScan(BaseModel):
@@ -85,32 +224,33 @@ class DocumentScan(BaseModel):
 
 class VoiceInput(BaseModel):
     audio_base64: str
-    user_id: str
+    user_id: Optional[str] = None
+    language: str = "hi"
 
 class TextToSpeech(BaseModel):
     text: str
     language: str = "hi"
 
-@api_router.get("/")
+@public_router.get("/")
 async def root():
     return {"message": "Sudarshan AI Portal API"}
 
-@api_router.post("/auth/register")
+@public_router.post("/auth/register")
 async def register(user: UserCreate):
-    existing = await db.users.find_one({"email": user.email}, {"_id": 0})
-    if existing:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    
     user_obj = User(**user.model_dump())
     doc = user_obj.model_dump()
     doc['created_at'] = doc['created_at'].isoformat()
     
-    await db.users.insert_one(doc)
+    # The unique email index decides, so two concurrent sign-ups cannot both win.
+    try:
+        await store.users.insert(doc)
+    except DuplicateKey:
+        raise HTTPException(status_code=400, detail="Email already registered")
     return {"message": "User registered successfully", "user_id": user_obj.id}
 
-@api_router.post("/auth/login")
+@public_router.post("/auth/login")
 async def login(credentials: UserLogin):
-    user = await db.users.find_one({"email": credentials.email}, {"_id": 0})
+    user = await store.users.get_by_email(credentials.email)
     if not user or user['password'] != credentials.password:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
@@ -118,9 +258,47 @@ async def login(credentials: UserLogin):
         "message": "Login successful",
         "user_id": user['id'],
         "username": user['username'],
-        "email": user['email']
+        "email": user['email'],
+        "access_token": issue_token(user['id']),
+        "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_TTL
     }
 
+@asynccontextmanager
+async def versioned_write(user_id: str):
+    """Takes the user's next version for a write, to be stored in the same
+    operation as the record or tombstone. It stays pending in the store, and
+    holds back /changes and ETags in every worker, until the block finishes."""
+    version = await store.sync.bump(user_id)
+    try:
+        yield version
+    finally:
+        await store.sync.settle(user_id, version)
+        data_versions.forget(user_id)
+
+async def current_etag(user_id: str, *parts: str, fresh: bool = False) -> str:
+    """ETag for the user's data as of the settled version (see sync.py).
+
+    `fresh` reads the version from the store instead of this worker's cache:
+    pass it when the tag decides a 304, or writes through other workers would
+    go unseen for up to the cache TTL."""
+    version = None if fresh else data_versions.get(user_id)
+    if version is None:
+        version = await store.sync.current(user_id)
+        data_versions.put(user_id, version)
+    return etag(version, *parts)
+
+def validator_headers(tag: Optional[str]) -> dict:
+    # no-cache: browsers keep the body but revalidate with If-None-Match every time.
+    return {"ETag": tag, "Cache-Control": "private, no-cache"} if tag else {}
+
+def not_modified(tag: str) -> Response:
+    return Response(status_code=304, headers=validator_headers(tag))
+
+def publish_day(user_id: str, day_rollup: Optional[dict]):
+    if LIVE_EVENTS == "local" and day_rollup is not None:
+        live_events.publish(user_id, day_event(day_rollup))
+
 @api_router.post("/transactions")
 async def create_transaction(
     transaction: Optional[TransactionCreatePayload] = Body(None),
@@ -130,16 +308,21 @@ async def create_transaction(
     description: Optional[str] = Form(None),
     date: Optional[str] = Form(None),
     user_id_query: Optional[str] = Query(None),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=200),
+    current_user: str = Depends(authenticated_user),
 ):
-    final_user_id = user_id or user_id_query or (transaction.user_id if transaction else None)
-    if not final_user_id:
-        raise HTTPException(status_code=400, detail="user_id is required")
+    claimed = user_id or user_id_query or (transaction.user_id if transaction else None)
+    final_user_id = require_same_user(claimed, current_user)
 
     if transaction:
         trans_data = transaction.model_dump(exclude={"user_id"})
     else:
         if category is None or amount is None:
             raise HTTPException(status_code=400, detail="category and amount are required")
+        try:
+            category = normalize_category(category)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
         trans_data = {
             "category": category,
             "amount": amount,
@@ -155,47 +338,140 @@ async def create_transaction(
         trans_data['date'] = datetime.now(timezone.utc)
 
     trans_obj = Transaction(user_id=final_user_id, **trans_data)
+    if idempotency_key:
+        # A retried request derives the same id, so the unique id index turns
+        # the second insert into a lookup instead of a duplicate entry.
+        trans_obj.id = str(uuid.uuid5(IDEMPOTENCY_NAMESPACE, f"{final_user_id}:{idempotency_key}"))
     doc = trans_obj.model_dump()
     doc['date'] = doc['date'].isoformat()
     doc['created_at'] = doc['created_at'].isoformat()
-    
-    await db.transactions.insert_one(doc)
-    return trans_obj
+
+    async with versioned_write(final_user_id) as version:
+        doc['version'] = version
+        try:
+            if transaction_batcher is not None:
+                day_rollup = await transaction_batcher.submit(doc)
+            else:
+                await store.transactions.insert(doc)
+                day_rollup = await store.rollups.apply(final_user_id, doc['date'], doc['category'], doc['amount'])
+        except DuplicateKey:
+            existing = await store.transactions.get(final_user_id, doc['id'])
+            if existing is None:
+                raise HTTPException(status_code=409, detail="Idempotency-Key was already used")
+            return ORJSONResponse(existing)
+    publish_day(final_user_id, day_rollup)
+    insights_cache.invalidate(final_user_id)
+    return ORJSONResponse(doc)
 
 @api_router.get("/transactions/{user_id}")
-async def get_transactions(user_id: str, limit: int = 50):
-    transactions = await db.transactions.find(
-        {"user_id": user_id},
-        {"_id": 0}
-    ).sort("date", -1).limit(limit).to_list(limit)
-    
-    for trans in transactions:
-        if isinstance(trans.get('date'), str):
-            trans['date'] = datetime.fromisoformat(trans['date'])
-        if isinstance(trans.get('created_at'), str):
-            trans['created_at'] = datetime.fromisoformat(trans['created_at'])
+async def get_transactions(user_id: str, limit: int = 50, if_none_match: Optional[str] = Header(None)):
+    tag = await current_etag(user_id, str(limit), fresh=if_none_match is not None)
+    if etag_matches(if_none_match, tag):
+        return not_modified(tag)
+    transactions = await store.transactions.recent(user_id, limit)
     
-    return transactions
-
-@api_router.post("/scan-document")
-async def scan_document(file: UploadFile = File(...), user_id: str = Form(...)):
+    # Stored dates are already ISO strings; send the documents as they are.
+    return ORJSONResponse(transactions, headers=validator_headers(tag))
+
+@api_router.delete("/transactions/{user_id}/{transaction_id}")
+async def delete_transaction(user_id: str, transaction_id: str):
+    # The version comes first, so /changes cannot pass it while the record is
+    # already gone but its tombstone not yet written.
+    async with versioned_write(user_id) as version:
+        doc = await store.transactions.delete(user_id, transaction_id)
+        if doc is None:
+            raise HTTPException(status_code=404, detail="Transaction not found")
+        await store.sync.record_deletion(user_id, "transactions", transaction_id, version)
+        day_rollup = await store.rollups.apply(user_id, doc['date'], doc['category'], -doc['amount'], count=-1)
+    publish_day(user_id, day_rollup)
+    insights_cache.invalidate(user_id)
+    return {"deleted": transaction_id, "version": version}
+
+@api_router.get("/changes/{user_id}")
+async def get_changes(user_id: str, since: int = Query(0, ge=0), limit: int = Query(500, ge=1, le=2000)):
+    """Everything that changed for the user after version `since`; see sync.py."""
+    # Read first: every version up to it has landed, so the reads below see it.
+    settled = await store.sync.current(user_id)
+    transactions, reports, deletions = await asyncio.gather(
+        store.transactions.changed_since(user_id, since, limit + 1),
+        store.reports.changed_since(user_id, since, limit + 1),
+        store.sync.deletions_since(user_id, since, limit + 1),
+    )
+    return ORJSONResponse(merge_changes(since, limit, deletions, settled=settled, transactions=transactions, reports=reports))
+
+@api_router.get("/transactions/{user_id}/search")
+async def search_transactions(
+    user_id: str,
+    q: str = Query("", max_length=200),
+    category: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    amount_min: Optional[float] = None,
+    amount_max: Optional[float] = None,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+):
+    """Transactions whose description has words starting with every word of `q`,
+    newest first. Pass the returned `next_cursor` back to get the next page."""
+    criteria = TransactionFilter(amount_min=amount_min, amount_max=amount_max)
+    if q.strip():
+        criteria.tokens = tuple(query_tokens(q))
+        if not criteria.tokens:
+            raise HTTPException(status_code=400, detail=f"Search words need at least {MIN_PREFIX} characters")
+    if category:
+        try:
+            criteria.category = normalize_category(category)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+    try:
+        if date_from:
+            criteria.date_from = datetime.fromisoformat(date_from).date().isoformat()
+        if date_to:
+            criteria.date_before = (datetime.fromisoformat(date_to).date() + timedelta(days=1)).isoformat()
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail="Invalid date format") from exc
+    if cursor:
+        try:
+            criteria.after = decode_cursor(cursor)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail="Invalid cursor") from exc
+
+    page = await store.transactions.search(user_id, criteria, limit + 1)
+    if store.archive:
+        # Archived rows are all older than newest_date, so a full live page
+        # that ends after it needs no trip to the Parquet files.
+        newest = await asyncio.to_thread(store.archive.newest_date, user_id)
+        if newest and not (len(page) > limit and page[-1]["date"] > newest):
+            archived = await asyncio.to_thread(store.archive.search, user_id, criteria, limit + 1)
+            page = merge_pages(page, archived, limit + 1)
+    next_cursor = encode_cursor(page[limit - 1]) if len(page) > limit else None
+    return ORJSONResponse({"results": page[:limit], "next_cursor": next_cursor})
+
+@api_router.post("/scan-document", dependencies=[Depends(llm_slot_for_user)])
+async def scan_document(
+    file: UploadFile = File(...),
+    user_id: Optional[str] = Form(None),
+    current_user: str = Depends(authenticated_user),
+):
+    user_id = require_same_user(user_id, current_user)
     try:
         contents = await file.read()
         base64_image = base64.b64encode(contents).decode('utf-8')
         
-        chat = LlmChat(
+        llm = await load_llm_chat_module()
+        chat = llm.LlmChat(
             api_key=EMERGENT_KEY,
             session_id=f"ocr_{uuid.uuid4()}",
             system_message="You are an OCR assistant. Extract all numbers from the document and categorize them as Sales, Purchase, or Expense. Return JSON format with categories and amounts."
         ).with_model("openai", "gpt-4o")
         
-        image_content = ImageContent(image_base64=base64_image)
-        user_message = UserMessage(
+        image_content = llm.ImageContent(image_base64=base64_image)
+        user_message = llm.UserMessage(
             text="Extract all numbers from this document. Identify which are Sales, Purchase, or Expense amounts. Return as JSON: {\"sales\": [amounts], \"purchase\": [amounts], \"expense\": [amounts]}",
             file_contents=[image_content]
         )
         
-        response = await chat.send_message(user_message)
+        response = await send_llm_message("scan_document", chat, user_message)
         
         import json
         try:
@@ -211,7 +487,7 @@ async def scan_document(file: UploadFile = File(...), user_id: str = Form(...)):
         
         doc = doc_scan.model_dump()
         doc['created_at'] = doc['created_at'].isoformat()
-        await db.document_scans.insert_one(doc)
+        await store.scans.insert(doc)
         
         return {
             "message": "Document scanned successfully",
@@ -223,8 +499,8 @@ async def scan_document(file: UploadFile = File(...), user_id: str = Form(...)):
         logging.error(f"Error scanning document: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@api_router.post("/generate-report/{user_id}")
-async def generate_daily_report(user_id: str, date: Optional[str] = None):
+@api_router.post("/generate-report/{user_id}", dependencies=[Depends(llm_slot_for_user)])
+async def generate_daily_report(user_id: str, background_tasks: BackgroundTasks, date: Optional[str] = None):
     try:
         if date:
             report_date = datetime.fromisoformat(date)
@@ -232,43 +508,42 @@ async def generate_daily_report(user_id: str, date: Optional[str] = None):
             report_date = datetime.now(timezone.utc)
         
         start_of_day = report_date.replace(hour=0, minute=0, second=0, microsecond=0)
-        end_of_day = start_of_day + timedelta(days=1)
         
-        transactions = await db.transactions.find(
-            {
-                "user_id": user_id,
-                "date": {
-                    "$gte": start_of_day.isoformat(),
-                    "$lt": end_of_day.isoformat()
-                }
-            },
-            {"_id": 0}
-        ).to_list(1000)
+        totals, stats = await asyncio.gather(
+            store.rollups.get(user_id, "day", start_of_day.date()),
+            store.rollups.stats(user_id),
+        )
+        totals = totals or {}
+        anomalies = score_day(stats, totals)
         
-        sales_total = sum(t['amount'] for t in transactions if t['category'].lower() == 'sales')
-        purchase_total = sum(t['amount'] for t in transactions if t['category'].lower() == 'purchase')
-        expense_total = sum(t['amount'] for t in transactions if t['category'].lower() == 'expense')
+        sales_total = totals.get('sales', 0)
+        purchase_total = totals.get('purchase', 0)
+        expense_total = totals.get('expense', 0)
         net_amount = sales_total - purchase_total - expense_total
         
-        chat = LlmChat(
+        llm = await load_llm_chat_module()
+        chat = llm.LlmChat(
             api_key=EMERGENT_KEY,
             session_id=f"insights_{uuid.uuid4()}",
             system_message="You are a business insights assistant. Provide insights in Hindi and English mix for Indian business owners."
         ).with_model("openai", "gpt-4o")
         
+        anomaly_note = f"\nUnusual compared to this business's normal days:\n{describe_anomalies(anomalies)}\n" if anomalies else ""
+        anomaly_ask = ", calling out the unusual figures above" if anomalies else ""
+        
         prompt = f"""Daily Business Report:
 - Sales: ₹{sales_total:,.2f}
 - Purchase: ₹{purchase_total:,.2f}
 - Expense: ₹{expense_total:,.2f}
 - Net: ₹{net_amount:,.2f}
-
+{anomaly_note}
 Provide:
-1. Brief insights in Hindi-English mix (2-3 sentences)
+1. Brief insights in Hindi-English mix (2-3 sentences){anomaly_ask}
 2. Exactly 5 action points for tomorrow in Hindi
 
 Format as JSON: {{\"insights\": \"text\", \"action_points\": [\"point1\", \"point2\", \"point3\", \"point4\", \"point5\"]}}"""
         
-        response = await chat.send_message(UserMessage(text=prompt))
+        response = await send_llm_message("generate_daily_report", chat, llm.UserMessage(text=prompt))
         
         import json
         try:
@@ -287,109 +562,316 @@ Format as JSON: {{\"insights\": \"text\", \"action_points\": [\"point1\", \"poin
             expense_total=expense_total,
             net_amount=net_amount,
             insights=insights,
-            action_points=action_points
+            action_points=action_points,
+            action_point_audio=[audio_url(audio_key(point, REPORT_LANGUAGE)) for point in action_points],
+            anomalies=anomalies
+        )
+        # Render the action points now so "play" in the app is a cache hit.
+        background_tasks.add_task(
+            audio_cache.presynthesize, action_points, REPORT_LANGUAGE, tts_synthesizer(), llm_admission.capacity,
         )
         
         doc = report.model_dump()
         doc['date'] = doc['date'].isoformat()
         doc['created_at'] = doc['created_at'].isoformat()
-        await db.daily_reports.insert_one(doc)
+        async with versioned_write(user_id) as version:
+            doc['version'] = version
+            await store.reports.insert(doc)
         
-        return report
+        return ORJSONResponse(doc)
     
     except Exception as e:
         logging.error(f"Error generating report: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.get("/reports/{user_id}")
-async def get_reports(user_id: str, limit: int = 30):
-    reports = await db.daily_reports.find(
-        {"user_id": user_id},
-        {"_id": 0}
-    ).sort("date", -1).limit(limit).to_list(limit)
-    
-    for report in reports:
-        if isinstance(report.get('date'), str):
-            report['date'] = datetime.fromisoformat(report['date'])
-        if isinstance(report.get('created_at'), str):
-            report['created_at'] = datetime.fromisoformat(report['created_at'])
+async def get_reports(user_id: str, limit: int = 30, if_none_match: Optional[str] = Header(None)):
+    tag = await current_etag(user_id, str(limit), fresh=if_none_match is not None)
+    if etag_matches(if_none_match, tag):
+        return not_modified(tag)
+    reports = await store.reports.recent(user_id, limit)
     
-    return reports
+    return ORJSONResponse(reports, headers=validator_headers(tag))
+
+def chart_point(rollup: dict) -> dict:
+    return {
+        "date": rollup['period'],
+        "start": rollup['start'],
+        "sales": rollup.get('sales', 0),
+        "purchase": rollup.get('purchase', 0),
+        "expense": rollup.get('expense', 0)
+    }
 
 @api_router.get("/analytics/{user_id}")
-async def get_analytics(user_id: str, days: int = 30):
-    start_date = datetime.now(timezone.utc) - timedelta(days=days)
+async def get_analytics(
+    user_id: str,
+    days: int = 30,
+    granularity: str = "day",
+    periods: Optional[int] = Query(None, ge=1, le=3660),
+    compare: bool = False,
+    if_none_match: Optional[str] = Header(None),
+):
+    if granularity not in GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"granularity must be one of: {', '.join(GRANULARITIES)}")
+    # The window moves with the calendar, so the tag covers the day as well as the data.
+    tag = await current_etag(
+        user_id, datetime.now(timezone.utc).date().isoformat(), granularity, str(periods), str(compare), str(days),
+        fresh=if_none_match is not None,
+    )
+    if etag_matches(if_none_match, tag):
+        return not_modified(tag)
     
-    transactions = await db.transactions.find(
-        {
-            "user_id": user_id,
-            "date": {"$gte": start_date.isoformat()}
-        },
-        {"_id": 0}
-    ).to_list(10000)
+    # Served from pre-aggregated rollups: a 5-year monthly chart reads ~60 documents.
+    # `days` keeps its meaning for daily charts; `periods` counts buckets for any granularity.
+    count = periods or (days + 1 if granularity == "day" else DEFAULT_PERIODS[granularity])
+    last = period_start(granularity, datetime.now(timezone.utc).date())
+    first = shift_period(granularity, last, -(count - 1))
+    read_from = shift_period(granularity, first, -count) if compare else first
     
-    daily_data = {}
-    for trans in transactions:
-        trans_date = trans['date'][:10] if isinstance(trans['date'], str) else trans['date'].date().isoformat()
-        if trans_date not in daily_data:
-            daily_data[trans_date] = {"sales": 0, "purchase": 0, "expense": 0}
-        
-        category = trans['category'].lower()
-        if category in daily_data[trans_date]:
-            daily_data[trans_date][category] += trans['amount']
+    if granularity == "day":
+        rollups, stats = await asyncio.gather(
+            store.rollups.range(user_id, granularity, read_from, last),
+            store.rollups.stats(user_id),
+        )
+    else:
+        rollups, stats = await store.rollups.range(user_id, granularity, read_from, last), {}
+    current = [r for r in rollups if r['start'] >= first.isoformat()]
+    
+    result = {
+        "granularity": granularity,
+        "chart_data": [chart_point(r) for r in current],
+        "totals": sum_totals(current)
+    }
+    if granularity == "day":
+        result["anomalies"] = score_days(stats, current)
     
-    sorted_dates = sorted(daily_data.keys())
-    chart_data = [
-        {
-            "date": date,
-            "sales": daily_data[date]['sales'],
-            "purchase": daily_data[date]['purchase'],
-            "expense": daily_data[date]['expense']
+    if compare:
+        previous_totals = sum_totals(r for r in rollups if r['start'] < first.isoformat())
+        result["comparison"] = {
+            "previous_start": read_from.isoformat(),
+            "previous_totals": previous_totals,
+            "change_pct": {
+                key: (round((value - previous_totals[key]) / abs(previous_totals[key]) * 100, 2)
+                      if previous_totals[key] else None)
+                for key, value in result["totals"].items()
+            }
         }
-        for date in sorted_dates
-    ]
     
-    total_sales = sum(t['amount'] for t in transactions if t['category'].lower() == 'sales')
-    total_purchase = sum(t['amount'] for t in transactions if t['category'].lower() == 'purchase')
-    total_expense = sum(t['amount'] for t in transactions if t['category'].lower() == 'expense')
+    return ORJSONResponse(result, headers=validator_headers(tag))
+
+@api_router.get("/dashboard/{user_id}")
+async def get_dashboard(
+    user_id: str,
+    days: int = Query(7, ge=1, le=90),
+    limit: int = Query(10, ge=0, le=50),
+    if_none_match: Optional[str] = Header(None),
+):
+    """Everything the dashboard shows on load in one response: today's totals,
+    the daily series, the newest transactions and the latest stored report.
+    No LLM call; the client asks for a new report only when `report` is not today's."""
+    today = datetime.now(timezone.utc).date()
+    tag = await current_etag(user_id, today.isoformat(), str(days), str(limit), fresh=if_none_match is not None)
+    if etag_matches(if_none_match, tag):
+        return not_modified(tag)
+    
+    rollups, recent, reports = await asyncio.gather(
+        store.rollups.range(user_id, "day", today - timedelta(days=days), today),
+        store.transactions.recent(user_id, limit),
+        store.reports.recent(user_id, 1),
+    )
+    totals = sum_totals(r for r in rollups if r['start'] == today.isoformat())
     
+    return ORJSONResponse({
+        "today": {
+            "date": today.isoformat(),
+            "sales_total": totals["sales"],
+            "purchase_total": totals["purchase"],
+            "expense_total": totals["expense"],
+            "net_amount": totals["net"],
+        },
+        "chart_data": [chart_point(r) for r in rollups],
+        "totals": sum_totals(rollups),
+        "transactions": recent,
+        "report": reports[0] if reports else None,
+    }, headers=validator_headers(tag))
+
+@api_router.get("/analytics/{user_id}/insights")
+async def get_analytics_insights(user_id: str, horizon: int = Query(14, ge=1, le=90)):
+    today = datetime.now(timezone.utc).date()
+    insights = insights_cache.get(user_id, today.isoformat(), horizon)
+    if insights is None:
+        first = today - timedelta(days=ANALYTICS_LOOKBACK_DAYS - 1)
+        rollups = await store.rollups.range(user_id, "day", first, today)
+        # pandas work (and its first import) stays off the event loop.
+        insights = await asyncio.to_thread(compute_insights, rollups, today, ANALYTICS_LOOKBACK_DAYS, horizon)
+        insights_cache.put(user_id, today.isoformat(), horizon, insights)
+    return ORJSONResponse(insights)
+
+@public_router.get("/limits")
+async def get_limits():
+    return {"llm_admission": llm_admission.stats()}
+
+@public_router.get("/admin/profiles/{profile_id}")
+async def get_profile(profile_id: str, x_profile_token: Optional[str] = Header(None)):
+    if not token_matches(x_profile_token, PROFILE_TOKEN):
+        raise HTTPException(status_code=403, detail="Profiling is not enabled for this token")
+    path = profile_path(PROFILE_DIR, profile_id)
+    if path is None or not path.exists():
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=f"{profile_id}.folded")
+
+def voice_result(text: str, language: str) -> dict:
+    parsed = parse_utterance(text)
     return {
-        "chart_data": chart_data,
-        "totals": {
-            "sales": total_sales,
-            "purchase": total_purchase,
-            "expense": total_expense,
-            "net": total_sales - total_purchase - total_expense
-        }
+        "text": text,
+        "language": language,
+        "transaction": TransactionCreate(**parsed).model_dump(mode="json") if parsed else None,
     }
 
 @api_router.post("/voice/transcribe")
-async def transcribe_voice(voice_input: VoiceInput):
+async def transcribe_voice(voice_input: VoiceInput, current_user: str = Depends(authenticated_user)):
+    user_id = require_same_user(voice_input.user_id, current_user)
     try:
-        return {
-            "text": "यह एक नमूना प्रतिलेख है",
-            "language": "hi"
-        }
+        audio = base64.b64decode(voice_input.audio_base64, validate=True)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail="audio_base64 is not valid base64") from exc
+    async with llm_admission.slot(user_id):
+        session = asr_backend().open(voice_input.language)
+        try:
+            await session.feed(audio)
+            text = await session.finish()
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        finally:
+            await session.close()
+    return voice_result(text, voice_input.language)
+
+@api_router.websocket("/voice/stream")
+async def voice_stream(websocket: WebSocket, language: str = "hi", user_id: str = Depends(authenticated_user)):
+    """Binary frames carry audio chunks (e.g. MediaRecorder webm/opus slices);
+    a text frame {"type": "end"} closes the utterance. The server answers with
+    {"type": "partial", "text"} messages while audio arrives and one
+    {"type": "final", "text", "transaction"} at the end, where `transaction`
+    is the parsed TransactionCreate (or null) for the client to confirm."""
+    await websocket.accept()
+    try:
+        # Charged once per stream; the session holds the in-flight cap only
+        # around each backend call, not while the client talks (or is silent).
+        llm_admission.charge(user_id)
+        session = asr_backend().open(language, llm_admission.capacity)
+        try:
+            received = 0
+            while True:
+                try:
+                    message = await asyncio.wait_for(websocket.receive(), VOICE_IDLE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    await websocket.send_json({"type": "error", "detail": "No audio received"})
+                    await websocket.close(code=1001)
+                    return
+                if message["type"] == "websocket.disconnect":
+                    return
+                if message.get("bytes"):
+                    received += len(message["bytes"])
+                    if received > MAX_AUDIO_BYTES:
+                        await websocket.send_json({"type": "error", "detail": "Recording too long"})
+                        await websocket.close(code=1009)
+                        return
+                    partial = await session.feed(message["bytes"])
+                    if partial:
+                        await websocket.send_json({"type": "partial", "text": partial})
+                elif message.get("text") and orjson.loads(message["text"]).get("type") == "end":
+                    break
+            text = await session.finish()
+        finally:
+            await session.close()
+    except HTTPException as exc:
+        # Admission rejected (429): tell the client when to retry, then "try again later".
+        await websocket.send_json({"type": "error", "detail": exc.detail, "retry_after": (exc.headers or {}).get("Retry-After")})
+        await websocket.close(code=1013)
+        return
+    except WebSocketDisconnect:
+        return
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        await websocket.send_json({"type": "error", "detail": str(e)})
+        await websocket.close(code=1011)
+        return
+    await websocket.send_json({"type": "final", **voice_result(text, language)})
+    await websocket.close()
+
+@api_router.websocket("/live/{user_id}")
+async def live_updates(websocket: WebSocket, user_id: str):
+    """Pushes {"type": "day", "date", "start", "sales", "purchase", "expense"}
+    whenever one of the user's days changes, starting with today's totals.
+    Messages from the client are ignored."""
+    await websocket.accept()
+    with live_events.subscribe(user_id) as queue:
+        today = await store.rollups.get(user_id, "day", datetime.now(timezone.utc).date())
+        if today is not None:
+            await websocket.send_json(day_event(today))
+        receiver, event = asyncio.create_task(websocket.receive()), asyncio.create_task(queue.get())
+        try:
+            while True:
+                done, _ = await asyncio.wait({receiver, event}, return_when=asyncio.FIRST_COMPLETED)
+                if receiver in done:
+                    if receiver.result()["type"] == "websocket.disconnect":
+                        return
+                    receiver = asyncio.create_task(websocket.receive())
+                if event in done:
+                    await websocket.send_json(event.result())
+                    event = asyncio.create_task(queue.get())
+        except WebSocketDisconnect:
+            return
+        finally:
+            receiver.cancel()
+            event.cancel()
+
+def audio_url(key: str) -> str:
+    return f"/api/voice/audio/{key}"
 
 @api_router.post("/voice/speak")
-async def text_to_speech(tts_input: TextToSpeech):
+async def text_to_speech(tts_input: TextToSpeech, current_user: str = Depends(authenticated_user)):
+    if not tts_input.text.strip():
+        raise HTTPException(status_code=400, detail="text is required")
     try:
-        chat = LlmChat(
-            api_key=EMERGENT_KEY,
-            session_id=f"tts_{uuid.uuid4()}",
-            system_message="Convert text to speech."
-        ).with_model("openai", "gpt-4o")
-        
-        return {
-            "audio_url": None,
-            "text": tts_input.text,
-            "message": "TTS feature available - voice synthesis"
-        }
+        key, cached = await audio_cache.get_or_synthesize(
+            tts_input.text, tts_input.language, tts_synthesizer(), lambda: llm_admission.slot(current_user),
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    return {
+        "audio_url": audio_url(key),
+        "text": tts_input.text,
+        "language": tts_input.language,
+        "cached": cached,
+    }
 
+# Public: <audio> elements cannot send a token, and keys are content hashes.
+@public_router.get("/voice/audio/{key}")
+async def get_audio(key: str, range_header: Optional[str] = Header(None, alias="Range")):
+    path = audio_cache.path(key)
+    if path is None or not path.exists():
+        raise HTTPException(status_code=404, detail="Audio not found")
+    # Content-addressed, so a key's bytes never change.
+    headers = {"Accept-Ranges": "bytes", "Cache-Control": "public, max-age=31536000, immutable", "ETag": f'"{key}"'}
+    size = path.stat().st_size
+    try:
+        byte_range = parse_range(range_header, size)
+    except ValueError:
+        raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    if byte_range is None:
+        return FileResponse(path, media_type=AUDIO_MEDIA_TYPE, headers=headers)
+    start, end = byte_range
+    body = await asyncio.to_thread(read_range, path, start, end)
+    return Response(body, status_code=206, media_type=AUDIO_MEDIA_TYPE,
+                    headers={**headers, "Content-Range": f"bytes {start}-{end}/{size}"})
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+app.include_router(public_router)
 app.include_router(api_router)
 
 app.add_middleware(
@@ -400,12 +882,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(MetricsMiddleware, routes_source=lambda: app.router.routes)
+
+if PROFILE_TOKEN:
+    app.add_middleware(
+        ProfilingMiddleware,
+        token=PROFILE_TOKEN,
+        profile_dir=PROFILE_DIR,
+        interval=float(os.environ.get('PROFILE_INTERVAL_MS', '5')) / 1000,
+        max_seconds=float(os.environ.get('PROFILE_MAX_SECONDS', '30')),
+    )
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
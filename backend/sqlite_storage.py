@@ -0,0 +1,601 @@
+"""Embedded SQLite implementation of the storage repositories.
+
+One file, WAL journal, no server: enough for a single shop's install and for
+running the test suite without Mongo. All statements run on one dedicated
+thread that owns the connection, so the event loop never blocks on disk and
+writes are serialized without extra locking. Documents are stored as JSON next
+to the columns that are filtered, sorted or aggregated on; rollups and daily
+statistics are plain numeric columns updated with upserts, mirroring the
+Mongo `$inc`s in rollups.py and anomalies.py.
+"""
+import asyncio
+import logging
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, datetime, timezone
+from itertools import chain
+from typing import Callable, List, Optional
+
+import orjson
+
+from anomalies import build_daily_stats, stats_increment
+from archive import TransactionArchive
+from categories import CATEGORY_VALUES
+from rollups import build_rollups, rollup_increments, transaction_day
+from search import search_tokens
+from sync import pending_expiry, settled_version
+from storage import (
+    DuplicateKey, ReportRepository, RollupRepository, ScanRepository, Storage, SyncRepository,
+    TransactionFilter, TransactionRepository, UserRepository,
+)
+
+logger = logging.getLogger(__name__)
+
+TOTAL_COLUMNS = ", ".join(f"{c} REAL NOT NULL DEFAULT 0" for c in CATEGORY_VALUES)
+COUNT_COLUMNS = ", ".join(f"count_{c} INTEGER NOT NULL DEFAULT 0" for c in CATEGORY_VALUES)
+ROLLUP_FIELDS = ("user_id", "granularity", "start", "period", *CATEGORY_VALUES, *(f"count_{c}" for c in CATEGORY_VALUES))
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    email TEXT NOT NULL,
+    doc TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS transactions (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    category TEXT NOT NULL,
+    amount REAL NOT NULL,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transactions_user_date ON transactions (user_id, date DESC, id DESC);
+
+CREATE TABLE IF NOT EXISTS transaction_tokens (
+    user_id TEXT NOT NULL,
+    token TEXT NOT NULL,
+    date TEXT NOT NULL,
+    id TEXT NOT NULL,
+    PRIMARY KEY (user_id, token, date, id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS rollups (
+    user_id TEXT NOT NULL,
+    granularity TEXT NOT NULL,
+    start TEXT NOT NULL,
+    period TEXT NOT NULL,
+    {TOTAL_COLUMNS},
+    {COUNT_COLUMNS},
+    PRIMARY KEY (user_id, granularity, start)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS daily_stats (
+    user_id TEXT NOT NULL,
+    category TEXT NOT NULL,
+    n INTEGER NOT NULL DEFAULT 0,
+    sum REAL NOT NULL DEFAULT 0,
+    sumsq REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, category)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS daily_reports (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS daily_reports_user_date ON daily_reports (user_id, date DESC);
+
+CREATE TABLE IF NOT EXISTS document_scans (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS document_scans_user_created ON document_scans (user_id, created_at DESC);
+"""
+
+
+def execute_statements(conn: sqlite3.Connection, script: str):
+    """Run `;`-separated statements inside the caller's transaction
+    (unlike executescript, which commits first)."""
+    for statement in script.split(";"):
+        if statement.strip():
+            conn.execute(statement)
+
+
+def add_sync_versions(conn: sqlite3.Connection):
+    """Version columns, counters and tombstones for delta sync; existing rows
+    are numbered oldest first per user."""
+    execute_statements(conn, """
+        ALTER TABLE transactions ADD COLUMN version INTEGER NOT NULL DEFAULT 0;
+        ALTER TABLE daily_reports ADD COLUMN version INTEGER NOT NULL DEFAULT 0;
+        CREATE INDEX transactions_user_version ON transactions (user_id, version);
+        CREATE INDEX daily_reports_user_version ON daily_reports (user_id, version);
+        CREATE TABLE user_versions (
+            user_id TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        ) WITHOUT ROWID;
+        CREATE TABLE tombstones (
+            user_id TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            id TEXT NOT NULL,
+            deleted_at TEXT NOT NULL,
+            PRIMARY KEY (user_id, version)
+        ) WITHOUT ROWID;
+
+        CREATE TEMP TABLE numbered AS
+        SELECT kind, id, user_id, ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY date, id) AS version
+        FROM (SELECT 'transactions' AS kind, id, user_id, date FROM transactions
+              UNION ALL SELECT 'daily_reports', id, user_id, date FROM daily_reports);
+        UPDATE transactions SET version = n.version, doc = json_set(doc, '$.version', n.version)
+        FROM numbered n WHERE n.kind = 'transactions' AND n.id = transactions.id;
+        UPDATE daily_reports SET version = n.version, doc = json_set(doc, '$.version', n.version)
+        FROM numbered n WHERE n.kind = 'daily_reports' AND n.id = daily_reports.id;
+        INSERT INTO user_versions (user_id, version) SELECT user_id, MAX(version) FROM numbered GROUP BY user_id;
+        DROP TABLE numbered;
+    """)
+
+
+# Applied in order on top of SCHEMA and tracked in PRAGMA user_version.
+# Append new upgrades; never reorder or edit applied ones.
+def unique_user_emails(conn: sqlite3.Connection):
+    """One account per email. Existing duplicates keep the plain index (and an
+    error in the log) so the database still opens."""
+    duplicates = conn.execute("SELECT email FROM users GROUP BY email HAVING COUNT(*) > 1").fetchall()
+    if duplicates:
+        logger.error("users has %d duplicated emails; not making users.email unique", len(duplicates))
+        conn.execute("CREATE INDEX IF NOT EXISTS users_email ON users (email)")
+        return
+    execute_statements(conn, """
+        DROP INDEX IF EXISTS users_email;
+        CREATE UNIQUE INDEX users_email_unique ON users (email)
+    """)
+
+
+def add_pending_versions(conn: sqlite3.Connection):
+    """Versions taken but not yet written (SyncRepository.bump / settle)."""
+    conn.execute("""
+        CREATE TABLE pending_versions (
+            user_id TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            started_at TEXT NOT NULL,
+            PRIMARY KEY (user_id, version)
+        ) WITHOUT ROWID
+    """)
+
+
+UPGRADES = [
+    add_sync_versions,
+    unique_user_emails,
+    add_pending_versions,
+]
+
+
+def dumps(doc: dict) -> str:
+    return orjson.dumps(doc).decode()
+
+
+class SQLiteDatabase:
+    """A connection confined to its own thread; `run(fn)` calls fn(conn) there."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self.conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL: commits survive a process crash, and only an OS crash can lose the last ones.
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.executescript(SCHEMA)
+        applied = conn.execute("PRAGMA user_version").fetchone()[0]
+        for number, upgrade in enumerate(UPGRADES[applied:], start=applied + 1):
+            with write_transaction(conn):
+                upgrade(conn)
+                conn.execute(f"PRAGMA user_version = {number}")
+        self.conn = conn
+
+    async def run(self, fn: Callable[[sqlite3.Connection], object]):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, self.conn)
+
+    async def open(self):
+        await asyncio.get_running_loop().run_in_executor(self.executor, self._connect)
+
+    async def close(self):
+        if self.conn is not None:
+            await self.run(lambda conn: conn.close())
+            self.conn = None
+        self.executor.shutdown(wait=False)
+
+
+@contextmanager
+def write_transaction(conn: sqlite3.Connection):
+    """BEGIN IMMEDIATE ... COMMIT, or ROLLBACK if the block raises."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+class SQLiteUserRepository(UserRepository):
+    def __init__(self, database: SQLiteDatabase):
+        self.database = database
+
+    async def get_by_email(self, email: str) -> Optional[dict]:
+        def get(conn):
+            row = conn.execute("SELECT doc FROM users WHERE email = ? LIMIT 1", (email,)).fetchone()
+            return orjson.loads(row["doc"]) if row else None
+        return await self.database.run(get)
+
+    async def insert(self, doc: dict):
+        def insert(conn):
+            with unique_violations():
+                conn.execute("INSERT INTO users (id, email, doc) VALUES (?, ?, ?)", (doc["id"], doc["email"], dumps(doc)))
+        await self.database.run(insert)
+
+
+@contextmanager
+def unique_violations():
+    """Raise storage.DuplicateKey for UNIQUE/PRIMARY KEY conflicts, like the Mongo backend."""
+    try:
+        yield
+    except sqlite3.IntegrityError as exc:
+        if "UNIQUE" in str(exc):
+            raise DuplicateKey(str(exc)) from exc
+        raise
+
+
+def insert_transactions(conn: sqlite3.Connection, docs: List[dict]):
+    with unique_violations(), write_transaction(conn):
+        conn.executemany(
+            "INSERT INTO transactions (id, user_id, date, category, amount, version, doc) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(d["id"], d["user_id"], d["date"], d["category"], d["amount"], d.get("version", 0), dumps(d)) for d in docs],
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO transaction_tokens (user_id, token, date, id) VALUES (?, ?, ?, ?)",
+            [(d["user_id"], token, d["date"], d["id"]) for d in docs for token in search_tokens(d.get("description"))],
+        )
+
+
+class SQLiteTransactionRepository(TransactionRepository):
+    def __init__(self, database: SQLiteDatabase):
+        self.database = database
+
+    async def insert(self, doc: dict):
+        await self.database.run(lambda conn: insert_transactions(conn, [doc]))
+
+    async def insert_many(self, docs: List[dict]):
+        await self.database.run(lambda conn: insert_transactions(conn, docs))
+
+    async def get(self, user_id: str, transaction_id: str) -> Optional[dict]:
+        def get(conn):
+            row = conn.execute(
+                "SELECT doc FROM transactions WHERE id = ? AND user_id = ?", (transaction_id, user_id)
+            ).fetchone()
+            return orjson.loads(row["doc"]) if row else None
+        return await self.database.run(get)
+
+    async def delete(self, user_id: str, transaction_id: str) -> Optional[dict]:
+        def delete(conn):
+            with write_transaction(conn):
+                row = conn.execute(
+                    "DELETE FROM transactions WHERE id = ? AND user_id = ? RETURNING doc", (transaction_id, user_id)
+                ).fetchone()
+                if row is None:
+                    return None
+                doc = orjson.loads(row["doc"])
+                conn.execute(
+                    "DELETE FROM transaction_tokens WHERE user_id = ? AND date = ? AND id = ?",
+                    (user_id, doc["date"], transaction_id),
+                )
+                return doc
+        return await self.database.run(delete)
+
+    async def recent(self, user_id: str, limit: int) -> List[dict]:
+        def recent(conn):
+            rows = conn.execute(
+                "SELECT doc FROM transactions WHERE user_id = ? ORDER BY date DESC, id DESC LIMIT ?", (user_id, limit)
+            )
+            return [orjson.loads(row["doc"]) for row in rows]
+        return await self.database.run(recent)
+
+    async def changed_since(self, user_id: str, since: int, limit: int) -> List[dict]:
+        def changed(conn):
+            rows = conn.execute(
+                "SELECT doc FROM transactions WHERE user_id = ? AND version > ? ORDER BY version LIMIT ?",
+                (user_id, since, limit),
+            )
+            return [orjson.loads(row["doc"]) for row in rows]
+        return await self.database.run(changed)
+
+    async def search(self, user_id: str, criteria: TransactionFilter, limit: int) -> List[dict]:
+        # The first token drives the scan through the token table's
+        # (user_id, token, date, id) key, already in result order; the rest are probes.
+        if criteria.tokens:
+            sql = ["SELECT t.doc FROM transaction_tokens k JOIN transactions t ON t.id = k.id",
+                   "WHERE k.user_id = ? AND k.token = ?"]
+            params = [user_id, criteria.tokens[0]]
+            order = "k.date DESC, k.id DESC"
+        else:
+            sql = ["SELECT t.doc FROM transactions t WHERE t.user_id = ?"]
+            params = [user_id]
+            order = "t.date DESC, t.id DESC"
+        for token in criteria.tokens[1:]:
+            sql.append("AND t.id IN (SELECT id FROM transaction_tokens WHERE user_id = ? AND token = ?)")
+            params += [user_id, token]
+        for clause, value in (
+            ("t.category = ?", criteria.category),
+            ("t.date >= ?", criteria.date_from),
+            ("t.date < ?", criteria.date_before),
+            ("t.amount >= ?", criteria.amount_min),
+            ("t.amount <= ?", criteria.amount_max),
+        ):
+            if value is not None:
+                sql.append(f"AND {clause}")
+                params.append(value)
+        if criteria.after:
+            date_value, transaction_id = criteria.after
+            sql.append("AND (t.date < ? OR (t.date = ? AND t.id < ?))")
+            params += [date_value, date_value, transaction_id]
+        sql.append(f"ORDER BY {order} LIMIT ?")
+        params.append(limit)
+        query = " ".join(sql)
+        return await self.database.run(lambda conn: [orjson.loads(row["doc"]) for row in conn.execute(query, params)])
+
+    async def user_ids(self) -> List[str]:
+        return await self.database.run(
+            lambda conn: [row["user_id"] for row in conn.execute("SELECT DISTINCT user_id FROM transactions")]
+        )
+
+    async def older_than(self, user_id: str, before: str, limit: int) -> List[dict]:
+        def older(conn):
+            rows = conn.execute(
+                "SELECT doc FROM transactions WHERE user_id = ? AND date < ? ORDER BY date, id LIMIT ?",
+                (user_id, before, limit),
+            )
+            return [orjson.loads(row["doc"]) for row in rows]
+        return await self.database.run(older)
+
+    async def delete_many(self, user_id: str, transaction_ids: List[str]):
+        def delete(conn):
+            with write_transaction(conn):
+                for start in range(0, len(transaction_ids), 500):
+                    chunk = transaction_ids[start:start + 500]
+                    placeholders = ", ".join("?" for _ in chunk)
+                    conn.execute(
+                        f"DELETE FROM transaction_tokens WHERE user_id = ? AND id IN ({placeholders})", (user_id, *chunk)
+                    )
+                    conn.execute(
+                        f"DELETE FROM transactions WHERE user_id = ? AND id IN ({placeholders})", (user_id, *chunk)
+                    )
+        await self.database.run(delete)
+
+
+def rollup_dict(row: sqlite3.Row) -> dict:
+    return {field: row[field] for field in ROLLUP_FIELDS}
+
+
+def upsert_rollups(conn: sqlite3.Connection, docs: List[dict]):
+    columns = ", ".join(ROLLUP_FIELDS)
+    placeholders = ", ".join("?" for _ in ROLLUP_FIELDS)
+    conn.executemany(
+        f"INSERT INTO rollups ({columns}) VALUES ({placeholders})",
+        [tuple(doc.get(field, 0) for field in ROLLUP_FIELDS) for doc in docs],
+    )
+
+
+def apply_change(conn: sqlite3.Connection, user_id: str, date_value: str, category: str, amount: float, count: int) -> dict:
+    """The rollup and daily_stats upserts for one transaction; returns its day rollup.
+    Runs inside the caller's write_transaction."""
+    day_rollup = None
+    for key, update in rollup_increments(user_id, transaction_day(date_value), category, amount, count):
+        row = conn.execute(
+            f"INSERT INTO rollups (user_id, granularity, start, period, {category}, count_{category}) "
+            f"VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (user_id, granularity, start) DO UPDATE SET "
+            f"{category} = {category} + excluded.{category}, "
+            f"count_{category} = count_{category} + excluded.count_{category} RETURNING *",
+            (user_id, key["granularity"], key["start"], update["$setOnInsert"]["period"], amount, count),
+        ).fetchone()
+        if key["granularity"] == "day":
+            day_rollup = rollup_dict(row)
+    inc = stats_increment(category, amount, day_rollup[category], day_rollup[f"count_{category}"], count)
+    conn.execute(
+        "INSERT INTO daily_stats (user_id, category, n, sum, sumsq) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT (user_id, category) DO UPDATE SET "
+        "n = n + excluded.n, sum = sum + excluded.sum, sumsq = sumsq + excluded.sumsq",
+        (user_id, category, inc.get(f"{category}.n", 0), inc[f"{category}.sum"], inc[f"{category}.sumsq"]),
+    )
+    return day_rollup
+
+
+class SQLiteRollupRepository(RollupRepository):
+    def __init__(self, database: SQLiteDatabase, archive: Optional[TransactionArchive] = None):
+        self.database = database
+        self.archive = archive
+
+    async def apply(self, user_id: str, date_value: str, category: str, amount: float, count: int = 1) -> dict:
+        if category not in CATEGORY_VALUES:
+            raise ValueError(f"Unknown category '{category}'")
+
+        def apply(conn):
+            with write_transaction(conn):
+                return apply_change(conn, user_id, date_value, category, amount, count)
+        return await self.database.run(apply)
+
+    async def apply_many(self, docs: List[dict]) -> List[dict]:
+        """One write transaction (one commit) for the whole batch."""
+        unknown = [doc["category"] for doc in docs if doc["category"] not in CATEGORY_VALUES]
+        if unknown:
+            raise ValueError(f"Unknown category '{unknown[0]}'")
+
+        def apply(conn):
+            with write_transaction(conn):
+                return [apply_change(conn, doc["user_id"], doc["date"], doc["category"], doc["amount"], 1) for doc in docs]
+        return await self.database.run(apply)
+
+    async def get(self, user_id: str, granularity: str, start: date) -> Optional[dict]:
+        def get(conn):
+            row = conn.execute(
+                "SELECT * FROM rollups WHERE user_id = ? AND granularity = ? AND start = ?",
+                (user_id, granularity, start.isoformat()),
+            ).fetchone()
+            return rollup_dict(row) if row else None
+        return await self.database.run(get)
+
+    async def range(self, user_id: str, granularity: str, first: date, last: date) -> List[dict]:
+        def read(conn):
+            rows = conn.execute(
+                "SELECT * FROM rollups WHERE user_id = ? AND granularity = ? AND start BETWEEN ? AND ? ORDER BY start",
+                (user_id, granularity, first.isoformat(), last.isoformat()),
+            )
+            return [rollup_dict(row) for row in rows]
+        return await self.database.run(read)
+
+    async def stats(self, user_id: str) -> dict:
+        def read(conn):
+            rows = conn.execute("SELECT category, n, sum, sumsq FROM daily_stats WHERE user_id = ?", (user_id,))
+            return {row["category"]: {"n": row["n"], "sum": row["sum"], "sumsq": row["sumsq"]} for row in rows}
+        return await self.database.run(read)
+
+    async def rebuild(self, user_id: Optional[str] = None):
+        where, params = ("AND user_id = ?", (user_id,)) if user_id else ("", ())
+        placeholders = ", ".join("?" for _ in CATEGORY_VALUES)
+        archived = await asyncio.to_thread(self.archive.daily_totals, user_id) if self.archive else []
+
+        def rebuild(conn):
+            daily = conn.execute(
+                f"SELECT user_id, substr(date, 1, 10) AS day, category, SUM(amount) AS total, COUNT(*) AS count "
+                f"FROM transactions WHERE category IN ({placeholders}) {where} GROUP BY user_id, day, category",
+                (*CATEGORY_VALUES, *params),
+            )
+            docs = build_rollups(chain((dict(row) for row in daily), archived))
+            stats = build_daily_stats(doc for doc in docs if doc["granularity"] == "day")
+            with write_transaction(conn):
+                conn.execute(f"DELETE FROM rollups WHERE 1 = 1 {where}", params)
+                conn.execute(f"DELETE FROM daily_stats WHERE 1 = 1 {where}", params)
+                upsert_rollups(conn, docs)
+                conn.executemany(
+                    "INSERT INTO daily_stats (user_id, category, n, sum, sumsq) VALUES (?, ?, ?, ?, ?)",
+                    [(doc["user_id"], category, m["n"], m["sum"], m["sumsq"])
+                     for doc in stats for category, m in doc.items() if category != "user_id"],
+                )
+        await self.database.run(rebuild)
+
+
+class SQLiteReportRepository(ReportRepository):
+    def __init__(self, database: SQLiteDatabase):
+        self.database = database
+
+    async def insert(self, doc: dict):
+        await self.database.run(lambda conn: conn.execute(
+            "INSERT INTO daily_reports (id, user_id, date, version, doc) VALUES (?, ?, ?, ?, ?)",
+            (doc["id"], doc["user_id"], doc["date"], doc.get("version", 0), dumps(doc)),
+        ))
+
+    async def recent(self, user_id: str, limit: int) -> List[dict]:
+        def recent(conn):
+            rows = conn.execute(
+                "SELECT doc FROM daily_reports WHERE user_id = ? ORDER BY date DESC LIMIT ?", (user_id, limit)
+            )
+            return [orjson.loads(row["doc"]) for row in rows]
+        return await self.database.run(recent)
+
+    async def changed_since(self, user_id: str, since: int, limit: int) -> List[dict]:
+        def changed(conn):
+            rows = conn.execute(
+                "SELECT doc FROM daily_reports WHERE user_id = ? AND version > ? ORDER BY version LIMIT ?",
+                (user_id, since, limit),
+            )
+            return [orjson.loads(row["doc"]) for row in rows]
+        return await self.database.run(changed)
+
+
+class SQLiteScanRepository(ScanRepository):
+    def __init__(self, database: SQLiteDatabase):
+        self.database = database
+
+    async def insert(self, doc: dict):
+        await self.database.run(lambda conn: conn.execute(
+            "INSERT INTO document_scans (id, user_id, created_at, doc) VALUES (?, ?, ?, ?)",
+            (doc["id"], doc["user_id"], doc["created_at"], dumps(doc)),
+        ))
+
+
+class SQLiteSyncRepository(SyncRepository):
+    def __init__(self, database: SQLiteDatabase):
+        self.database = database
+
+    async def bump(self, user_id: str) -> int:
+        def bump(conn):
+            with write_transaction(conn):
+                version = conn.execute(
+                    "INSERT INTO user_versions (user_id, version) VALUES (?, 1) "
+                    "ON CONFLICT (user_id) DO UPDATE SET version = version + 1 RETURNING version",
+                    (user_id,),
+                ).fetchone()[0]
+                conn.execute(
+                    "INSERT INTO pending_versions (user_id, version, started_at) VALUES (?, ?, ?)",
+                    (user_id, version, datetime.now(timezone.utc).isoformat()),
+                )
+                return version
+        return await self.database.run(bump)
+
+    async def settle(self, user_id: str, version: int):
+        await self.database.run(lambda conn: conn.execute(
+            "DELETE FROM pending_versions WHERE user_id = ? AND (version = ? OR started_at < ?)",
+            (user_id, version, pending_expiry()),
+        ))
+
+    async def current(self, user_id: str) -> int:
+        def current(conn):
+            row = conn.execute("SELECT version FROM user_versions WHERE user_id = ?", (user_id,)).fetchone()
+            if row is None:
+                return 0
+            pending = conn.execute("SELECT version, started_at FROM pending_versions WHERE user_id = ?", (user_id,))
+            return settled_version(row[0], [tuple(p) for p in pending])
+        return await self.database.run(current)
+
+    async def record_deletion(self, user_id: str, kind: str, record_id: str, version: int):
+        deleted_at = datetime.now(timezone.utc).isoformat()
+        await self.database.run(lambda conn: conn.execute(
+            "INSERT INTO tombstones (user_id, version, kind, id, deleted_at) VALUES (?, ?, ?, ?, ?)",
+            (user_id, version, kind, record_id, deleted_at),
+        ))
+
+    async def deletions_since(self, user_id: str, since: int, limit: int) -> List[dict]:
+        def deletions(conn):
+            rows = conn.execute(
+                "SELECT kind, id, version, deleted_at FROM tombstones WHERE user_id = ? AND version > ? "
+                "ORDER BY version LIMIT ?",
+                (user_id, since, limit),
+            )
+            return [dict(row) for row in rows]
+        return await self.database.run(deletions)
+
+
+class SQLiteStorage(Storage):
+    def __init__(self, path: str, archive: Optional[TransactionArchive] = None):
+        self.database = SQLiteDatabase(path)
+        self.archive = archive
+        self.users = SQLiteUserRepository(self.database)
+        self.transactions = SQLiteTransactionRepository(self.database)
+        self.rollups = SQLiteRollupRepository(self.database, archive)
+        self.reports = SQLiteReportRepository(self.database)
+        self.scans = SQLiteScanRepository(self.database)
+        self.sync = SQLiteSyncRepository(self.database)
+
+    async def open(self):
+        await self.database.open()
+
+    async def close(self):
+        await self.database.close()
@@ -0,0 +1,436 @@
+"""Repository layer between the API handlers and the database.
+
+Handlers talk to a `Storage` (`store.users`, `store.transactions`,
+`store.rollups`, `store.reports`, `store.scans`) instead of Mongo collections,
+so the same API runs against MongoDB (`MongoStorage`, the default) or an
+embedded SQLite file (`SQLiteStorage` in sqlite_storage.py) for single-shop
+installs and tests. STORAGE_BACKEND picks one at startup. `store.archive`
+(archive.py) holds transactions old enough to be moved out of either.
+
+Repositories take and return plain dicts shaped like the API documents (ISO
+string dates, no `_id`). Inserting a record whose unique key exists raises
+`DuplicateKey` on every backend.
+"""
+import asyncio
+import os
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from typing import List, Optional, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError, WriteError
+
+from anomalies import read_stats
+from archive import TransactionArchive
+from database import create_mongo_client, mongo_client_options, warm_up
+from migrations import run_migrations
+from rollups import apply_transaction, apply_transactions, read_rollups, rebuild_rollups, rollup_key
+from search import search_tokens
+from sync import pending_expiry, settled_version
+
+
+class DuplicateKey(Exception):
+    """A record with the same unique key (e.g. transaction id) already exists."""
+
+
+@dataclass
+class TransactionFilter:
+    """Search criteria. `tokens` come from search.query_tokens; dates are ISO days,
+    `date_before` exclusive; `after` is the (date, id) of the previous page's last row."""
+    tokens: Tuple[str, ...] = ()
+    category: Optional[str] = None
+    date_from: Optional[str] = None
+    date_before: Optional[str] = None
+    amount_min: Optional[float] = None
+    amount_max: Optional[float] = None
+    after: Optional[Tuple[str, str]] = None
+
+
+class UserRepository:
+    async def get_by_email(self, email: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    async def insert(self, doc: dict):
+        """Raises DuplicateKey if the email is already registered."""
+        raise NotImplementedError
+
+
+class TransactionRepository:
+    async def insert(self, doc: dict):
+        raise NotImplementedError
+
+    async def insert_many(self, docs: List[dict]):
+        raise NotImplementedError
+
+    async def insert_batch(self, docs: List[dict]) -> List[Optional[BaseException]]:
+        """Insert `docs` together; returns each document's error (or None), in order.
+
+        The default suits backends whose insert_many is all-or-nothing: if the
+        batch fails, documents are retried one by one so that only the bad ones fail.
+        """
+        try:
+            await self.insert_many(docs)
+            return [None] * len(docs)
+        except Exception:
+            errors = []
+            for doc in docs:
+                try:
+                    await self.insert(doc)
+                    errors.append(None)
+                except Exception as exc:
+                    errors.append(exc)
+            return errors
+
+    async def get(self, user_id: str, transaction_id: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    async def delete(self, user_id: str, transaction_id: str) -> Optional[dict]:
+        """Remove and return the transaction, or None if there was none."""
+        raise NotImplementedError
+
+    async def recent(self, user_id: str, limit: int) -> List[dict]:
+        """Newest first."""
+        raise NotImplementedError
+
+    async def changed_since(self, user_id: str, since: int, limit: int) -> List[dict]:
+        """Transactions with a sync version above `since`, lowest version first."""
+        raise NotImplementedError
+
+    async def search(self, user_id: str, criteria: TransactionFilter, limit: int) -> List[dict]:
+        """Matches in (date, id) descending order."""
+        raise NotImplementedError
+
+    async def user_ids(self) -> List[str]:
+        raise NotImplementedError
+
+    async def older_than(self, user_id: str, before: str, limit: int) -> List[dict]:
+        """The user's oldest transactions dated before `before`, for archive.py."""
+        raise NotImplementedError
+
+    async def delete_many(self, user_id: str, transaction_ids: List[str]):
+        raise NotImplementedError
+
+
+class RollupRepository:
+    async def apply(self, user_id: str, date_value: str, category: str, amount: float, count: int = 1) -> dict:
+        """Add one transaction to its period totals and the daily statistics; returns the day rollup."""
+        raise NotImplementedError
+
+    async def apply_many(self, docs: List[dict]) -> List[dict]:
+        """`apply` for a batch of new transactions; returns each one's day rollup, in order."""
+        return [await self.apply(doc["user_id"], doc["date"], doc["category"], doc["amount"]) for doc in docs]
+
+    async def get(self, user_id: str, granularity: str, start: date) -> Optional[dict]:
+        raise NotImplementedError
+
+    async def range(self, user_id: str, granularity: str, first: date, last: date) -> List[dict]:
+        """Rollups starting within [first, last], oldest first."""
+        raise NotImplementedError
+
+    async def stats(self, user_id: str) -> dict:
+        """Running daily statistics, shaped {category: {"n", "sum", "sumsq"}}."""
+        raise NotImplementedError
+
+    async def rebuild(self, user_id: Optional[str] = None):
+        """Recompute from live transactions plus the archive's daily totals."""
+        raise NotImplementedError
+
+
+class ReportRepository:
+    async def insert(self, doc: dict):
+        raise NotImplementedError
+
+    async def recent(self, user_id: str, limit: int) -> List[dict]:
+        raise NotImplementedError
+
+    async def changed_since(self, user_id: str, since: int, limit: int) -> List[dict]:
+        raise NotImplementedError
+
+
+class ScanRepository:
+    async def insert(self, doc: dict):
+        raise NotImplementedError
+
+
+class SyncRepository:
+    """Per-user change versions for delta sync (see sync.py)."""
+
+    async def bump(self, user_id: str) -> int:
+        """Atomically take the user's next version and mark it pending; pair with `settle`."""
+        raise NotImplementedError
+
+    async def settle(self, user_id: str, version: int):
+        """The write carrying `version` has landed (or failed): it is no longer pending."""
+        raise NotImplementedError
+
+    async def current(self, user_id: str) -> int:
+        """Highest version with nothing pending at or below it (sync.settled_version),
+        across every process sharing the store."""
+        raise NotImplementedError
+
+    async def record_deletion(self, user_id: str, kind: str, record_id: str, version: int):
+        raise NotImplementedError
+
+    async def deletions_since(self, user_id: str, since: int, limit: int) -> List[dict]:
+        """Tombstones {"kind", "id", "version", "deleted_at"} above `since`, lowest version first."""
+        raise NotImplementedError
+
+
+class Storage:
+    users: UserRepository
+    transactions: TransactionRepository
+    rollups: RollupRepository
+    reports: ReportRepository
+    scans: ScanRepository
+    sync: SyncRepository
+    archive: Optional[TransactionArchive] = None
+
+    async def open(self):
+        pass
+
+    async def close(self):
+        pass
+
+
+# Stored transactions also carry search_tokens (see search.py), which is never returned.
+TRANSACTION_FIELDS = {"_id": 0, "search_tokens": 0}
+
+
+class MongoUserRepository(UserRepository):
+    def __init__(self, db):
+        self.db = db
+
+    async def get_by_email(self, email: str) -> Optional[dict]:
+        return await self.db.users.find_one(
+            {"email": email}, {"_id": 0, "id": 1, "username": 1, "email": 1, "password": 1}
+        )
+
+    async def insert(self, doc: dict):
+        try:
+            await self.db.users.insert_one(dict(doc))
+        except DuplicateKeyError as exc:
+            raise DuplicateKey(str(exc)) from exc
+
+
+class MongoTransactionRepository(TransactionRepository):
+    def __init__(self, db):
+        self.db = db
+
+    async def insert(self, doc: dict):
+        try:
+            await self.db.transactions.insert_one({**doc, "search_tokens": search_tokens(doc.get("description"))})
+        except DuplicateKeyError as exc:
+            raise DuplicateKey(str(exc)) from exc
+
+    async def insert_many(self, docs: List[dict]):
+        await self.db.transactions.insert_many(
+            [{**doc, "search_tokens": search_tokens(doc.get("description"))} for doc in docs], ordered=False
+        )
+
+    async def insert_batch(self, docs: List[dict]) -> List[Optional[BaseException]]:
+        # Unordered insert_many writes every document it can and reports the rest by index.
+        errors: List[Optional[BaseException]] = [None] * len(docs)
+        try:
+            await self.insert_many(docs)
+        except BulkWriteError as exc:
+            if exc.details.get("writeConcernErrors"):
+                return [exc] * len(docs)
+            for error in exc.details.get("writeErrors", []):
+                if error.get("code") == 11000:
+                    errors[error["index"]] = DuplicateKey(error.get("errmsg"))
+                else:
+                    errors[error["index"]] = WriteError(error.get("errmsg"), error.get("code"), error)
+        return errors
+
+    async def get(self, user_id: str, transaction_id: str) -> Optional[dict]:
+        return await self.db.transactions.find_one({"user_id": user_id, "id": transaction_id}, TRANSACTION_FIELDS)
+
+    async def delete(self, user_id: str, transaction_id: str) -> Optional[dict]:
+        return await self.db.transactions.find_one_and_delete(
+            {"user_id": user_id, "id": transaction_id}, projection=TRANSACTION_FIELDS
+        )
+
+    async def recent(self, user_id: str, limit: int) -> List[dict]:
+        return await self.db.transactions.find(
+            {"user_id": user_id}, TRANSACTION_FIELDS
+        ).sort("date", -1).limit(limit).to_list(limit)
+
+    async def changed_since(self, user_id: str, since: int, limit: int) -> List[dict]:
+        return await self.db.transactions.find(
+            {"user_id": user_id, "version": {"$gt": since}}, TRANSACTION_FIELDS
+        ).sort("version", 1).limit(limit).to_list(limit)
+
+    async def search(self, user_id: str, criteria: TransactionFilter, limit: int) -> List[dict]:
+        query = {"user_id": user_id}
+        if criteria.tokens:
+            query["search_tokens"] = {"$all": list(criteria.tokens)}
+        if criteria.category:
+            query["category"] = criteria.category
+        if criteria.date_from:
+            query.setdefault("date", {})["$gte"] = criteria.date_from
+        if criteria.date_before:
+            query.setdefault("date", {})["$lt"] = criteria.date_before
+        if criteria.amount_min is not None:
+            query.setdefault("amount", {})["$gte"] = criteria.amount_min
+        if criteria.amount_max is not None:
+            query.setdefault("amount", {})["$lte"] = criteria.amount_max
+        if criteria.after:
+            date_value, transaction_id = criteria.after
+            query["$or"] = [
+                {"date": {"$lt": date_value}},
+                {"date": date_value, "id": {"$lt": transaction_id}},
+            ]
+        return await self.db.transactions.find(query, TRANSACTION_FIELDS).sort(
+            [("date", -1), ("id", -1)]
+        ).limit(limit).to_list(limit)
+
+    async def user_ids(self) -> List[str]:
+        return await self.db.transactions.distinct("user_id")
+
+    async def older_than(self, user_id: str, before: str, limit: int) -> List[dict]:
+        return await self.db.transactions.find(
+            {"user_id": user_id, "date": {"$lt": before}}, TRANSACTION_FIELDS
+        ).sort("date", 1).limit(limit).to_list(limit)
+
+    async def delete_many(self, user_id: str, transaction_ids: List[str]):
+        await self.db.transactions.delete_many({"user_id": user_id, "id": {"$in": transaction_ids}})
+
+
+class MongoRollupRepository(RollupRepository):
+    def __init__(self, db, archive: Optional[TransactionArchive] = None):
+        self.db = db
+        self.archive = archive
+
+    async def apply(self, user_id: str, date_value: str, category: str, amount: float, count: int = 1) -> dict:
+        return await apply_transaction(self.db, user_id, date_value, category, amount, count)
+
+    async def apply_many(self, docs: List[dict]) -> List[dict]:
+        return await apply_transactions(self.db, docs) if docs else []
+
+    async def get(self, user_id: str, granularity: str, start: date) -> Optional[dict]:
+        return await self.db.rollups.find_one(rollup_key(user_id, granularity, start), {"_id": 0})
+
+    async def range(self, user_id: str, granularity: str, first: date, last: date) -> List[dict]:
+        return await read_rollups(self.db, user_id, granularity, first, last)
+
+    async def stats(self, user_id: str) -> dict:
+        return await read_stats(self.db, user_id)
+
+    async def rebuild(self, user_id: Optional[str] = None):
+        archived = await asyncio.to_thread(self.archive.daily_totals, user_id) if self.archive else []
+        await rebuild_rollups(self.db, user_id, archived)
+
+
+class MongoReportRepository(ReportRepository):
+    def __init__(self, db):
+        self.db = db
+
+    async def insert(self, doc: dict):
+        await self.db.daily_reports.insert_one(dict(doc))
+
+    async def recent(self, user_id: str, limit: int) -> List[dict]:
+        return await self.db.daily_reports.find(
+            {"user_id": user_id}, {"_id": 0}
+        ).sort("date", -1).limit(limit).to_list(limit)
+
+    async def changed_since(self, user_id: str, since: int, limit: int) -> List[dict]:
+        return await self.db.daily_reports.find(
+            {"user_id": user_id, "version": {"$gt": since}}, {"_id": 0}
+        ).sort("version", 1).limit(limit).to_list(limit)
+
+
+class MongoScanRepository(ScanRepository):
+    def __init__(self, db):
+        self.db = db
+
+    async def insert(self, doc: dict):
+        await self.db.document_scans.insert_one(dict(doc))
+
+
+class MongoSyncRepository(SyncRepository):
+    def __init__(self, db):
+        self.db = db
+
+    async def bump(self, user_id: str) -> int:
+        # Compare-and-set, so the new version and its pending entry land in one write.
+        while True:
+            doc = await self.db.user_versions.find_one({"_id": user_id}, {"version": 1})
+            started_at = datetime.now(timezone.utc).isoformat()
+            if doc is None:
+                try:
+                    await self.db.user_versions.insert_one(
+                        {"_id": user_id, "version": 1, "pending": [{"version": 1, "started_at": started_at}]}
+                    )
+                    return 1
+                except DuplicateKeyError:
+                    continue
+            version = doc["version"] + 1
+            result = await self.db.user_versions.update_one(
+                {"_id": user_id, "version": doc["version"]},
+                {"$set": {"version": version}, "$push": {"pending": {"version": version, "started_at": started_at}}},
+            )
+            if result.modified_count:
+                return version
+
+    async def settle(self, user_id: str, version: int):
+        await self.db.user_versions.update_one({"_id": user_id}, {"$pull": {"pending": {"version": version}}})
+
+    async def current(self, user_id: str) -> int:
+        doc = await self.db.user_versions.find_one({"_id": user_id})
+        if doc is None:
+            return 0
+        pending = [(p["version"], p["started_at"]) for p in doc.get("pending", [])]
+        expired = pending_expiry()
+        if any(started_at < expired for _, started_at in pending):
+            await self.db.user_versions.update_one({"_id": user_id}, {"$pull": {"pending": {"started_at": {"$lt": expired}}}})
+        return settled_version(doc["version"], pending)
+
+    async def record_deletion(self, user_id: str, kind: str, record_id: str, version: int):
+        await self.db.tombstones.insert_one({
+            "user_id": user_id, "kind": kind, "id": record_id, "version": version,
+            "deleted_at": datetime.now(timezone.utc).isoformat(),
+        })
+
+    async def deletions_since(self, user_id: str, since: int, limit: int) -> List[dict]:
+        return await self.db.tombstones.find(
+            {"user_id": user_id, "version": {"$gt": since}}, {"_id": 0, "user_id": 0}
+        ).sort("version", 1).limit(limit).to_list(limit)
+
+
+class MongoStorage(Storage):
+    """Repositories over a Motor database. Pass `client` to have `open` warm the
+    pool, create indexes and run migrations, and `close` disconnect."""
+
+    def __init__(self, db, client=None, archive: Optional[TransactionArchive] = None):
+        self.db = db
+        self.client = client
+        self.archive = archive
+        self.users = MongoUserRepository(db)
+        self.transactions = MongoTransactionRepository(db)
+        self.rollups = MongoRollupRepository(db, archive)
+        self.reports = MongoReportRepository(db)
+        self.scans = MongoScanRepository(db)
+        self.sync = MongoSyncRepository(db)
+
+    async def open(self):
+        if self.client is not None:
+            await warm_up(self.db, mongo_client_options()["minPoolSize"])
+            await run_migrations(self.db)
+
+    async def close(self):
+        if self.client is not None:
+            self.client.close()
+
+
+def create_storage(root_dir) -> Storage:
+    """Storage named by STORAGE_BACKEND ("mongo" or "sqlite"), configured from the environment."""
+    backend = os.environ.get('STORAGE_BACKEND', 'mongo')
+    archive = TransactionArchive.from_env(root_dir)
+    if backend == "mongo":
+        client = create_mongo_client(os.environ.get('MONGO_URL', 'mongodb://localhost:27017'))
+        return MongoStorage(client[os.environ.get('DB_NAME', 'test_database')], client, archive)
+    if backend == "sqlite":
+        from sqlite_storage import SQLiteStorage
+
+        return SQLiteStorage(os.environ.get('SQLITE_PATH') or str(root_dir / 'sudarshan.db'), archive)
+    raise ValueError(f"Unknown STORAGE_BACKEND '{backend}', expected 'mongo' or 'sqlite'")
@@ -0,0 +1,134 @@
+"""Delta sync for offline-first clients.
+
+Every write takes the user's next version (one atomic counter per user) and
+stamps it on the record; deletes leave a tombstone with their version. A
+client keeps the highest version it has applied and asks for everything
+above it, so a refresh with nothing new costs one small response instead of
+whole lists. Versions are shared by all record kinds, which gives one total
+order to page through.
+
+A version is taken before its record is written, so versions can land out
+of order, in any worker. Each one stays pending in the store until its write
+has landed (`bump` ... `settle`), and readers only go as far as the settled
+version: the highest one with nothing pending at or below it. /changes stops
+there, so a cursor never passes a write still in flight.
+
+The settled version also makes cheap HTTP validators: list and analytics
+responses carry an ETag derived from it, and a matching If-None-Match is
+answered 304 from the version alone.
+"""
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import ReturnDocument, UpdateOne
+
+
+def merge_changes(since: int, limit: int, deletions: List[dict], settled: Optional[int] = None, **records: List[dict]) -> dict:
+    """One page of changes from per-kind lists that are each sorted by version
+    and fetched with limit + 1. `version` is the cursor for the next call.
+
+    Entries above `settled` (SyncRepository.current, read before the lists)
+    are held back for a later call: a lower version may still be in flight,
+    and the cursor must not pass it."""
+    entries = [(doc["version"], kind, doc) for kind, docs in records.items() for doc in docs]
+    entries += [(tombstone["version"], None, tombstone) for tombstone in deletions]
+    entries.sort(key=lambda entry: entry[0])
+    if settled is not None:
+        entries = [entry for entry in entries if entry[0] <= settled]
+    page = entries[:limit]
+
+    changes: Dict[str, object] = {kind: [] for kind in records}
+    deleted: Dict[str, List[str]] = {kind: [] for kind in records}
+    for _, kind, doc in page:
+        if kind is None:
+            deleted.setdefault(doc["kind"], []).append(doc["id"])
+        else:
+            changes[kind].append(doc)
+    return {
+        "since": since,
+        "version": page[-1][0] if page else since,
+        "has_more": len(entries) > limit,
+        **changes,
+        "deleted": deleted,
+    }
+
+
+# A version pending for longer belongs to a worker that died mid-write.
+PENDING_LEASE_SECONDS = 60.0
+
+
+def pending_expiry(now: Optional[datetime] = None) -> str:
+    """Pending entries started before this (ISO) are dead and can be dropped."""
+    return ((now or datetime.now(timezone.utc)) - timedelta(seconds=PENDING_LEASE_SECONDS)).isoformat()
+
+
+def settled_version(version: int, pending: Iterable[Tuple[int, str]], now: Optional[datetime] = None) -> int:
+    """Highest version with no live pending write at or below it, from the
+    counter and its (version, started_at ISO) pending entries."""
+    expired = pending_expiry(now)
+    live = [number for number, started_at in pending if started_at > expired]
+    return min(live) - 1 if live else version
+
+
+class VersionCache:
+    """Per-user LRU of the settled version, as last read from the store by
+    this worker. Entries go stale by up to `ttl` seconds, which only ever
+    makes a tag older than its body; answering If-None-Match reads the store."""
+
+    def __init__(self, ttl: float, maxsize: int = 4096):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, Tuple[float, int]]" = OrderedDict()
+
+    def forget(self, user_id: str):
+        self._entries.pop(user_id, None)
+
+    def get(self, user_id: str) -> Optional[int]:
+        entry = self._entries.get(user_id)
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            return None
+        self._entries.move_to_end(user_id)
+        return entry[1]
+
+    def put(self, user_id: str, version: int):
+        self._entries[user_id] = (time.monotonic(), version)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+def etag(version: int, *parts: str) -> str:
+    """Strong ETag for a representation of the user's data at `version`."""
+    return '"' + "-".join((f"v{version}", *parts)) + '"'
+
+
+def etag_matches(if_none_match: Optional[str], tag: Optional[str]) -> bool:
+    """If-None-Match uses the weak comparison, so W/ prefixes are ignored."""
+    if not if_none_match or tag is None:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return "*" in candidates or any(value.removeprefix("W/") == tag for value in candidates)
+
+
+async def assign_sync_versions(db, batch_size: int = 1000):
+    """Give records written before delta sync a version, oldest first per user.
+
+    Each user's block of versions is reserved with one `$inc`, so workers that
+    already stamp new writes keep getting distinct, higher numbers."""
+    for collection in (db.transactions, db.daily_reports):
+        user_ids = await collection.distinct("user_id", {"version": {"$exists": False}})
+        for user_id in user_ids:
+            ids = [doc["_id"] async for doc in collection.find(
+                {"user_id": user_id, "version": {"$exists": False}}, {"_id": 1}
+            ).sort([("date", 1), ("_id", 1)])]
+            if not ids:
+                continue
+            counter = await db.user_versions.find_one_and_update(
+                {"_id": user_id}, {"$inc": {"version": len(ids)}}, upsert=True, return_document=ReturnDocument.AFTER
+            )
+            first = counter["version"] - len(ids) + 1
+            updates = [UpdateOne({"_id": _id}, {"$set": {"version": first + i}}) for i, _id in enumerate(ids)]
+            for start in range(0, len(updates), batch_size):
+                await collection.bulk_write(updates[start:start + batch_size], ordered=False)
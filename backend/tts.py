@@ -0,0 +1,128 @@
+"""Text-to-speech behind a pluggable synthesizer, with a content-addressed audio cache.
+
+Audio is stored under sha256(language, text), so the same sentence is
+synthesized once and every later request (any user, any worker sharing the
+directory) is a file read. Keys are known before synthesis, which lets a
+report hand out audio URLs while its action points are still being rendered
+in the background.
+"""
+import asyncio
+import hashlib
+import importlib
+import os
+import re
+from pathlib import Path
+from typing import AsyncContextManager, Callable, Dict, Optional, Tuple
+
+from metrics import track_llm_call
+from rate_limit import unlimited
+
+AUDIO_KEY = re.compile(r"[0-9a-f]{64}")
+AUDIO_MEDIA_TYPE = "audio/mpeg"
+
+
+def audio_key(text: str, language: str) -> str:
+    return hashlib.sha256(f"{language}\0{text.strip()}".encode("utf-8")).hexdigest()
+
+
+class OpenAITTS:
+    def __init__(self, api_key: str, model: str = "tts-1", voice: str = "alloy"):
+        self.api_key = api_key
+        self.model = model
+        self.voice = voice
+        self._client = None
+
+    def client(self):
+        if self._client is None:
+            openai = importlib.import_module("emergentintegrations.llm.openai")
+            self._client = openai.OpenAITextToSpeech(api_key=self.api_key)
+        return self._client
+
+    async def synthesize(self, text: str, language: str) -> bytes:
+        # The voice models detect the language from the text itself.
+        async with track_llm_call("tts", text) as call:
+            audio = await self.client().generate_speech(
+                text=text, model=self.model, voice=self.voice, response_format="mp3"
+            )
+            call.response = ""
+        return audio
+
+
+class AudioCache:
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self._pending: Dict[str, asyncio.Future] = {}
+
+    def path(self, key: str) -> Optional[Path]:
+        """Where `key`'s audio lives, or None if `key` is not a well-formed key."""
+        if not AUDIO_KEY.fullmatch(key):
+            return None
+        return self.directory / key[:2] / f"{key}.mp3"
+
+    async def get_or_synthesize(self, text: str, language: str, synthesizer,
+                                admission: Callable[[], AsyncContextManager] = unlimited) -> Tuple[str, bool]:
+        """Key of the audio for (text, language) and whether it was already cached.
+        Concurrent requests for the same key share one synthesis; only that
+        synthesis goes through `admission`, so cache hits cost no LLM slot."""
+        key = audio_key(text, language)
+        path = self.path(key)
+        if path.exists():
+            return key, True
+        pending = self._pending.get(key)
+        if pending is not None:
+            await asyncio.shield(pending)
+            return key, True
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            async with admission():
+                audio = await synthesizer.synthesize(text.strip(), language)
+            await asyncio.to_thread(self._write, path, audio)
+            future.set_result(None)
+        except BaseException as exc:
+            future.set_exception(exc)
+            future.exception()  # waiters re-raise it; don't log it as never retrieved
+            raise
+        finally:
+            del self._pending[key]
+        return key, False
+
+    @staticmethod
+    def _write(path: Path, audio: bytes):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write-then-rename so a concurrent reader never sees a partial file.
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_bytes(audio)
+        os.replace(tmp, path)
+
+    async def presynthesize(self, texts, language: str, synthesizer,
+                            admission: Callable[[], AsyncContextManager] = unlimited):
+        """Fill the cache for `texts`; failures are left for on-demand synthesis."""
+        await asyncio.gather(
+            *(self.get_or_synthesize(text, language, synthesizer, admission) for text in texts if text.strip()),
+            return_exceptions=True,
+        )
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Inclusive (start, end) of a single `bytes=` range, None for no/unsupported
+    range (serve the whole file). Raises ValueError if it can't be satisfied."""
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start_text, _, end_text = header[len("bytes="):].strip().partition("-")
+    if not start_text:
+        suffix = int(end_text)
+        if suffix <= 0:
+            raise ValueError(header)
+        return max(size - suffix, 0), size - 1
+    start = int(start_text)
+    end = min(int(end_text), size - 1) if end_text else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def read_range(path: Path, start: int, end: int) -> bytes:
+    with open(path, "rb") as f:
+        f.seek(start)
+        return f.read(end - start + 1)
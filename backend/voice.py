@@ -0,0 +1,182 @@
+"""Streaming speech recognition for voice entry, and parsing of what was said.
+
+An ASR backend opens one session per utterance. The WebSocket endpoint feeds
+it audio chunks as they arrive and forwards any partial transcript the session
+has ready; `finish` returns the final transcript, which `parse_utterance`
+turns into transaction fields ("आज 500 रुपये की बिक्री" -> sales, 500).
+
+Backends implement `open(language, capacity) -> ASRSession`, where
+`capacity()` is an async context manager held around every paid backend call
+(LLMAdmission.capacity in the API). `WhisperASR` is the production one; tests
+swap in a fake.
+"""
+import asyncio
+import importlib
+import io
+import os
+import re
+import time
+import unicodedata
+from typing import AsyncContextManager, Callable, Optional
+
+from metrics import track_llm_call
+from rate_limit import unlimited
+
+PARTIAL_INTERVAL = float(os.environ.get('ASR_PARTIAL_INTERVAL', '0.8'))
+PARTIAL_MIN_BYTES = int(os.environ.get('ASR_PARTIAL_MIN_BYTES', '16000'))
+MAX_AUDIO_BYTES = int(os.environ.get('ASR_MAX_AUDIO_BYTES', str(10 * 1024 * 1024)))
+# A stream that sends nothing for this long is closed.
+IDLE_TIMEOUT = float(os.environ.get('ASR_IDLE_TIMEOUT', '20'))
+
+
+class ASRSession:
+    async def feed(self, chunk: bytes) -> Optional[str]:
+        """Buffer `chunk`; return a newer partial transcript if one is ready."""
+        raise NotImplementedError
+
+    async def finish(self) -> str:
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class WhisperSession(ASRSession):
+    """Whisper has no streaming API, so partials come from re-transcribing the
+    audio received so far, at most every PARTIAL_INTERVAL seconds and in the
+    background so chunks keep flowing in meanwhile. Each call, background or
+    final, runs inside `capacity()`."""
+
+    def __init__(self, backend: "WhisperASR", language: str, capacity: Callable[[], AsyncContextManager] = unlimited):
+        self.backend = backend
+        self.language = language
+        self.capacity = capacity
+        self.audio = bytearray()
+        self.partial_task: Optional[asyncio.Task] = None
+        self.last_partial_at = time.monotonic()
+        self.last_partial_size = 0
+
+    async def feed(self, chunk: bytes) -> Optional[str]:
+        self.audio += chunk
+        ready = None
+        if self.partial_task is not None and self.partial_task.done():
+            if not self.partial_task.cancelled() and self.partial_task.exception() is None:
+                ready = self.partial_task.result()
+            self.partial_task = None
+        if (
+            self.partial_task is None
+            and time.monotonic() - self.last_partial_at >= PARTIAL_INTERVAL
+            and len(self.audio) - self.last_partial_size >= PARTIAL_MIN_BYTES
+        ):
+            self.last_partial_at = time.monotonic()
+            self.last_partial_size = len(self.audio)
+            self.partial_task = asyncio.create_task(self.transcribe("asr_partial"))
+        return ready
+
+    async def transcribe(self, endpoint: str) -> str:
+        async with self.capacity():
+            return await self.backend.transcribe(bytes(self.audio), self.language, endpoint)
+
+    async def finish(self) -> str:
+        await self.close()
+        return await self.transcribe("asr_final")
+
+    async def close(self):
+        if self.partial_task is not None:
+            self.partial_task.cancel()
+            self.partial_task = None
+
+
+class WhisperASR:
+    def __init__(self, api_key: str, model: str = "whisper-1", filename: str = "audio.webm"):
+        self.api_key = api_key
+        self.model = model
+        self.filename = filename
+        self._client = None
+
+    def client(self):
+        if self._client is None:
+            # Imported on first use, like the chat module, to keep worker startup light.
+            openai = importlib.import_module("emergentintegrations.llm.openai")
+            self._client = openai.OpenAISpeechToText(api_key=self.api_key)
+        return self._client
+
+    def open(self, language: str, capacity: Callable[[], AsyncContextManager] = unlimited) -> ASRSession:
+        return WhisperSession(self, language, capacity)
+
+    async def transcribe(self, audio: bytes, language: str, endpoint: str) -> str:
+        file = io.BytesIO(audio)
+        file.name = self.filename
+        async with track_llm_call(endpoint, "") as call:
+            response = await self.client().transcribe(
+                file=file, model=self.model, response_format="json", language=language
+            )
+            call.response = response.text
+        return call.response.strip()
+
+
+HINDI_DIGITS = str.maketrans("०१२३४५६७८९", "0123456789")
+
+
+def normalize(text: str) -> str:
+    """NFC (nukta letters such as ज़ decompose under it), ASCII digits, casefolded."""
+    return unicodedata.normalize("NFC", text).translate(HINDI_DIGITS).casefold()
+
+
+NUMBER_WORDS = {
+    "एक": 1, "दो": 2, "तीन": 3, "चार": 4, "पांच": 5, "पाँच": 5, "छह": 6, "सात": 7, "आठ": 8, "नौ": 9, "दस": 10,
+    "बीस": 20, "पचास": 50, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+    "eight": 8, "nine": 9, "ten": 10, "twenty": 20, "fifty": 50,
+}
+NUMBER_WORDS = {normalize(word): value for word, value in NUMBER_WORDS.items()}
+MULTIPLIERS = {
+    "सौ": 100, "hundred": 100, "हज़ार": 1000, "हजार": 1000, "thousand": 1000, "k": 1000,
+    "लाख": 100000, "lakh": 100000, "lakhs": 100000,
+}
+MULTIPLIERS = {normalize(word): value for word, value in MULTIPLIERS.items()}
+
+# Word stems, matched against the start of each spoken word so inflections
+# (बेचा/बेची/बेचे, खरीदा/खरीदी) are covered.
+CATEGORY_STEMS = {
+    "sales": ("बिक्री", "बिकरी", "बिका", "बिकी", "बेच", "sale", "sold", "sell"),
+    "purchase": ("खरीद", "ख़रीद", "purchase", "bought", "buy", "stock"),
+    "expense": ("खर्च", "ख़र्च", "किराया", "बिल", "भुगतान", "तनख्वाह", "expense", "spent", "paid", "rent", "bill", "salary"),
+}
+CATEGORY_STEMS = {category: tuple(normalize(stem) for stem in stems) for category, stems in CATEGORY_STEMS.items()}
+
+WORD = re.compile(r"\d[\d,]*(?:\.\d+)?|(?:[^\W\d_]|[\u0900-\u0963\u0970-\u097f])+")
+
+
+def parse_amount(words) -> Optional[float]:
+    """First spoken amount: digits or number words, optionally scaled ("2.5 lakh", "पाँच सौ")."""
+    for i, word in enumerate(words):
+        if word[0].isdigit():
+            value = float(word.replace(",", ""))
+        elif word in NUMBER_WORDS:
+            value = float(NUMBER_WORDS[word])
+        else:
+            continue
+        for following in words[i + 1:i + 3]:
+            if following not in MULTIPLIERS:
+                break
+            value *= MULTIPLIERS[following]
+        return value
+    return None
+
+
+def parse_category(words) -> Optional[str]:
+    for word in words:
+        for category, stems in CATEGORY_STEMS.items():
+            if word.startswith(stems):
+                return category
+    return None
+
+
+def parse_utterance(text: str) -> Optional[dict]:
+    """Transaction fields from a spoken sentence, or None if it names no amount or category."""
+    words = WORD.findall(normalize(text))
+    amount = parse_amount(words)
+    category = parse_category(words)
+    if amount is None or category is None:
+        return None
+    return {"category": category, "amount": amount, "description": text.strip()}
@@ -8,30 +8,40 @@ import ManualEntry from '@/pages/ManualEntry';
 import Reports from '@/pages/Reports';
 import Analytics from '@/pages/Analytics';
 import VoiceFAB from '@/components/VoiceFAB';
+import { setAccessToken } from '@/lib/api';
 import './App.css';
 
 function App() {
   const [user, setUser] = useState(null);
   const [loading, setLoading] = useState(true);
 
+  const handleLogout = () => {
+    setAccessToken(null);
+    setUser(null);
+    localStorage.removeItem('sudarshan_user');
+  };
+
   useEffect(() => {
     const storedUser = localStorage.getItem('sudarshan_user');
     if (storedUser) {
-      setUser(JSON.parse(storedUser));
+      const parsed = JSON.parse(storedUser);
+      // Sessions saved before access tokens existed have to log in again.
+      if (parsed.access_token) {
+        setAccessToken(parsed.access_token, handleLogout);
+        setUser(parsed);
+      } else {
+        localStorage.removeItem('sudarshan_user');
+      }
     }
     setLoading(false);
   }, []);
 
   const handleLogin = (userData) => {
+    setAccessToken(userData.access_token, handleLogout);
     setUser(userData);
     localStorage.setItem('sudarshan_user', JSON.stringify(userData));
   };
 
-  const handleLogout = () => {
-    setUser(null);
-    localStorage.removeItem('sudarshan_user');
-  };
-
   if (loading) {
     return (
       <div className="min-h-screen flex items-center justify-center bg-slate-50">
@@ -1,24 +1,110 @@
-import { useState } from 'react';
+import { useEffect, useRef, useState } from 'react';
+import axios from 'axios';
 import { Mic, MicOff, Volume2 } from 'lucide-react';
 import { toast } from 'sonner';
+import { API_BASE_URL, webSocketUrl } from '@/lib/api';
+
+// MediaRecorder slice length: each slice is sent as soon as it is recorded,
+// so partial transcripts arrive while the user is still speaking.
+const CHUNK_MS = 250;
 
 export default function VoiceFAB({ user }) {
   const [isListening, setIsListening] = useState(false);
   const [isActive, setIsActive] = useState(false);
+  const [transcript, setTranscript] = useState('');
+  const socketRef = useRef(null);
+  const recorderRef = useRef(null);
 
-  const handleVoiceClick = () => {
-    setIsActive(!isActive);
-    if (!isActive) {
+  const saveTransaction = async (transaction) => {
+    try {
+      // Same multipart form ManualEntry posts; create_transaction reads form fields.
+      const data = new FormData();
+      data.append('user_id', user.user_id);
+      data.append('category', transaction.category);
+      data.append('amount', String(transaction.amount));
+      data.append('description', transaction.description);
+      await axios.post(`${API_BASE_URL}/transactions`, data, {
+        headers: { 'Content-Type': 'multipart/form-data' },
+      });
+      toast.success(`समझ गये! | Saved ${transaction.category} ₹${transaction.amount}`);
+    } catch (error) {
+      toast.error('एरर | Error: ' + (error.response?.data?.detail || error.message));
+    }
+  };
+
+  const stopListening = () => {
+    setIsListening(false);
+    const recorder = recorderRef.current;
+    if (recorder && recorder.state !== 'inactive') {
+      recorder.stop();
+    }
+  };
+
+  const startListening = async () => {
+    let stream;
+    try {
+      stream = await navigator.mediaDevices.getUserMedia({ audio: true });
+    } catch (error) {
+      toast.error('माइक उपलब्ध नहीं | Microphone unavailable');
+      setIsActive(false);
+      return;
+    }
+
+    const socket = new WebSocket(webSocketUrl('/voice/stream', { language: 'hi' }));
+    const recorder = new MediaRecorder(stream);
+    socketRef.current = socket;
+    recorderRef.current = recorder;
+    setTranscript('');
+
+    socket.onmessage = (event) => {
+      const message = JSON.parse(event.data);
+      if (message.type === 'partial') {
+        setTranscript(message.text);
+      } else if (message.type === 'final') {
+        setTranscript(message.text);
+        if (message.transaction) {
+          saveTransaction(message.transaction);
+        } else {
+          toast.info('राशि या श्रेणी समझ नहीं आई | Could not find an amount and category');
+        }
+      } else if (message.type === 'error') {
+        toast.error('एरर | Error: ' + message.detail);
+      }
+    };
+    recorder.ondataavailable = (event) => {
+      if (event.data.size > 0 && socket.readyState === WebSocket.OPEN) {
+        socket.send(event.data);
+      }
+    };
+    recorder.onstop = () => {
+      stream.getTracks().forEach((track) => track.stop());
+      if (socket.readyState === WebSocket.OPEN) {
+        socket.send(JSON.stringify({ type: 'end' }));
+      }
+    };
+    socket.onopen = () => {
+      recorder.start(CHUNK_MS);
       setIsListening(true);
       toast.info('आवाज़ सुन रहे हैं... | Listening...');
-      
-      setTimeout(() => {
-        setIsListening(false);
-        toast.success('समझ गये! | Got it!');
-      }, 3000);
-    } else {
-      setIsListening(false);
+    };
+    socket.onerror = () => {
+      stopListening();
+      toast.error('कनेक्शन टूट गया | Voice connection failed');
+    };
+  };
+
+  useEffect(() => () => {
+    stopListening();
+    socketRef.current?.close();
+  }, []);
+
+  const handleVoiceClick = () => {
+    if (isListening) {
+      stopListening();
+      return;
     }
+    setIsActive(true);
+    startListening();
   };
 
   return (
@@ -45,7 +131,10 @@ export default function VoiceFAB({ user }) {
         <div
           data-testid="voice-overlay"
           className="fixed inset-0 bg-black/50 backdrop-blur-sm z-40 flex items-center justify-center"
-          onClick={() => setIsActive(false)}
+          onClick={() => {
+            stopListening();
+            setIsActive(false);
+          }}
         >
           <div
             className="bg-white rounded-3xl p-8 max-w-md w-full mx-4 glass-card"
@@ -81,15 +170,21 @@ export default function VoiceFAB({ user }) {
                 </div>
               )}
 
+              {transcript && (
+                <p data-testid="voice-transcript" className="text-lg font-medium text-slate-800 mb-4">
+                  {transcript}
+                </p>
+              )}
+
               <div className="bg-slate-50 rounded-xl p-4 text-left">
                 <p className="text-sm text-slate-600">
                   <strong className="text-slate-800">Voice Commands:</strong>
                   <br />
-                  • "आज की रिपोर्ट बताओ" (Today's report)
+                  • "आज 500 रुपये की बिक्री" (Sales ₹500)
                   <br />
-                  • "बिक्री कितनी है?" (Sales total?)
+                  • "2000 का स्टॉक खरीदा" (Purchase ₹2000)
                   <br />
-                  • "इनसाइट्स सुनाओ" (Read insights)
+                  • "बिजली बिल 1500" (Expense ₹1500)
                 </p>
               </div>
             </div>
@@ -1,4 +1,38 @@
+import axios from 'axios';
+
 const DEFAULT_BACKEND_URL = 'http://localhost:8000';
 
 export const BACKEND_URL = process.env.REACT_APP_BACKEND_URL || DEFAULT_BACKEND_URL;
 export const API_BASE_URL = `${BACKEND_URL}/api`;
+export const WS_BASE_URL = API_BASE_URL.replace(/^http/, 'ws');
+
+let accessToken = null;
+let onUnauthorized = null;
+
+// Every API call carries the access token from login; a 401 (expired or
+// revoked token) sends the user back to the login screen.
+export function setAccessToken(token, handleUnauthorized) {
+  accessToken = token;
+  onUnauthorized = handleUnauthorized || null;
+}
+
+axios.interceptors.request.use((config) => {
+  if (accessToken && config.url?.startsWith(API_BASE_URL)) {
+    config.headers.Authorization = `Bearer ${accessToken}`;
+  }
+  return config;
+});
+
+axios.interceptors.response.use(
+  (response) => response,
+  (error) => {
+    if (error.response?.status === 401 && accessToken && onUnauthorized) onUnauthorized();
+    return Promise.reject(error);
+  }
+);
+
+// WebSockets cannot send headers, so the token goes in the query string.
+export function webSocketUrl(path, params = {}) {
+  const query = new URLSearchParams({ ...params, access_token: accessToken || '' });
+  return `${WS_BASE_URL}${path}?${query}`;
+}
@@ -0,0 +1,7 @@
+// Client side of the write path's retry safety: a key per entry form, sent as
+// Idempotency-Key so a resubmitted POST /transactions is stored once.
+export function newIdempotencyKey() {
+  return window.crypto?.randomUUID
+    ? window.crypto.randomUUID()
+    : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+}
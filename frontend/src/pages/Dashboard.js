@@ -19,7 +19,7 @@ import {
   ResponsiveContainer,
 } from 'recharts';
 import { TrendingUp, ShoppingCart, CreditCard, Activity, Sparkles } from 'lucide-react';
-import { API_BASE_URL } from '@/lib/api';
+import { API_BASE_URL, webSocketUrl } from '@/lib/api';
 
 const API = API_BASE_URL;
 
@@ -42,24 +42,86 @@ export default function Dashboard({ user, onLogout }) {
 
   const fetchDashboardData = useCallback(async () => {
     setLoading(true);
+    let hasTodaysReport = false;
     try {
-      const [reportRes, analyticsRes] = await Promise.all([
-        axios.post(`${API}/generate-report/${user.user_id}`),
-        axios.get(`${API}/analytics/${user.user_id}?days=7`),
-      ]);
-      setReport(reportRes.data);
-      setAnalytics(analyticsRes.data);
+      // Today's totals, the 7-day chart and the latest report in one request.
+      const { data } = await axios.get(`${API}/dashboard/${user.user_id}?days=7`);
+      hasTodaysReport = data.report?.date?.slice(0, 10) === data.today.date;
+      setReport({ ...(hasTodaysReport ? data.report : {}), ...data.today });
+      setAnalytics(data);
     } catch (error) {
       toast.error('डेटा लोड नहीं हो सका | Failed to load data');
+      return;
     } finally {
       setLoading(false);
     }
+    if (hasTodaysReport) return;
+    // No report yet today: the totals are already on screen while the AI writes one.
+    try {
+      const reportRes = await axios.post(`${API}/generate-report/${user.user_id}`);
+      setReport(reportRes.data);
+    } catch (error) {
+      toast.error('रिपोर्ट नहीं बन सकी | Failed to generate insights');
+    }
   }, [user.user_id]);
 
   useEffect(() => {
     fetchDashboardData();
   }, [fetchDashboardData]);
 
+  // Live totals: the server pushes a day's totals whenever an entry changes it.
+  useEffect(() => {
+    let socket;
+    let retryTimer;
+    let retryDelay = 1000;
+    let stopped = false;
+
+    const applyDay = (day) => {
+      setReport((current) =>
+        current && current.date?.slice(0, 10) === day.start
+          ? {
+              ...current,
+              sales_total: day.sales,
+              purchase_total: day.purchase,
+              expense_total: day.expense,
+              net_amount: day.sales - day.purchase - day.expense,
+            }
+          : current
+      );
+      setAnalytics((current) => {
+        if (!current) return current;
+        const point = { date: day.date, start: day.start, sales: day.sales, purchase: day.purchase, expense: day.expense };
+        const chartData = current.chart_data.some((p) => p.start === day.start)
+          ? current.chart_data.map((p) => (p.start === day.start ? point : p))
+          : [...current.chart_data, point];
+        return { ...current, chart_data: chartData };
+      });
+    };
+
+    const connect = () => {
+      socket = new WebSocket(webSocketUrl(`/live/${user.user_id}`));
+      socket.onopen = () => {
+        retryDelay = 1000;
+      };
+      socket.onmessage = (event) => {
+        const message = JSON.parse(event.data);
+        if (message.type === 'day') applyDay(message);
+      };
+      socket.onclose = () => {
+        if (stopped) return;
+        retryTimer = setTimeout(connect, retryDelay);
+        retryDelay = Math.min(retryDelay * 2, 30000);
+      };
+    };
+
+    connect();
+    return () => {
+      stopped = true;
+      clearTimeout(retryTimer);
+      socket?.close();
+    };
+  }, [user.user_id]);
+
   const handleStartListening = () => {
     if (!voiceSupported) {
       toast.error('Voice capture not supported in this browser.');
@@ -9,6 +9,7 @@ import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '@
 import Sidebar from '@/components/Sidebar';
 import { Save, Plus } from 'lucide-react';
 import { API_BASE_URL } from '@/lib/api';
+import { newIdempotencyKey } from '@/lib/sync';
 
 const API = API_BASE_URL;
 
@@ -19,6 +20,9 @@ export default function ManualEntry({ user, onLogout }) {
     description: '',
   });
   const [loading, setLoading] = useState(false);
+  // Reused until the entry is saved, so retrying after a dropped connection
+  // cannot record the same sale twice.
+  const [entryKey, setEntryKey] = useState(newIdempotencyKey);
 
   const handleSubmit = async (e) => {
     e.preventDefault();
@@ -34,8 +38,9 @@ export default function ManualEntry({ user, onLogout }) {
       }
 
       await axios.post(`${API}/transactions`, data, {
-        headers: { 'Content-Type': 'multipart/form-data' },
+        headers: { 'Content-Type': 'multipart/form-data', 'Idempotency-Key': entryKey },
       });
+      setEntryKey(newIdempotencyKey());
 
       toast.success('डेटा सेव हो गया! Entry saved successfully!');
       setFormData({ category: 'sales', amount: '', description: '' });
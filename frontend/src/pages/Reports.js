@@ -2,8 +2,8 @@ import { useState, useEffect, useCallback } from 'react';
 import axios from 'axios';
 import { Card } from '@/components/ui/card';
 import Sidebar from '@/components/Sidebar';
-import { Calendar, TrendingUp, FileText } from 'lucide-react';
-import { API_BASE_URL } from '@/lib/api';
+import { Calendar, TrendingUp, FileText, Volume2 } from 'lucide-react';
+import { API_BASE_URL, BACKEND_URL } from '@/lib/api';
 
 const API = API_BASE_URL;
 
@@ -130,7 +130,18 @@ export default function Reports({ user, onLogout }) {
                         {report.action_points.map((point, idx) => (
                           <li key={idx} className="text-sm text-slate-600 flex items-start">
                             <TrendingUp className="h-4 w-4 text-orange-500 mr-2 mt-0.5 flex-shrink-0" />
-                            <span>{point}</span>
+                            <span className="flex-1">{point}</span>
+                            {report.action_point_audio?.[idx] && (
+                              <button
+                                type="button"
+                                data-testid={`play-action-point-${idx}`}
+                                onClick={() => new Audio(`${BACKEND_URL}${report.action_point_audio[idx]}`).play()}
+                                className="ml-2 text-orange-500 hover:text-orange-600"
+                                aria-label="Play action point"
+                              >
+                                <Volume2 className="h-4 w-4" />
+                              </button>
+                            )}
                           </li>
                         ))}
                       </ul>
@@ -0,0 +1,264 @@
+"""Concurrent load generator for the Sudarshan AI Portal API.
+
+Replays a weighted mix of operations against a running backend, either
+open-loop (Poisson arrivals at --rate requests/second, independent of how fast
+the server answers) or closed-loop (--concurrency workers back to back), and
+reports p50/p95/p99 latency, throughput and error rates per operation.
+
+Open-loop latency is measured from each request's scheduled arrival time, so
+queueing delay on an overloaded server shows up in the percentiles instead of
+being hidden by the generator slowing down (coordinated omission).
+
+    python load_test.py --base-url http://localhost:8001 --rate 50 --duration 60 \\
+        --mix create_transaction=10,get_transactions=5,analytics=3,generate_report=1 \\
+        --output results.json
+"""
+import argparse
+import asyncio
+import base64
+import json
+import math
+import random
+import sys
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+import httpx
+
+DEFAULT_MIX = "register=1,login=2,create_transaction=10,get_transactions=5,analytics=3,reports=2,generate_report=1,scan=1"
+PNG_1X1 = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8/5+hHgAHggJ/PchI7wAAAABJRU5ErkJggg=="
+)
+
+
+class LoadGenerator:
+    def __init__(self, base_url: str, users: int, timeout: float, seed: int):
+        self.api_url = f"{base_url.rstrip('/')}/api"
+        self.user_count = users
+        self.timeout = timeout
+        self.rng = random.Random(seed)
+        self.run_id = uuid.uuid4().hex[:8]
+        self.users = []
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.client = None
+
+    # Operations -----------------------------------------------------------
+
+    def _new_credentials(self):
+        tag = f"{self.run_id}_{uuid.uuid4().hex[:10]}"
+        return {"username": f"load_{tag}", "email": f"load_{tag}@example.com", "password": "LoadPass123!"}
+
+    async def op_register(self):
+        return await self.client.post(f"{self.api_url}/auth/register", json=self._new_credentials())
+
+    async def op_login(self):
+        user = self.rng.choice(self.users)
+        return await self.client.post(f"{self.api_url}/auth/login", json={"email": user["email"], "password": user["password"]})
+
+    async def op_create_transaction(self):
+        user = self.rng.choice(self.users)
+        category = self.rng.choices(("sales", "purchase", "expense"), (6, 3, 2))[0]
+        return await self.client.post(f"{self.api_url}/transactions", data={
+            "user_id": user["user_id"],
+            "category": category,
+            "amount": str(round(self.rng.uniform(20, 20000), 2)),
+            "description": f"load test {category}",
+        }, headers=user["headers"])
+
+    async def op_get_transactions(self):
+        user = self.rng.choice(self.users)
+        return await self.client.get(f"{self.api_url}/transactions/{user['user_id']}", headers=user["headers"])
+
+    async def op_analytics(self):
+        user = self.rng.choice(self.users)
+        days = self.rng.choice((7, 30, 90))
+        return await self.client.get(f"{self.api_url}/analytics/{user['user_id']}?days={days}", headers=user["headers"])
+
+    async def op_reports(self):
+        user = self.rng.choice(self.users)
+        return await self.client.get(f"{self.api_url}/reports/{user['user_id']}?limit=10", headers=user["headers"])
+
+    async def op_generate_report(self):
+        user = self.rng.choice(self.users)
+        return await self.client.post(f"{self.api_url}/generate-report/{user['user_id']}", headers=user["headers"])
+
+    async def op_scan(self):
+        user = self.rng.choice(self.users)
+        return await self.client.post(
+            f"{self.api_url}/scan-document",
+            data={"user_id": user["user_id"]},
+            files={"file": ("bill.png", PNG_1X1, "image/png")},
+            headers=user["headers"],
+        )
+
+    OPERATIONS = ("register", "login", "create_transaction", "get_transactions", "analytics", "reports", "generate_report", "scan")
+
+    # Driver ---------------------------------------------------------------
+
+    async def setup(self):
+        """Register and log in the pool of users the mix operates on; their
+        access tokens are reused for the whole run."""
+        async def make_user():
+            credentials = self._new_credentials()
+            response = await self.client.post(f"{self.api_url}/auth/register", json=credentials)
+            response.raise_for_status()
+            credentials["user_id"] = response.json()["user_id"]
+            response = await self.client.post(f"{self.api_url}/auth/login", json=credentials)
+            response.raise_for_status()
+            credentials["headers"] = {"Authorization": f"Bearer {response.json()['access_token']}"}
+            return credentials
+
+        self.users = await asyncio.gather(*(make_user() for _ in range(self.user_count)))
+
+    async def execute(self, name: str, scheduled: float):
+        try:
+            response = await getattr(self, f"op_{name}")()
+            status = str(response.status_code)
+        except httpx.HTTPError as exc:
+            status = type(exc).__name__
+        self.latencies[name].append(time.perf_counter() - scheduled)
+        self.statuses[name][status] += 1
+
+    async def run_open_loop(self, mix, rate: float, duration: float, max_in_flight: int):
+        names, weights = zip(*mix.items())
+        tasks = set()
+        start = time.perf_counter()
+        next_arrival = start
+        while next_arrival - start < duration:
+            delay = next_arrival - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            name = self.rng.choices(names, weights)[0]
+            if len(tasks) >= max_in_flight:
+                self.statuses[name]["dropped"] += 1
+            else:
+                task = asyncio.create_task(self.execute(name, next_arrival))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            next_arrival += self.rng.expovariate(rate)
+        if tasks:
+            await asyncio.gather(*tasks)
+        return time.perf_counter() - start
+
+    async def run_closed_loop(self, mix, concurrency: int, duration: float):
+        names, weights = zip(*mix.items())
+        start = time.perf_counter()
+
+        async def worker():
+            while time.perf_counter() - start < duration:
+                await self.execute(self.rng.choices(names, weights)[0], time.perf_counter())
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return time.perf_counter() - start
+
+    # Reporting ------------------------------------------------------------
+
+    @staticmethod
+    def percentile(sorted_values, pct):
+        if not sorted_values:
+            return 0.0
+        return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(pct / 100 * len(sorted_values)) - 1))]
+
+    def summarize(self, name, latencies, statuses, elapsed):
+        latencies = sorted(latencies)
+        total = sum(statuses.values())
+        errors = sum(count for status, count in statuses.items() if not (status.isdigit() and int(status) < 400))
+        return {
+            "operation": name,
+            "requests": total,
+            "errors": errors,
+            "error_rate": round(errors / total, 4) if total else 0.0,
+            "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+            "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+            "p50_ms": round(self.percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(self.percentile(latencies, 95) * 1000, 2),
+            "p99_ms": round(self.percentile(latencies, 99) * 1000, 2),
+            "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+            "statuses": dict(statuses),
+        }
+
+    def results(self, elapsed):
+        operations = [self.summarize(name, self.latencies[name], self.statuses[name], elapsed) for name in sorted(self.statuses)]
+        all_statuses = Counter()
+        for statuses in self.statuses.values():
+            all_statuses.update(statuses)
+        overall = self.summarize("all", [l for ls in self.latencies.values() for l in ls], all_statuses, elapsed)
+        return {"elapsed_seconds": round(elapsed, 3), "overall": overall, "operations": operations}
+
+
+def parse_mix(value: str):
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in LoadGenerator.OPERATIONS:
+            raise argparse.ArgumentTypeError(f"unknown operation '{name}', expected one of {', '.join(LoadGenerator.OPERATIONS)}")
+        mix[name] = float(weight or 1)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def print_table(results):
+    header = f"{'operation':<20}{'req':>8}{'err%':>8}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for row in results["operations"] + [results["overall"]]:
+        print(f"{row['operation']:<20}{row['requests']:>8}{row['error_rate'] * 100:>8.2f}{row['throughput_rps']:>9}"
+              f"{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}")
+
+
+async def run(args):
+    generator = LoadGenerator(args.base_url, args.users, args.timeout, args.seed)
+    limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        generator.client = client
+        await generator.setup()
+        if args.rate > 0:
+            elapsed = await generator.run_open_loop(args.mix, args.rate, args.duration, args.max_in_flight)
+        else:
+            elapsed = await generator.run_closed_loop(args.mix, args.concurrency, args.duration)
+
+    results = generator.results(elapsed)
+    results["config"] = {
+        "base_url": args.base_url,
+        "mode": "open" if args.rate > 0 else "closed",
+        "rate": args.rate,
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "users": args.users,
+        "mix": args.mix,
+        "started_at": datetime.now(timezone.utc).isoformat(),
+    }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the Sudarshan AI Portal API")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"weighted operation mix (default: {DEFAULT_MIX})")
+    parser.add_argument("--rate", type=float, default=20.0,
+                        help="open-loop arrival rate in requests/second; 0 switches to closed-loop")
+    parser.add_argument("--concurrency", type=int, default=10, help="closed-loop worker count")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds to generate load")
+    parser.add_argument("--users", type=int, default=20, help="users registered up front and shared by the mix")
+    parser.add_argument("--max-in-flight", type=int, default=500,
+                        help="open-loop arrivals beyond this many outstanding requests are dropped and counted")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print_table(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    return 0 if results["overall"]["errors"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+import asyncio
+import json
+import math
+import os
+import time
+from dataclasses import asdict, dataclass
+from typing import Awaitable, Callable, Dict, List, Optional
+
+ITERATIONS = int(os.environ.get("BENCH_ITERATIONS", "50"))
+CONCURRENCY = int(os.environ.get("BENCH_CONCURRENCY", "8"))
+TOLERANCE = float(os.environ.get("BENCH_TOLERANCE", "0.25"))
+
+RESULTS: List["BenchResult"] = []
+_baseline: Optional[Dict[str, dict]] = None
+
+
+@dataclass
+class BenchResult:
+    name: str
+    requests: int
+    errors: int
+    seconds: float
+    throughput: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    max_ms: float
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def measure(name: str, call: Callable[[int], Awaitable], iterations: int = ITERATIONS, concurrency: int = CONCURRENCY) -> BenchResult:
+    """Run `call(i)` `iterations` times with bounded concurrency and record latency.
+
+    `call` returns an httpx response; 4xx/5xx responses count as errors.
+    """
+    latencies: List[float] = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            response = await call(i)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(iterations)))
+    seconds = time.perf_counter() - start
+
+    latencies.sort()
+    result = BenchResult(
+        name=name,
+        requests=iterations,
+        errors=errors,
+        seconds=round(seconds, 4),
+        throughput=round(iterations / seconds, 1) if seconds else 0.0,
+        p50_ms=round(percentile(latencies, 50) * 1000, 3),
+        p95_ms=round(percentile(latencies, 95) * 1000, 3),
+        p99_ms=round(percentile(latencies, 99) * 1000, 3),
+        max_ms=round(latencies[-1] * 1000, 3),
+    )
+    RESULTS.append(result)
+    return result
+
+
+def baseline() -> Dict[str, dict]:
+    """Results of an earlier run, from the JSON file named by BENCH_BASELINE."""
+    global _baseline
+    if _baseline is None:
+        path = os.environ.get("BENCH_BASELINE")
+        _baseline = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                _baseline = {row["name"]: row for row in json.load(f)["results"]}
+    return _baseline
+
+
+def assert_no_regression(result: BenchResult):
+    assert result.errors == 0, f"{result.name}: {result.errors}/{result.requests} requests failed"
+    previous = baseline().get(result.name)
+    if previous:
+        limit = previous["p95_ms"] * (1 + TOLERANCE)
+        assert result.p95_ms <= limit, (
+            f"{result.name}: p95 {result.p95_ms}ms regressed past {limit:.3f}ms "
+            f"(baseline {previous['p95_ms']}ms, tolerance {TOLERANCE:.0%})"
+        )
+
+
+def report() -> str:
+    header = f"{'endpoint':<28}{'req':>6}{'err':>5}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    lines = [header, "-" * len(header)]
+    for r in RESULTS:
+        lines.append(f"{r.name:<28}{r.requests:>6}{r.errors:>5}{r.throughput:>10}{r.p50_ms:>10}{r.p95_ms:>10}{r.p99_ms:>10}")
+    return "\n".join(lines)
+
+
+def write_results(path: str):
+    with open(path, "w") as f:
+        json.dump({"results": [asdict(r) for r in RESULTS]}, f, indent=2)
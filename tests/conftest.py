@@ -0,0 +1,93 @@
+import functools
+import os
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+# Keep the LLM admission limits out of the way of in-process benchmarks.
+os.environ.setdefault("LLM_RATE_PER_MINUTE", "1000000")
+os.environ.setdefault("LLM_BURST", "1000000")
+os.environ.setdefault("LLM_MAX_IN_FLIGHT", "1000")
+os.environ.setdefault("LLM_MAX_QUEUE", "10000")
+# A fixed key, so tokens issued early in the session survive tests that swap key sets.
+os.environ.setdefault("AUTH_SIGNING_KEYS", "test:" + "t" * 32)
+
+BENCH_USERS = int(os.environ.get("BENCH_USERS", "20"))
+BENCH_TRANSACTIONS = int(os.environ.get("BENCH_TRANSACTIONS", "5000"))
+
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(scope="session")
+def server():
+    import server
+
+    return server
+
+
+@pytest.fixture(scope="session")
+async def seeded(server, tmp_path_factory):
+    """The app wired to a seeded store (storage_stand_in), fake LLM, ASR and TTS.
+    Yields the seeded user ids; shared by every API test module."""
+    from tests.datagen import seed_transactions
+    from tests.fakes import FakeASR, FakeTTS, fake_llm_module, storage_stand_in
+    from database import ensure_indexes
+
+    store = await storage_stand_in()
+    patch = pytest.MonkeyPatch()
+    patch.setattr(server, "store", store)
+    patch.setattr(server, "llm_chat_module", lambda: fake_llm_module)
+    patch.setattr(server, "asr_backend", lambda: FakeASR())
+    patch.setattr(server, "tts_synthesizer", lambda: FakeTTS())
+    patch.setattr(server, "audio_cache", server.AudioCache(tmp_path_factory.mktemp("tts_cache")))
+    users = await seed_transactions(store, BENCH_USERS, BENCH_TRANSACTIONS, days=60)
+    await store.rollups.rebuild()
+    if hasattr(store, "db"):
+        # After seeding: mongomock checks unique indexes by scanning, one insert at a time.
+        await ensure_indexes(store.db)
+    yield users
+    patch.undo()
+    await store.close()
+
+
+@pytest.fixture(scope="session")
+async def client(server, seeded):
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        yield client
+
+
+def user(seeded, i):
+    return seeded[i % len(seeded)]
+
+
+@functools.lru_cache(maxsize=None)
+def token(user_id):
+    from auth import issue_token
+
+    return issue_token(user_id)
+
+
+def auth(user_id):
+    return {"Authorization": f"Bearer {token(user_id)}"}
+
+
+def pytest_terminal_summary(terminalreporter):
+    from tests import benchmark
+
+    if not benchmark.RESULTS:
+        return
+    terminalreporter.section("benchmarks")
+    terminalreporter.write_line(benchmark.report())
+    output = os.environ.get("BENCH_OUTPUT")
+    if output:
+        benchmark.write_results(output)
+        terminalreporter.write_line(f"results written to {output}")
@@ -0,0 +1,110 @@
+"""Synthetic transaction data for benchmarks and capacity tests.
+
+Documents have the same shape `create_transaction` writes. Generation is lazy,
+so millions of rows across thousands of users stream straight into Mongo in
+batches without being held in memory:
+
+    python -m tests.datagen --users 5000 --transactions 5000000 --mongo-url mongodb://localhost:27017
+"""
+import argparse
+import asyncio
+import random
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+CATEGORIES = ("sales", "purchase", "expense")
+CATEGORY_WEIGHTS = (0.6, 0.25, 0.15)
+AMOUNT_RANGES = {"sales": (50, 25000), "purchase": (100, 40000), "expense": (20, 5000)}
+DESCRIPTIONS = {
+    "sales": ["कपड़े की बिक्री", "retail counter sale", "थोक बिक्री", "online order", "मिठाई बिक्री"],
+    "purchase": ["stock purchase", "कच्चा माल खरीद", "wholesale restock", "पैकिंग सामग्री"],
+    "expense": ["बिजली बिल", "shop rent", "staff salary", "transport", "चाय नाश्ता"],
+}
+
+USER_NAMESPACE = uuid.UUID("5b0c6c2e-3f7e-4d0b-9a55-6f1f0f3b8a10")
+
+
+def user_ids(users: int) -> List[str]:
+    return [str(uuid.uuid5(USER_NAMESPACE, f"bench-user-{i}")) for i in range(users)]
+
+
+def generate_transactions(
+    users: int,
+    transactions: int,
+    days: int = 365,
+    seed: int = 0,
+    now: Optional[datetime] = None,
+) -> Iterator[dict]:
+    """Yield `transactions` documents spread over `users` users and the last `days` days.
+
+    Users get a skewed share of rows (a few heavy shops, a long tail of light ones),
+    which is closer to production than a uniform spread.
+    """
+    rng = random.Random(seed)
+    now = now or datetime.now(timezone.utc)
+    ids = user_ids(users)
+    weights = [1.0 / (rank + 1) ** 0.8 for rank in range(users)]
+    for _ in range(transactions):
+        user_id = rng.choices(ids, weights)[0]
+        category = rng.choices(CATEGORIES, CATEGORY_WEIGHTS)[0]
+        low, high = AMOUNT_RANGES[category]
+        date = now - timedelta(seconds=rng.randrange(days * 86400))
+        yield {
+            "id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            "user_id": user_id,
+            "category": category,
+            "amount": round(rng.uniform(low, high), 2),
+            "description": rng.choice(DESCRIPTIONS[category]),
+            "date": date.isoformat(),
+            "created_at": date.isoformat(),
+        }
+
+
+async def seed_transactions(store, users: int, transactions: int, days: int = 365, batch_size: int = 10000, seed: int = 0) -> List[str]:
+    """Insert generated transactions through `store.transactions`; returns the user ids."""
+    rows = generate_transactions(users, transactions, days=days, seed=seed)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        await store.transactions.insert_many(batch)
+    return user_ids(users)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed MongoDB (or a SQLite file) with synthetic transactions")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--transactions", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mongo-url", default="mongodb://localhost:27017")
+    parser.add_argument("--db-name", default="bench_database")
+    parser.add_argument("--sqlite-path", help="seed this SQLite file instead of MongoDB")
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from sqlite_storage import SQLiteStorage
+    from storage import MongoStorage
+
+    async def seed():
+        if args.sqlite_path:
+            store = SQLiteStorage(args.sqlite_path)
+        else:
+            store = MongoStorage(AsyncIOMotorClient(args.mongo_url)[args.db_name])
+        await store.open()
+        await seed_transactions(store, args.users, args.transactions, args.days, args.batch_size, args.seed)
+        await store.rollups.rebuild()
+        await store.close()
+
+    asyncio.run(seed())
+    print(f"Seeded {args.transactions} transactions for {args.users} users into {args.sqlite_path or args.db_name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import asyncio
+import json
+import os
+from types import SimpleNamespace
+
+from rate_limit import unlimited
+
+
+class FakeLlmChat:
+    """Stand-in for emergentintegrations' LlmChat with configurable latency.
+
+    Latency comes from FAKE_LLM_LATENCY_MS (default 0) and replies are canned
+    JSON shaped like what the real prompts ask for, so handlers take their
+    normal parsing path.
+    """
+
+    latency = float(os.environ.get("FAKE_LLM_LATENCY_MS", "0")) / 1000
+    calls = 0
+
+    def __init__(self, api_key=None, session_id="", system_message=""):
+        self.session_id = session_id
+        self.system_message = system_message
+
+    def with_model(self, provider, model):
+        return self
+
+    async def send_message(self, message):
+        type(self).calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.session_id.startswith("ocr_"):
+            return json.dumps({"sales": [1200.0, 450.5], "purchase": [800.0], "expense": [120.0]})
+        return "```json\n" + json.dumps({
+            "insights": "आज बिक्री अच्छी रही. Sales were steady today.",
+            "action_points": ["स्टॉक जांचें", "खर्च कम करें", "बिक्री बढ़ाएं", "ग्राहक संपर्क करें", "रिपोर्ट देखें"],
+        }, ensure_ascii=False) + "\n```"
+
+
+class FakeUserMessage:
+    def __init__(self, text: str, file_contents=None):
+        self.text = text
+        self.file_contents = file_contents or []
+
+
+class FakeImageContent:
+    def __init__(self, image_base64: str):
+        self.image_base64 = image_base64
+
+
+# Drop-in for server.llm_chat_module().
+fake_llm_module = SimpleNamespace(LlmChat=FakeLlmChat, UserMessage=FakeUserMessage, ImageContent=FakeImageContent)
+
+
+class FakeASRSession:
+    """Treats the audio bytes as UTF-8 text "spoken" into the microphone, so a
+    test can stream b"500 रुपये " + b"की बिक्री" and get that transcript back."""
+
+    def __init__(self, latency: float, capacity):
+        self.latency = latency
+        self.capacity = capacity
+        self.audio = bytearray()
+
+    async def feed(self, chunk: bytes):
+        self.audio += chunk
+        async with self.capacity():
+            if self.latency:
+                await asyncio.sleep(self.latency)
+        return self.audio.decode("utf-8", errors="ignore").strip() or None
+
+    async def finish(self) -> str:
+        async with self.capacity():
+            if self.latency:
+                await asyncio.sleep(self.latency)
+        return self.audio.decode("utf-8", errors="ignore").strip()
+
+    async def close(self):
+        pass
+
+
+class FakeASR:
+    """Drop-in for server.asr_backend(); latency per chunk from FAKE_ASR_LATENCY_MS."""
+
+    latency = float(os.environ.get("FAKE_ASR_LATENCY_MS", "0")) / 1000
+
+    def open(self, language: str, capacity=unlimited):
+        return FakeASRSession(self.latency, capacity)
+
+
+class FakeTTS:
+    """Drop-in for server.tts_synthesizer(): "audio" is an ID3 tag plus the text."""
+
+    calls = 0
+
+    async def synthesize(self, text: str, language: str) -> bytes:
+        type(self).calls += 1
+        return b"ID3" + f"{language}:{text}".encode("utf-8") * 64
+
+
+async def websocket_exchange(app, path: str, frames, query: str = "", hang_up=None):
+    """Drive one WebSocket conversation with an ASGI app in-process (httpx has
+    no WebSocket transport). `frames` are bytes (binary) or str (text) messages
+    sent in order after the handshake; returns every JSON message the app sent
+    and the close code. If given, `hang_up(messages)` is awaited once the
+    frames are used up, after which the client disconnects."""
+    incoming = asyncio.Queue()
+    replies, closed = [], asyncio.Event()
+    close_code = None
+    await incoming.put({"type": "websocket.connect"})
+    for frame in frames:
+        key = "bytes" if isinstance(frame, bytes) else "text"
+        await incoming.put({"type": "websocket.receive", key: frame})
+
+    async def receive():
+        if incoming.empty() and closed.is_set():
+            return {"type": "websocket.disconnect", "code": 1000}
+        if incoming.empty() and hang_up is not None:
+            await hang_up(replies)
+            return {"type": "websocket.disconnect", "code": 1000}
+        return await incoming.get()
+
+    async def send(message):
+        nonlocal close_code
+        if message["type"] == "websocket.send":
+            replies.append(json.loads(message.get("text") or message["bytes"]))
+        elif message["type"] == "websocket.close":
+            close_code = message.get("code", 1000)
+            closed.set()
+
+    scope = {
+        "type": "websocket", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+        "headers": [], "scheme": "ws", "server": ("test", 80), "client": ("test", 1234),
+        "root_path": "", "subprotocols": [], "asgi": {"version": "3.0"},
+    }
+    await app(scope, receive, send)
+    return SimpleNamespace(messages=replies, close_code=close_code,
+                           status_code=200 if close_code == 1000 else 500)
+
+
+def mongo_stand_in(db_name: str = "bench"):
+    """Mongo database for in-process runs: a real server when BENCH_MONGO_URL is set, else mongomock."""
+    mongo_url = os.environ.get("BENCH_MONGO_URL")
+    if mongo_url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        return AsyncIOMotorClient(mongo_url)[db_name]
+    from mongomock_motor import AsyncMongoMockClient
+
+    return AsyncMongoMockClient()[db_name]
+
+
+async def storage_stand_in(backend: str = None, archive=None):
+    """Opened Storage for in-process runs, picked by BENCH_STORAGE: "mongo"
+    (mongo_stand_in) or "sqlite" (in-memory)."""
+    backend = backend or os.environ.get("BENCH_STORAGE", "mongo")
+    if backend == "sqlite":
+        from sqlite_storage import SQLiteStorage
+
+        store = SQLiteStorage(":memory:", archive)
+    else:
+        from storage import MongoStorage
+
+        store = MongoStorage(mongo_stand_in(), archive=archive)
+    await store.open()
+    return store
@@ -0,0 +1,64 @@
+"""Analytics read from rollups: charts, insights and the dashboard."""
+from datetime import date, timedelta
+
+import pytest
+
+from analytics_engine import compute_insights
+from tests.conftest import auth, user
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_dashboard(client, seeded):
+    uid = user(seeded, 2)
+    dashboard = (await client.get(f"/api/dashboard/{uid}", headers=auth(uid))).json()
+    analytics = (await client.get(f"/api/analytics/{uid}?days=7", headers=auth(uid))).json()
+    transactions = (await client.get(f"/api/transactions/{uid}?limit=10", headers=auth(uid))).json()
+    reports = (await client.get(f"/api/reports/{uid}?limit=1", headers=auth(uid))).json()
+    assert dashboard["chart_data"] == analytics["chart_data"]
+    assert dashboard["totals"] == analytics["totals"]
+    assert dashboard["transactions"] == transactions
+    assert dashboard["report"] == (reports[0] if reports else None)
+    today = [p for p in analytics["chart_data"] if p["start"] == dashboard["today"]["date"]]
+    assert dashboard["today"]["sales_total"] == (today[0]["sales"] if today else 0)
+
+
+def days_of(today, values):
+    """Day rollups ending at `today`, one per (sales, expense) pair, oldest first."""
+    first = today - timedelta(days=len(values) - 1)
+    return [{"start": (first + timedelta(days=i)).isoformat(), "sales": sales, "purchase": 0, "expense": expense}
+            for i, (sales, expense) in enumerate(values)]
+
+
+def test_insights_on_known_series():
+    today = date(2026, 10, 19)
+    insights = compute_insights(days_of(today, [(100, 10)] * 21 + [(200, 10)] * 7), today, lookback_days=28)
+
+    assert insights["week_over_week"]["sales"] == {"this_week": 1400, "last_week": 700, "growth_pct": 100.0}
+    assert insights["week_over_week"]["net"]["growth_pct"] == pytest.approx(111.11)
+    assert insights["week_over_week"]["purchase"]["growth_pct"] is None
+    averages = insights["moving_averages"]
+    assert averages["dates"][-1] == today.isoformat() and len(averages["dates"]) == 28
+    assert averages["sales_ma7"][-1] == 200 and averages["sales_ma30"][-1] == 125
+    assert averages["expense_ma7"][-1] == 10
+    assert set(insights["weekday_seasonality"]["expense"].values()) == {1.0}
+    assert insights["weekday_seasonality"]["purchase"]["Mon"] == 1.0
+
+
+def test_forecast_follows_linear_trend():
+    today = date(2026, 10, 19)
+    insights = compute_insights(days_of(today, [(10 * i, 0) for i in range(90)]), today, lookback_days=90, horizon=3)
+    forecast = insights["forecast"]
+    assert forecast["trend_per_day"] == 10
+    assert forecast["dates"] == ["2026-10-20", "2026-10-21", "2026-10-22"]
+    assert len(forecast["net"]) == 3 and forecast["cumulative_net"][-1] == pytest.approx(sum(forecast["net"]))
+
+
+async def test_insights_endpoint_matches_rollups(server, client, seeded):
+    uid = user(seeded, 4)
+    insights = (await client.get(f"/api/analytics/{uid}/insights", params={"horizon": 5}, headers=auth(uid))).json()
+    today = date.fromisoformat(insights["as_of"])
+    rollups = await server.store.rollups.range(uid, "day", today - timedelta(days=server.ANALYTICS_LOOKBACK_DAYS - 1), today)
+    assert insights == compute_insights(rollups, today, server.ANALYTICS_LOOKBACK_DAYS, 5)
+    week = insights["week_over_week"]["sales"]
+    assert week["this_week"] == pytest.approx(sum(r.get("sales", 0) for r in rollups if r["start"] > (today - timedelta(days=7)).isoformat()), abs=0.01)
@@ -0,0 +1,92 @@
+import importlib
+import random
+import statistics
+
+import pytest
+
+import anomalies
+from anomalies import build_daily_stats, score_day, stats_increment
+
+USER = "u1"
+
+
+def day(i, sales):
+    return {"user_id": USER, "period": f"2026-10-{i + 1:02d}", "sales": sales, "count_sales": 1}
+
+
+def scored(history, total):
+    """Score a day with `total` sales against `history` (the other days' totals)."""
+    rollups = [day(i, amount) for i, amount in enumerate(history)] + [day(len(history), total)]
+    (stats,) = build_daily_stats(rollups)
+    return score_day(stats, rollups[-1])
+
+
+def history(days):
+    return [90.0, 110.0] * (days // 2) + [100.0] * (days % 2)
+
+
+@pytest.mark.parametrize("side", [1, -1])
+def test_flags_only_beyond_threshold(side):
+    past = history(max(anomalies.MIN_DAYS, 8))
+    mean, std = statistics.mean(past), statistics.stdev(past)
+    edge = anomalies.Z_THRESHOLD * std * side
+
+    assert scored(past, mean + edge * 0.99) == []
+    (flag,) = scored(past, mean + edge * 1.01)
+    assert flag["category"] == "sales" and flag["direction"] == ("high" if side > 0 else "low")
+    assert flag["mean"] == pytest.approx(mean, abs=0.01) and flag["std"] == pytest.approx(std, abs=0.01)
+    assert flag["z"] == pytest.approx(anomalies.Z_THRESHOLD * 1.01 * side, abs=0.01)
+
+
+def test_no_flags_until_min_days_of_history():
+    assert scored(history(anomalies.MIN_DAYS - 1), 10_000.0) == []
+    assert len(scored(history(anomalies.MIN_DAYS), 10_000.0)) == 1
+
+
+@pytest.mark.parametrize("setting", ["0", "1"])
+def test_min_days_is_clamped_to_two(monkeypatch, setting):
+    monkeypatch.setenv("ANOMALY_MIN_DAYS", setting)
+    try:
+        assert importlib.reload(anomalies).MIN_DAYS == 2
+        # One other day would divide by n - 1 == 0.
+        assert scored([100.0], 10_000.0) == []
+    finally:
+        monkeypatch.delenv("ANOMALY_MIN_DAYS")
+        importlib.reload(anomalies)
+
+def test_flat_history_is_not_scored():
+    assert scored([100.0] * (anomalies.MIN_DAYS + 5), 10_000.0) == []
+
+
+def test_days_without_activity_are_skipped():
+    (stats,) = build_daily_stats([day(i, amount) for i, amount in enumerate(history(20))])
+    assert score_day(stats, {"user_id": USER, "period": "2026-10-30", "sales": 0, "count_sales": 0}) == []
+
+
+def test_increments_match_full_recompute():
+    rng = random.Random(7)
+    totals, counts, moments = {}, {}, {"user_id": USER}
+    live = []
+    for _ in range(500):
+        if live and rng.random() < 0.3:
+            d, amount = live.pop(rng.randrange(len(live)))
+            amount, count_delta = -amount, -1
+        else:
+            d, amount = rng.randrange(15), round(rng.uniform(1, 500), 2)
+            live.append((d, amount))
+            count_delta = 1
+        totals[d] = totals.get(d, 0.0) + amount
+        counts[d] = counts.get(d, 0) + count_delta
+        for field, delta in stats_increment("sales", amount, totals[d], counts[d], count_delta).items():
+            category, name = field.split(".")
+            bucket = moments.setdefault(category, {"n": 0, "sum": 0.0, "sumsq": 0.0})
+            bucket[name] += delta
+
+    rollups = [
+        {"user_id": USER, "period": str(d), "sales": totals[d], "count_sales": counts[d]}
+        for d in totals
+    ]
+    (expected,) = build_daily_stats(rollups)
+    assert moments["sales"]["n"] == expected["sales"]["n"]
+    assert moments["sales"]["sum"] == pytest.approx(expected["sales"]["sum"], abs=1e-6)
+    assert moments["sales"]["sumsq"] == pytest.approx(expected["sales"]["sumsq"], rel=1e-9)
@@ -0,0 +1,93 @@
+"""Archiving old transactions must not change search results or rollups."""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from tests.datagen import generate_transactions
+from tests.fakes import storage_stand_in
+from archive import TransactionArchive, archive_transactions, merge_pages
+from storage import TransactionFilter
+from search import query_tokens
+
+pytestmark = pytest.mark.anyio
+
+NOW = datetime.now(timezone.utc)
+CUTOFF = (NOW - timedelta(days=60)).date()
+
+
+@pytest.fixture(params=["mongo", "sqlite"])
+async def store(request, tmp_path):
+    store = await storage_stand_in(request.param, TransactionArchive(tmp_path / "archive"))
+    docs = list(generate_transactions(3, 400, days=120, seed=11, now=NOW))
+    await store.transactions.insert_many(docs)
+    store.seeded = docs
+    yield store
+    await store.close()
+
+
+async def search_all(store, user_id, criteria, page_size=7):
+    """Page through like the API does: live page, merged with the archive."""
+    results = []
+    while True:
+        page = await store.transactions.search(user_id, criteria, page_size + 1)
+        page = merge_pages(page, store.archive.search(user_id, criteria, page_size + 1), page_size + 1)
+        results += page[:page_size]
+        if len(page) <= page_size:
+            return results
+        criteria.after = (page[page_size - 1]["date"], page[page_size - 1]["id"])
+
+
+async def test_archive_moves_old_rows_and_search_still_finds_them(store):
+    user_id = store.seeded[0]["user_id"]
+    mine = sorted((d for d in store.seeded if d["user_id"] == user_id), key=lambda d: (d["date"], d["id"]), reverse=True)
+    old = [d for d in store.seeded if d["date"] < CUTOFF.isoformat()]
+
+    assert await archive_transactions(store, store.archive, CUTOFF, batch_size=50) == len(old)
+    assert await store.transactions.older_than(user_id, CUTOFF.isoformat(), 10) == []
+    assert store.archive.newest_date(user_id) < CUTOFF.isoformat()
+
+    everything = await search_all(store, user_id, TransactionFilter())
+    assert [t["id"] for t in everything] == [d["id"] for d in mine]
+    assert everything[-1]["amount"] == mine[-1]["amount"]
+
+    criteria = TransactionFilter(tokens=tuple(query_tokens("बिक")), amount_min=1000)
+    expected = [d["id"] for d in mine if "बिक्री" in d["description"] and d["amount"] >= 1000]
+    assert [t["id"] for t in await search_all(store, user_id, criteria)] == expected
+
+    # A second run has nothing left to move and leaves the archive as it was.
+    assert await archive_transactions(store, store.archive, CUTOFF) == 0
+    assert len(store.archive.read(user_id)) == sum(1 for d in old if d["user_id"] == user_id)
+
+
+async def test_rebuild_counts_archived_transactions(store):
+    user_id = store.seeded[0]["user_id"]
+    first, last = (NOW - timedelta(days=400)).date(), (NOW + timedelta(days=1)).date()
+    await store.rollups.rebuild()
+    before = await store.rollups.range(user_id, "month", first, last)
+
+    await archive_transactions(store, store.archive, CUTOFF)
+    await store.rollups.rebuild()
+    after = await store.rollups.range(user_id, "month", first, last)
+    assert [r["start"] for r in after] == [r["start"] for r in before]
+    for a, b in zip(before, after):
+        assert a.get("sales", 0) == pytest.approx(b.get("sales", 0))
+        assert a.get("count_expense", 0) == b.get("count_expense", 0)
+
+
+async def test_search_reads_only_the_months_it_needs(store, monkeypatch):
+    user_id = store.seeded[0]["user_id"]
+    await archive_transactions(store, store.archive, CUTOFF)
+    months = store.archive.months(user_id)
+    assert len(months) > 1
+    read, months_read = store.archive.read, []
+
+    def spy(uid, months=None, columns=None):
+        months_read.extend(months)
+        return read(uid, months, columns)
+
+    monkeypatch.setattr(store.archive, "read", spy)
+    page = store.archive.search(user_id, TransactionFilter(), 1)
+    assert months_read == months[-1:]
+    assert page[0]["date"] == store.archive.newest_date(user_id)
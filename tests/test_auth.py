@@ -0,0 +1,85 @@
+import jwt
+import pytest
+from fastapi import HTTPException
+
+import auth
+from tests.conftest import auth as auth_headers, token, user
+from tests.fakes import websocket_exchange
+
+NEW, OLD = "n" * 32, "o" * 32
+
+
+@pytest.fixture
+def keys(monkeypatch):
+    monkeypatch.setenv("AUTH_SIGNING_KEYS", f"k2:{NEW},k1:{OLD}")
+    auth.key_set.cache_clear()
+    yield auth.key_set()
+    auth.key_set.cache_clear()
+
+
+def test_refuses_to_sign_without_keys(monkeypatch):
+    monkeypatch.setenv("AUTH_SIGNING_KEYS", "")
+    auth.key_set.cache_clear()
+    with pytest.raises(RuntimeError):
+        auth.issue_token("u1")
+    auth.key_set.cache_clear()
+
+def test_round_trip_signs_with_first_key(keys):
+    token = auth.issue_token("u1")
+    assert jwt.get_unverified_header(token)["kid"] == "k2"
+    assert auth.verify_token(token) == "u1"
+
+
+def test_retired_key_still_verifies(keys):
+    old = jwt.encode({"sub": "u1", "exp": 2**31}, OLD, algorithm="HS256", headers={"kid": "k1"})
+    assert auth.verify_token(old) == "u1"
+
+
+@pytest.mark.parametrize("token", [
+    jwt.encode({"sub": "u1", "exp": 2**31}, "x" * 32, algorithm="HS256", headers={"kid": "k2"}),
+    jwt.encode({"sub": "u1", "exp": 2**31}, NEW, algorithm="HS256", headers={"kid": "k9"}),
+    jwt.encode({"sub": "u1"}, NEW, algorithm="HS256", headers={"kid": "k2"}),
+    "not-a-token",
+])
+def test_rejects_bad_tokens(keys, token):
+    with pytest.raises(HTTPException) as exc:
+        auth.verify_token(token)
+    assert exc.value.status_code == 401
+
+
+def test_short_secrets_are_refused():
+    with pytest.raises(ValueError):
+        auth.KeySet.parse("k1:short")
+
+
+def test_rejects_expired_token(keys):
+    with pytest.raises(HTTPException) as exc:
+        auth.verify_token(auth.issue_token("u1", ttl=-1))
+    assert exc.value.detail == "Token expired"
+
+
+@pytest.mark.anyio
+async def test_access_tokens(server, client, seeded):
+    uid, other = user(seeded, 0), user(seeded, 1)
+    await client.post("/api/auth/register", json={"username": "tok", "email": "tok@example.com", "password": "pw"})
+    login = (await client.post("/api/auth/login", json={"email": "tok@example.com", "password": "pw"})).json()
+    headers = {"Authorization": f"Bearer {login['access_token']}"}
+    assert (await client.get(f"/api/transactions/{login['user_id']}", headers=headers)).status_code == 200
+
+    assert (await client.get(f"/api/transactions/{uid}")).status_code == 401
+    assert (await client.get(f"/api/transactions/{other}", headers=auth_headers(uid))).status_code == 403
+    response = await client.post("/api/transactions", data={"user_id": other, "category": "sales", "amount": "5"},
+                                 headers=auth_headers(uid))
+    assert response.status_code == 403
+    created = (await client.post("/api/transactions", data={"category": "sales", "amount": "5"}, headers=auth_headers(uid))).json()
+    assert created["user_id"] == uid
+    rejected = await websocket_exchange(server.app, f"/api/live/{uid}", [], f"access_token={token(other)}")
+    assert rejected.close_code == 1008
+
+
+@pytest.mark.anyio
+async def test_duplicate_email_is_refused(client):
+    form = {"username": "dup", "email": "dup@example.com", "password": "pw"}
+    assert (await client.post("/api/auth/register", json=form)).status_code == 200
+    again = await client.post("/api/auth/register", json={**form, "username": "x"})
+    assert again.status_code == 400 and again.json()["detail"] == "Email already registered"
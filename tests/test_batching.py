@@ -0,0 +1,87 @@
+import asyncio
+from datetime import date, timedelta
+
+import pytest
+
+from batching import WriteBatcher
+from categories import CATEGORY_VALUES
+from rollups import GRANULARITIES
+from tests.datagen import generate_transactions, user_ids
+from tests.fakes import storage_stand_in
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_concurrent_submits_share_one_flush():
+    flushed = []
+
+    async def flush(docs):
+        flushed.append(len(docs))
+        return [None] * len(docs)
+
+    batcher = WriteBatcher(flush, max_delay=0.005, max_size=32)
+    await asyncio.gather(*(batcher.submit({"n": i}) for i in range(70)))
+    assert flushed == [32, 32, 6]
+
+
+async def test_bad_document_fails_only_its_caller():
+    store = await storage_stand_in("sqlite")
+    batcher = WriteBatcher(store.transactions.insert_batch, max_delay=0.005, max_size=100)
+    docs = list(generate_transactions(2, 10, seed=1))
+    results = await asyncio.gather(*(batcher.submit(d) for d in docs + [dict(docs[3])]), return_exceptions=True)
+    assert [r is None for r in results] == [True] * 10 + [False]
+    stored = [t for user_id in user_ids(2) for t in await store.transactions.recent(user_id, 100)]
+    assert sorted(t["id"] for t in stored) == sorted(d["id"] for d in docs)
+    await store.close()
+
+
+@pytest.mark.parametrize("backend", ["mongo", "sqlite"])
+async def test_batched_rollups_match_one_at_a_time(backend):
+    docs = list(generate_transactions(2, 120, days=5, seed=4))
+    one_by_one, batched = await storage_stand_in(backend), await storage_stand_in(backend)
+    day_rollups = [await one_by_one.rollups.apply(d["user_id"], d["date"], d["category"], d["amount"]) for d in docs]
+    batched_days = []
+    for start in range(0, len(docs), 50):
+        batched_days += await batched.rollups.apply_many(docs[start:start + 50])
+
+    # Each document gets its own day's rollup (batches return it with the whole batch applied).
+    assert [(r["user_id"], r["start"]) for r in batched_days] == [(r["user_id"], r["start"]) for r in day_rollups]
+    first, last = date.today() - timedelta(days=400), date.today() + timedelta(days=1)
+    for user_id in user_ids(2):
+        for granularity in GRANULARITIES:
+            expected = await one_by_one.rollups.range(user_id, granularity, first, last)
+            actual = await batched.rollups.range(user_id, granularity, first, last)
+            assert [r["start"] for r in actual] == [r["start"] for r in expected]
+            for a, b in zip(actual, expected):
+                for field in ("sales", "expense", "count_sales", "count_purchase"):
+                    assert a.get(field, 0) == pytest.approx(b.get(field, 0))
+        expected_stats, actual_stats = await one_by_one.rollups.stats(user_id), await batched.rollups.stats(user_id)
+        assert expected_stats.get("sales")
+        for category, moments in expected_stats.items():
+            if category in CATEGORY_VALUES:
+                assert actual_stats[category] == pytest.approx(moments)
+    await one_by_one.close()
+    await batched.close()
+
+
+async def test_rollup_failure_does_not_fail_stored_transactions(server, monkeypatch):
+    store = await storage_stand_in()
+    monkeypatch.setattr(server, "store", store)
+
+    async def broken(docs):
+        raise RuntimeError("rollups unavailable")
+
+    monkeypatch.setattr(store.rollups, "apply_many", broken)
+    docs = list(generate_transactions(2, 10, days=3, seed=5))
+    batcher = WriteBatcher(server.store_transactions, max_delay=0.005, max_size=100)
+    results = await asyncio.gather(*(batcher.submit(d) for d in docs), return_exceptions=True)
+    assert results == [None] * len(docs)
+    assert len(await store.transactions.recent(docs[0]["user_id"], 100)) == len(docs) // 2
+
+    # The stored transactions' users get their rollups rebuilt in the background.
+    await asyncio.gather(*server.rollup_repairs)
+    for user_id in user_ids(2):
+        expected = sum(d["amount"] for d in docs if d["user_id"] == user_id and d["category"] == "sales")
+        rollups = await store.rollups.range(user_id, "year", date.today() - timedelta(days=800), date.today())
+        assert sum(r.get("sales", 0) for r in rollups) == pytest.approx(expected)
+    await store.close()
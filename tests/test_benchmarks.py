@@ -0,0 +1,136 @@
+"""In-process latency/throughput benchmarks for every API endpoint.
+
+Drives the ASGI app through httpx with a Mongo stand-in (or in-memory SQLite
+with BENCH_STORAGE=sqlite) and FakeLlmChat, so no network, database server or
+LLM key is needed. Scale and load are tuned with
+BENCH_USERS, BENCH_TRANSACTIONS, BENCH_ITERATIONS and BENCH_CONCURRENCY.
+Set BENCH_OUTPUT to save results as JSON, and point BENCH_BASELINE at an
+earlier run to fail on p95 regressions beyond BENCH_TOLERANCE.
+"""
+import base64
+
+import pytest
+
+from tests import benchmark
+from tests.conftest import auth, token, user
+from tests.fakes import websocket_exchange
+
+PNG_1X1 = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8/5+hHgAHggJ/PchI7wAAAABJRU5ErkJggg=="
+)
+
+pytestmark = pytest.mark.anyio
+
+
+async def run(name, call):
+    result = await benchmark.measure(name, call)
+    benchmark.assert_no_regression(result)
+
+
+async def test_root(client):
+    await run("GET /api/", lambda i: client.get("/api/"))
+
+
+async def test_register_and_login(client):
+    async def register(i):
+        return await client.post("/api/auth/register", json={
+            "username": f"bench{i}", "email": f"bench{i}@example.com", "password": "pw"})
+
+    async def login(i):
+        return await client.post("/api/auth/login", json={"email": f"bench{i}@example.com", "password": "pw"})
+
+    await run("POST /api/auth/register", register)
+    await run("POST /api/auth/login", login)
+
+
+async def test_create_transaction(client, seeded):
+    await run("POST /api/transactions", lambda i: client.post("/api/transactions", data={
+        "user_id": user(seeded, i), "category": "sales", "amount": "250.5", "description": "bench sale"},
+        headers=auth(user(seeded, i))))
+
+
+async def test_create_transaction_batched(server, client, seeded):
+    batcher = server.WriteBatcher(server.store_transactions, max_delay=0.002, max_size=64)
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(server, "transaction_batcher", batcher)
+        await run("POST /api/transactions batched", lambda i: client.post("/api/transactions", data={
+            "user_id": user(seeded, i), "category": "expense", "amount": "75", "description": "batched chai"},
+            headers=auth(user(seeded, i))))
+
+
+async def test_get_transactions(client, seeded):
+    await run("GET /api/transactions", lambda i: client.get(f"/api/transactions/{user(seeded, i)}", headers=auth(user(seeded, i))))
+
+
+async def test_search_transactions(client, seeded):
+    await run("GET /api/transactions/search", lambda i: client.get(
+        f"/api/transactions/{user(seeded, i)}/search", params={"q": ("बिक", "sal", "shop re")[i % 3], "limit": 20},
+        headers=auth(user(seeded, i))))
+    await run("GET /api/transactions/search filtered", lambda i: client.get(
+        f"/api/transactions/{user(seeded, i)}/search",
+        params={"q": "bill", "category": "expense", "amount_min": 100, "amount_max": 3000},
+        headers=auth(user(seeded, i))))
+
+
+async def test_analytics(client, seeded):
+    await run("GET /api/analytics", lambda i: client.get(f"/api/analytics/{user(seeded, i)}?days=30", headers=auth(user(seeded, i))))
+    await run("GET /api/analytics monthly", lambda i: client.get(
+        f"/api/analytics/{user(seeded, i)}?granularity=month&periods=60&compare=true", headers=auth(user(seeded, i))))
+    await run("GET /api/analytics/insights", lambda i: client.get(f"/api/analytics/{user(seeded, i)}/insights", headers=auth(user(seeded, i))))
+
+
+async def test_generate_report(client, seeded):
+    await run("POST /api/generate-report", lambda i: client.post(f"/api/generate-report/{user(seeded, i)}", headers=auth(user(seeded, i))))
+
+
+async def test_get_reports(client, seeded):
+    await run("GET /api/reports", lambda i: client.get(f"/api/reports/{user(seeded, i)}?limit=10", headers=auth(user(seeded, i))))
+
+
+async def test_changes(client, seeded):
+    since = (await client.get(f"/api/changes/{user(seeded, 1)}", headers=auth(user(seeded, 1)))).json()["version"]
+    await run("GET /api/changes", lambda i: client.get(f"/api/changes/{user(seeded, i)}", params={"since": since}, headers=auth(user(seeded, i))))
+
+
+async def test_dashboard(client, seeded):
+    await run("GET /api/dashboard", lambda i: client.get(f"/api/dashboard/{user(seeded, i)}", headers=auth(user(seeded, i))))
+
+
+async def test_not_modified(client, seeded):
+    uid = user(seeded, 3)
+    tag = (await client.get(f"/api/transactions/{uid}", headers=auth(uid))).headers["etag"]
+    await run("GET /api/transactions 304", lambda i: client.get(
+        f"/api/transactions/{uid}", headers={**auth(uid), "If-None-Match": tag}))
+
+
+async def test_scan_document(client, seeded):
+    await run("POST /api/scan-document", lambda i: client.post(
+        "/api/scan-document", data={"user_id": user(seeded, i)}, files={"file": ("bill.png", PNG_1X1, "image/png")},
+        headers=auth(user(seeded, i))))
+
+
+async def test_voice(client, seeded):
+    await run("POST /api/voice/transcribe", lambda i: client.post(
+        "/api/voice/transcribe", json={"audio_base64": "dGVzdA==", "user_id": user(seeded, i)}, headers=auth(user(seeded, i))))
+    await run("POST /api/voice/speak", lambda i: client.post(
+        "/api/voice/speak", json={"text": "नमस्ते"}, headers=auth(user(seeded, i))))
+
+
+async def test_voice_audio(client, seeded):
+    report = (await client.post(f"/api/generate-report/{user(seeded, 0)}", headers=auth(user(seeded, 0)))).json()
+    url = report["action_point_audio"][0]
+    await client.post("/api/voice/speak", json={"text": report["action_points"][0]}, headers=auth(user(seeded, 0)))
+
+    await run("GET /api/voice/audio", lambda i: client.get(url))
+    await run("GET /api/voice/audio range", lambda i: client.get(url, headers={"Range": "bytes=0-1023"}))
+
+
+async def test_voice_stream(server, seeded):
+    frames = ["आज ५०० ".encode(), "रुपये की ".encode(), "बिक्री हुई".encode(), '{"type": "end"}']
+    await run("WS /api/voice/stream", lambda i: websocket_exchange(
+        server.app, "/api/voice/stream", frames, f"user_id={user(seeded, i)}&access_token={token(user(seeded, i))}"))
+
+
+async def test_observability(client):
+    await run("GET /api/limits", lambda i: client.get("/api/limits"))
+    await run("GET /metrics", lambda i: client.get("/metrics"))
@@ -0,0 +1,144 @@
+"""Index registry checks.
+
+The explain test needs a real server (BENCH_MONGO_URL): it records every
+query the API sends while serving each endpoint and fails if any of them is
+planned as a collection scan.
+"""
+import os
+import uuid
+
+import httpx
+import pytest
+from pymongo import ASCENDING, IndexModel, monitoring
+
+from auth import issue_token
+from database import INDEXES, RETIRED_INDEXES, ensure_indexes
+from storage import MongoStorage
+from tests.datagen import seed_transactions
+from tests.fakes import FakeASR, FakeTTS, fake_llm_module, mongo_stand_in
+
+pytestmark = pytest.mark.anyio
+
+# Commands that read through an index; inserts and cursor paging are skipped.
+EXPLAINABLE = ("find", "aggregate", "count", "distinct", "findAndModify", "update", "delete")
+# Session and transport fields that explain does not accept.
+NOT_EXPLAINABLE_FIELDS = ("lsid", "txnNumber", "writeConcern", "readConcern", "$db", "$clusterTime", "$readPreference")
+
+
+async def test_registry_upgrades_changed_options():
+    db = mongo_stand_in(f"indexes_{uuid.uuid4().hex[:8]}")
+    await db.users.create_index([("email", ASCENDING)])
+    await ensure_indexes(db)
+    await ensure_indexes(db)
+    info = await db.users.index_information()
+    assert info["email_1"].get("unique") is True
+
+    for collection, models in INDEXES.items():
+        names = set(await db[collection].index_information())
+        assert {model.document["name"] for model in models} <= names
+
+
+async def test_retired_indexes_are_dropped():
+    db = mongo_stand_in(f"indexes_{uuid.uuid4().hex[:8]}")
+    await db.transactions.create_index([("user_id", ASCENDING), ("date", -1), ("category", ASCENDING), ("amount", ASCENDING)])
+    await db.transactions.create_index([("description", ASCENDING)])
+    await ensure_indexes(db)
+    names = set(await db.transactions.index_information())
+    assert names.isdisjoint(RETIRED_INDEXES["transactions"])
+    assert {"user_id_1_date_-1_id_-1", "description_1"} <= names
+
+
+async def test_failed_rebuild_keeps_old_index():
+    db = mongo_stand_in(f"indexes_{uuid.uuid4().hex[:8]}")
+    await db.users.create_index([("email", ASCENDING)])
+    await db.users.insert_many([{"email": "a@example.com"}, {"email": "a@example.com"}])
+    await ensure_indexes(db, {"users": [IndexModel([("email", ASCENDING)], unique=True)]})
+    info = await db.users.index_information()
+    assert "email_1" in info and not info["email_1"].get("unique")
+
+
+class QueryRecorder(monitoring.CommandListener):
+    def __init__(self):
+        self.commands = []
+
+    def started(self, event):
+        if event.command_name in EXPLAINABLE:
+            self.commands.append((event.database_name, dict(event.command)))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def explain_commands(command: dict):
+    """Explainable forms of a recorded command; write batches go one statement at a time."""
+    command = {k: v for k, v in command.items() if k not in NOT_EXPLAINABLE_FIELDS}
+    for batch in ("updates", "deletes"):
+        if batch in command:
+            for statement in command[batch]:
+                yield {**command, batch: [statement]}
+            return
+    yield command
+
+
+def plan_stages(node):
+    if isinstance(node, dict):
+        if "stage" in node:
+            yield node["stage"]
+        for value in node.values():
+            yield from plan_stages(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from plan_stages(value)
+
+
+@pytest.mark.skipif(not os.environ.get("BENCH_MONGO_URL"), reason="explain() needs a real MongoDB (BENCH_MONGO_URL)")
+async def test_endpoint_queries_use_indexes(tmp_path):
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    import server
+
+    recorder = QueryRecorder()
+    client = AsyncIOMotorClient(os.environ["BENCH_MONGO_URL"], event_listeners=[recorder])
+    db = client[f"explain_{uuid.uuid4().hex[:8]}"]
+    store = MongoStorage(db)
+    await ensure_indexes(db)
+    users = await seed_transactions(store, 3, 300, days=30)
+    await store.rollups.rebuild()
+
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(server, "store", store)
+        patch.setattr(server, "llm_chat_module", lambda: fake_llm_module)
+        patch.setattr(server, "asr_backend", lambda: FakeASR())
+        patch.setattr(server, "tts_synthesizer", lambda: FakeTTS())
+        patch.setattr(server, "audio_cache", server.AudioCache(tmp_path))
+        uid = users[0]
+        headers = {"Authorization": f"Bearer {issue_token(uid)}"}
+        recorder.commands.clear()
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://explain") as api:
+            await api.post("/api/auth/register", json={"username": "e", "email": "e@example.com", "password": "pw"})
+            await api.post("/api/auth/login", json={"email": "e@example.com", "password": "pw"})
+            created = (await api.post("/api/transactions", data={"category": "sales", "amount": "10"}, headers=headers)).json()
+            await api.get(f"/api/transactions/{uid}", headers=headers)
+            await api.get(f"/api/transactions/{uid}/search", params={"q": "बिक", "category": "sales"}, headers=headers)
+            await api.get(f"/api/changes/{uid}", params={"since": 1}, headers=headers)
+            await api.get(f"/api/analytics/{uid}", params={"compare": "true"}, headers=headers)
+            await api.get(f"/api/analytics/{uid}/insights", headers=headers)
+            await api.post(f"/api/generate-report/{uid}", headers=headers)
+            await api.get(f"/api/reports/{uid}", headers=headers)
+            await api.delete(f"/api/transactions/{uid}/{created['id']}", headers=headers)
+
+    try:
+        assert recorder.commands
+        scans = []
+        for database, command in recorder.commands:
+            for explainable in explain_commands(command):
+                plan = await client[database].command({"explain": explainable, "verbosity": "queryPlanner"})
+                if "COLLSCAN" in set(plan_stages(plan)):
+                    scans.append(explainable)
+        assert not scans, f"collection scans: {scans}"
+    finally:
+        await client.drop_database(db.name)
+        client.close()
@@ -0,0 +1,36 @@
+"""Live day totals pushed over /api/live."""
+import asyncio
+
+import pytest
+
+from tests.conftest import auth, token, user
+from tests.fakes import storage_stand_in, websocket_exchange
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_live_updates(server, client, seeded):
+    uid = user(seeded, 2)
+    sale = {"user_id": uid, "category": "sales", "amount": "125"}
+    await client.post("/api/transactions", data=sale, headers=auth(uid))  # so today has totals to start from
+
+    async def hang_up(messages):
+        await client.post("/api/transactions", data=sale, headers=auth(uid))
+        for _ in range(200):
+            if len(messages) == 2:
+                return
+            await asyncio.sleep(0.005)
+
+    result = await websocket_exchange(server.app, f"/api/live/{uid}", [], f"access_token={token(uid)}", hang_up=hang_up)
+    today, update = result.messages
+    assert update["type"] == "day" and update["start"] == today["start"]
+    assert update["sales"] == pytest.approx(today["sales"] + 125)
+    assert server.live_events.subscribers(uid) == 0
+
+
+async def test_changestream_without_mongo_publishes_in_process(server, monkeypatch):
+    store = await storage_stand_in("sqlite")
+    monkeypatch.setattr(server, "LIVE_EVENTS", "changestream")
+    assert server.start_live_relay(store) is None
+    assert server.LIVE_EVENTS == "local"
+    await store.close()
@@ -0,0 +1,57 @@
+import pytest
+
+from metrics import Counter, Histogram, Registry
+from tests.conftest import auth, user
+
+pytestmark = pytest.mark.anyio
+
+
+def samples(text):
+    """{'name{labels}': value} for every sample line of an exposition."""
+    return {
+        line.rsplit(" ", 1)[0]: float(line.rsplit(" ", 1)[1])
+        for line in text.splitlines() if line and not line.startswith("#")
+    }
+
+
+def test_exposition_format():
+    registry = Registry()
+    requests = registry.register(Counter("jobs_total", "Jobs by kind.", ("kind",)))
+    latency = registry.register(Histogram("job_seconds", "Job latency.", ("kind",), buckets=(1, 2)))
+    requests.labels('say "hi"\n').inc(2)
+    for value in (0.5, 1.5, 5):
+        latency.labels("a").observe(value)
+
+    assert registry.render().splitlines() == [
+        "# HELP jobs_total Jobs by kind.",
+        "# TYPE jobs_total counter",
+        'jobs_total{kind="say \\"hi\\"\\n"} 2',
+        "# HELP job_seconds Job latency.",
+        "# TYPE job_seconds histogram",
+        'job_seconds_bucket{kind="a",le="1"} 1',
+        'job_seconds_bucket{kind="a",le="2"} 2',
+        'job_seconds_bucket{kind="a",le="+Inf"} 3',
+        'job_seconds_sum{kind="a"} 7',
+        'job_seconds_count{kind="a"} 3',
+    ]
+
+
+async def test_requests_are_counted_by_route_template(client, seeded):
+    uid = user(seeded, 6)
+    ok = 'http_requests_total{method="GET",route="/api/transactions/{user_id}",status="200"}'
+    llm = 'llm_requests_total{endpoint="generate_daily_report",outcome="ok"}'
+    before = samples((await client.get("/metrics")).text)
+
+    await client.get(f"/api/transactions/{uid}", headers=auth(uid))
+    await client.post(f"/api/generate-report/{uid}", headers=auth(uid))
+    response = await client.get("/metrics")
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    after = samples(response.text)
+
+    assert after[ok] == before.get(ok, 0) + 1
+    assert after[llm] == before.get(llm, 0) + 1
+    count = 'http_request_duration_seconds_count{method="GET",route="/api/transactions/{user_id}"}'
+    assert after[count] == before.get(count, 0) + 1
+    assert after['llm_tokens_estimated_total{endpoint="generate_daily_report",direction="prompt"}'] > 0
+    assert after["llm_admission_admitted_total"] > before.get("llm_admission_admitted_total", 0)
+    assert not any(uid in name for name in after), "raw paths must not become label values"
@@ -0,0 +1,99 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import migrations
+from categories import Category, normalize_category
+from migrations import run_migrations
+from tests.fakes import mongo_stand_in
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def steps(monkeypatch):
+    """Replace MIGRATIONS with one slow migration that records every run."""
+    runs, release = [], asyncio.Event()
+
+    async def slow(db):
+        runs.append(1)
+        await release.wait()
+
+    monkeypatch.setattr(migrations, "MIGRATIONS", [("slow", slow)])
+    return runs, release
+
+
+async def state(db):
+    return await db.migrations.find_one({"_id": "slow"})
+
+
+async def test_concurrent_workers_wait_for_the_winner(steps):
+    runs, release = steps
+    db = mongo_stand_in("migrations_concurrent")
+    first = asyncio.create_task(run_migrations(db, poll=0.01))
+    second = asyncio.create_task(run_migrations(db, poll=0.01))
+    await asyncio.sleep(0.05)
+    # The loser must not start serving while the migration is still running.
+    assert runs == [1] and not first.done() and not second.done()
+
+    release.set()
+    await asyncio.gather(first, second)
+    assert runs == [1] and (await state(db))["state"] == "applied"
+
+
+async def test_expired_claim_is_taken_over(steps):
+    runs, release = steps
+    db = mongo_stand_in("migrations_stale")
+    expired = (datetime.now(timezone.utc) - timedelta(seconds=1)).isoformat()
+    await db.migrations.insert_one({"_id": "slow", "state": "running", "owner": "dead", "lease_until": expired})
+    release.set()
+
+    await asyncio.wait_for(run_migrations(db, poll=0.01), timeout=1)
+    claim = await state(db)
+    assert runs == [1] and claim["state"] == "applied" and claim["owner"] != "dead"
+
+
+async def test_live_claim_is_renewed_and_waited_on(steps):
+    runs, release = steps
+    db = mongo_stand_in("migrations_live")
+    holder = asyncio.create_task(run_migrations(db, lease=0.06, poll=0.01))
+    await asyncio.sleep(0.01)
+    waiter = asyncio.create_task(run_migrations(db, lease=0.06, poll=0.01))
+    # Several lease lengths pass; the heartbeat keeps the claim from being taken over.
+    await asyncio.sleep(0.2)
+    assert runs == [1] and not waiter.done()
+
+    release.set()
+    await asyncio.wait_for(asyncio.gather(holder, waiter), timeout=1)
+    assert runs == [1]
+
+
+async def test_failed_migration_releases_its_claim(monkeypatch):
+    async def broken(db):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(migrations, "MIGRATIONS", [("slow", broken)])
+    db = mongo_stand_in("migrations_failed")
+    with pytest.raises(RuntimeError):
+        await run_migrations(db)
+    assert await state(db) is None
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("sales", Category.SALES),
+    (" Sales ", Category.SALES),
+    ("EXPENSE", Category.EXPENSE),
+    ("purchases", Category.PURCHASE),
+    ("बिक्री", Category.SALES),
+    ("खर्चा", Category.EXPENSE),
+    (Category.PURCHASE, Category.PURCHASE),
+])
+def test_normalize_category(value, expected):
+    assert normalize_category(value) == expected
+
+
+@pytest.mark.parametrize("value", ["refund", "", None, 3])
+def test_normalize_category_rejects_unknown(value):
+    with pytest.raises(ValueError):
+        normalize_category(value)
@@ -0,0 +1,51 @@
+import time
+
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from profiler import ProfilingMiddleware, profile_path
+
+pytestmark = pytest.mark.anyio
+
+TOKEN = "p" * 32
+
+
+async def busy_handler(request):
+    deadline = time.perf_counter() + 0.05
+    while time.perf_counter() < deadline:
+        pass
+    return PlainTextResponse("done")
+
+
+@pytest.fixture
+async def profiled(tmp_path):
+    app = ProfilingMiddleware(Starlette(routes=[Route("/work", busy_handler)]), TOKEN, tmp_path, interval=0.001)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://profiled") as client:
+        yield client
+
+
+async def test_profile_written_for_matching_token(profiled, tmp_path):
+    response = await profiled.get("/work", headers={"X-Profile-Token": TOKEN})
+    assert response.text == "done"
+    folded = profile_path(tmp_path, response.headers["x-profile-id"]).read_text()
+    assert "busy_handler (test_profiler.py" in folded
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in folded.splitlines())
+
+
+@pytest.mark.parametrize("headers, query", [
+    ({"X-Profile-Token": "x" * 32}, ""),
+    ({}, f"profile_token={TOKEN}"),
+    ({}, "profile_token=%ff%fe"),
+])
+async def test_other_requests_are_not_profiled(profiled, tmp_path, headers, query):
+    response = await profiled.get(f"/work?{query}", headers=headers)
+    assert response.status_code == 200 and "x-profile-id" not in response.headers
+    assert not list(tmp_path.iterdir())
+
+
+def test_profile_ids_are_validated(tmp_path):
+    assert profile_path(tmp_path, "../../etc/passwd") is None
+    assert profile_path(tmp_path, "a" * 32) == tmp_path / f"{'a' * 32}.folded"
@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from rate_limit import LLMAdmission, TokenBucket
+from tests.conftest import auth, user
+
+pytestmark = pytest.mark.anyio
+
+
+def admission(**limits):
+    return LLMAdmission(**{"rate_per_minute": 60, "burst": 100, "max_in_flight": 10, "max_queue": 10,
+                           "queue_timeout": 1.0, **limits})
+
+
+def test_bucket_refills_at_rate():
+    bucket = TokenBucket(capacity=2, rate=1.0, now=0.0)
+    assert bucket.try_take(0.0) == (True, 0.0)
+    assert bucket.try_take(0.0) == (True, 0.0)
+    assert bucket.try_take(0.0) == (False, pytest.approx(1.0))
+    assert bucket.try_take(0.5) == (False, pytest.approx(0.5))
+    assert bucket.try_take(1.0)[0]
+    # Idle time refills only up to capacity.
+    assert [bucket.try_take(100.0)[0] for _ in range(3)] == [True, True, False]
+
+
+async def test_user_over_rate_gets_429_with_retry_after():
+    limits = admission(rate_per_minute=6, burst=1)
+    async with limits.slot("u1"):
+        pass
+    with pytest.raises(HTTPException) as exc:
+        async with limits.slot("u1"):
+            pass
+    assert exc.value.status_code == 429
+    assert exc.value.headers["Retry-After"] == "10"
+    # Other users have their own bucket.
+    async with limits.slot("u2"):
+        pass
+    assert limits.stats()["rejected_user_rate"] == 1 and limits.stats()["admitted"] == 2
+
+
+async def test_queue_is_bounded_and_waits_time_out():
+    limits = admission(max_in_flight=1, max_queue=1, queue_timeout=0.05)
+    held, release = asyncio.Event(), asyncio.Event()
+
+    async def hold():
+        async with limits.slot("a"):
+            held.set()
+            await release.wait()
+
+    holder = asyncio.create_task(hold())
+    await held.wait()
+    waiter = asyncio.create_task(limits.slot("b").__aenter__())
+    await asyncio.sleep(0)
+    assert limits.stats()["queued"] == 1
+
+    with pytest.raises(HTTPException) as full:
+        async with limits.slot("c"):
+            pass
+    assert full.value.status_code == 429 and full.value.headers["Retry-After"] == "1"
+    with pytest.raises(HTTPException) as timed_out:
+        await waiter
+    assert timed_out.value.status_code == 429
+
+    release.set()
+    await holder
+    stats = limits.stats()
+    assert (stats["rejected_queue_full"], stats["rejected_queue_timeout"], stats["queued"], stats["in_flight"]) == (1, 1, 0, 0)
+
+
+async def test_llm_endpoint_answers_429(server, client, seeded, monkeypatch):
+    monkeypatch.setattr(server, "llm_admission", admission(rate_per_minute=1, burst=1))
+    uid = user(seeded, 5)
+    assert (await client.post(f"/api/generate-report/{uid}", headers=auth(uid))).status_code == 200
+    response = await client.post(f"/api/generate-report/{uid}", headers=auth(uid))
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "60"
+
+
+async def test_speech_synthesis_is_admitted(server, client, seeded, monkeypatch):
+    monkeypatch.setattr(server, "llm_admission", admission(rate_per_minute=1, burst=1))
+    uid = user(seeded, 6)
+    speak = lambda text: client.post("/api/voice/speak", json={"text": text}, headers=auth(uid))
+    assert (await speak("admission test one")).status_code == 200
+    # A cache hit costs nothing; a new synthesis is over the user's rate.
+    assert (await speak("admission test one")).json()["cached"]
+    assert (await speak("admission test two")).status_code == 429
+
+
+async def test_report_audio_is_synthesized_within_capacity(server, client, seeded, monkeypatch, tmp_path):
+    monkeypatch.setattr(server, "llm_admission", admission())
+    monkeypatch.setattr(server, "audio_cache", server.AudioCache(tmp_path))
+    uid = user(seeded, 7)
+    report = (await client.post(f"/api/generate-report/{uid}", headers=auth(uid))).json()
+    assert report["action_points"]
+    # One admission for the report itself, one per distinct action point rendered in the background.
+    assert server.llm_admission.stats()["admitted"] == 1 + len(set(report["action_points"]))
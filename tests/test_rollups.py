@@ -0,0 +1,96 @@
+"""Rollups, as served by /analytics, against a direct aggregate of the raw transactions."""
+from collections import defaultdict
+from datetime import date, datetime, timezone
+
+import pytest
+
+from categories import CATEGORY_VALUES
+from rollups import GRANULARITIES, period_start, shift_period, transaction_day
+from tests.conftest import auth
+from tests.datagen import generate_transactions
+from tests.fakes import storage_stand_in
+
+pytestmark = pytest.mark.anyio
+
+PERIODS = {"day": 30, "week": 8, "month": 6, "year": 1}
+
+
+@pytest.fixture(scope="module")
+async def generated(server):
+    """A fresh store behind the app, holding two years of generated transactions
+    applied one at a time, as create_transaction does."""
+    docs = list(generate_transactions(2, 600, days=730, seed=11))
+    store = await storage_stand_in()
+    await store.transactions.insert_many(docs)
+    for doc in docs:
+        await store.rollups.apply(doc["user_id"], doc["date"], doc["category"], doc["amount"])
+    patch = pytest.MonkeyPatch()
+    patch.setattr(server, "store", store)
+    yield store, docs
+    patch.undo()
+    await store.close()
+
+
+def aggregate(docs, user_id, granularity, first: date, last: date):
+    """{period start: {category: total}} straight from the transactions."""
+    buckets = defaultdict(lambda: dict.fromkeys(CATEGORY_VALUES, 0.0))
+    for doc in docs:
+        start = period_start(granularity, transaction_day(doc["date"]))
+        if doc["user_id"] == user_id and first <= start <= last:
+            buckets[start.isoformat()][doc["category"]] += doc["amount"]
+    return buckets
+
+
+def totals_of(buckets):
+    totals = {c: sum(b[c] for b in buckets.values()) for c in CATEGORY_VALUES}
+    return {**totals, "net": totals["sales"] - totals["purchase"] - totals["expense"]}
+
+
+@pytest.mark.parametrize("granularity", GRANULARITIES)
+async def test_analytics_match_direct_aggregate(client, generated, granularity):
+    _, docs = generated
+    user_id = docs[0]["user_id"]
+    count = PERIODS[granularity]
+    response = await client.get(
+        f"/api/analytics/{user_id}", params={"granularity": granularity, "periods": count, "compare": "true"},
+        headers=auth(user_id),
+    )
+    result = response.json()
+    last = period_start(granularity, datetime.now(timezone.utc).date())
+    first = shift_period(granularity, last, -(count - 1))
+
+    current = aggregate(docs, user_id, granularity, first, last)
+    assert [p["start"] for p in result["chart_data"]] == sorted(current)
+    for point in result["chart_data"]:
+        for category in CATEGORY_VALUES:
+            assert point[category] == pytest.approx(current[point["start"]][category], abs=0.01)
+    assert result["totals"] == pytest.approx(totals_of(current), abs=0.01)
+
+    previous_first = shift_period(granularity, first, -count)
+    previous = totals_of(aggregate(docs, user_id, granularity, previous_first, shift_period(granularity, first, -1)))
+    comparison = result["comparison"]
+    assert comparison["previous_start"] == previous_first.isoformat()
+    assert comparison["previous_totals"] == pytest.approx(previous, abs=0.01)
+    assert previous["sales"], "the comparison window must hold data to be a real check"
+    assert comparison["change_pct"]["sales"] == pytest.approx(
+        (result["totals"]["sales"] - previous["sales"]) / abs(previous["sales"]) * 100, abs=0.01,
+    )
+
+
+async def test_create_then_delete_returns_buckets_to_zero(client, generated):
+    store, _ = generated
+    user_id = "rollup-zero"
+    created = (await client.post(
+        "/api/transactions", data={"user_id": user_id, "category": "expense", "amount": "412.5"}, headers=auth(user_id),
+    )).json()
+    day = transaction_day(created["date"])
+    for granularity in GRANULARITIES:
+        rollup = await store.rollups.get(user_id, granularity, period_start(granularity, day))
+        assert (rollup["expense"], rollup["count_expense"]) == (412.5, 1)
+
+    response = await client.delete(f"/api/transactions/{user_id}/{created['id']}", headers=auth(user_id))
+    assert response.status_code == 200
+    for granularity in GRANULARITIES:
+        rollup = await store.rollups.get(user_id, granularity, period_start(granularity, day))
+        assert (rollup.get("expense", 0), rollup.get("count_expense", 0)) == (0, 0)
+    assert (await store.rollups.stats(user_id))["expense"]["n"] == 0
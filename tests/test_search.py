@@ -0,0 +1,94 @@
+"""Prefix search over transaction descriptions, through the API."""
+import pytest
+
+from search import query_tokens, search_tokens, words
+from tests.conftest import auth, user
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_search_pagination(client, seeded):
+    uid = user(seeded, 0)
+    response = await client.get(f"/api/transactions/{uid}/search", params={"q": "बिक्री", "limit": 7}, headers=auth(uid))
+    first = response.json()
+    assert first["results"] and all("बिक्री" in t["description"] for t in first["results"])
+    assert all("search_tokens" not in t for t in first["results"])
+    response = await client.get(f"/api/transactions/{uid}/search", params={"q": "बिक्री", "limit": 7, "cursor": first["next_cursor"]},
+                                headers=auth(uid))
+    second = response.json()["results"]
+    assert {t["id"] for t in first["results"]}.isdisjoint(t["id"] for t in second)
+    assert first["results"][-1]["date"] >= second[0]["date"]
+
+
+def test_devanagari_words_keep_their_marks():
+    # Vowel signs, viramas and nuktas stay inside the word; the danda ends it,
+    # and a zero-width non-joiner does not split it.
+    assert words("कपड़े की बिक्री। Shop\u200cRent") == ["कपड़े", "की", "बिक्री", "shoprent"]
+    # A precomposed nukta letter and its decomposed spelling are the same word.
+    assert words("कप\u095ce") == words("कपड\u093ce")
+
+
+def test_search_tokens_are_word_prefixes():
+    assert search_tokens("बिक्री bill") == sorted({"बि", "बिक", "बिक्", "बिक्र", "बिक्री", "bi", "bil", "bill"})
+    assert query_tokens("ELEC a") == ["elec"]
+
+
+async def search(client, uid, **params):
+    response = await client.get(f"/api/transactions/{uid}/search", params=params, headers=auth(uid))
+    assert response.status_code == 200, response.text
+    return response.json()["results"]
+
+
+@pytest.mark.parametrize("query, word", [("बिक", "बिक्री"), ("बिक्", "बिक्री"), ("थो", "थोक")])
+async def test_devanagari_prefix_query(client, seeded, query, word):
+    uid = user(seeded, 2)
+    results = await search(client, uid, q=query, limit=20)
+    assert results and all(word in t["description"] for t in results)
+
+
+async def test_latin_prefix_query_ignores_case(client, seeded):
+    uid = "search-prefix"
+    for description in ("Electricity bill", "electrician visit", "tea"):
+        form = {"user_id": uid, "category": "expense", "amount": "10", "description": description}
+        await client.post("/api/transactions", data=form, headers=auth(uid))
+    assert {t["description"] for t in await search(client, uid, q="elec")} == {"Electricity bill", "electrician visit"}
+    assert [t["description"] for t in await search(client, uid, q="ELEC bi")] == ["Electricity bill"]
+
+
+async def test_filters(client, seeded):
+    uid = "search-filters"
+    rows = [
+        ("sales", "100", "2026-03-01"), ("sales", "250", "2026-03-05"),
+        ("expense", "250", "2026-03-05"), ("sales", "400", "2026-03-09"),
+    ]
+    for category, amount, day in rows:
+        form = {"user_id": uid, "category": category, "amount": amount, "date": f"{day}T10:00:00+00:00"}
+        await client.post("/api/transactions", data=form, headers=auth(uid))
+
+    def picked(results):
+        return [(t["category"], t["amount"], t["date"][:10]) for t in results]
+
+    assert picked(await search(client, uid, category="बिक्री")) == [
+        ("sales", 400, "2026-03-09"), ("sales", 250, "2026-03-05"), ("sales", 100, "2026-03-01"),
+    ]
+    # date_to is inclusive of the whole day.
+    assert {d for _, _, d in picked(await search(client, uid, date_from="2026-03-05", date_to="2026-03-05"))} == {"2026-03-05"}
+    assert picked(await search(client, uid, amount_min=200, amount_max=300, category="sales")) == [("sales", 250, "2026-03-05")]
+    # Filter-only pages still walk (date, id) without repeats.
+    first = await search(client, uid, limit=2)
+    response = await client.get(f"/api/transactions/{uid}/search", params={"limit": 2}, headers=auth(uid))
+    rest = await search(client, uid, limit=10, cursor=response.json()["next_cursor"])
+    assert len(first) + len(rest) == len(rows) and {t["id"] for t in first}.isdisjoint(t["id"] for t in rest)
+
+
+@pytest.mark.parametrize("params", [
+    {"q": "a"},
+    {"category": "refund"},
+    {"date_from": "yesterday"},
+    {"date_to": "2026-13-01"},
+    {"cursor": "not a cursor"},
+])
+async def test_bad_search_parameters(client, seeded, params):
+    uid = user(seeded, 0)
+    response = await client.get(f"/api/transactions/{uid}/search", params=params, headers=auth(uid))
+    assert response.status_code == 400
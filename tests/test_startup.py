@@ -0,0 +1,51 @@
+"""Worker cold-start budget: importing the app must not load the LLM stack."""
+import json
+import os
+import subprocess
+import sys
+
+from tests.conftest import BACKEND_DIR
+
+IMPORT_BUDGET_SECONDS = float(os.environ.get("STARTUP_IMPORT_BUDGET_SECONDS", "3.0"))
+LLM_STACK = ("emergentintegrations", "litellm", "openai", "google.generativeai", "google.genai")
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import server
+imported = time.perf_counter() - start
+print(json.dumps({"import_seconds": imported, "modules": sorted(sys.modules)}))
+"""
+
+
+def run_probe(*python_flags):
+    result = subprocess.run(
+        [sys.executable, *python_flags, "-c", PROBE],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+def slowest_imports(importtime_log: str, count: int = 10):
+    rows = []
+    for line in importtime_log.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), name.strip()))
+    return sorted(rows, reverse=True)[:count]
+
+
+def test_import_does_not_load_llm_stack():
+    probe, _ = run_probe()
+    loaded = [name for name in LLM_STACK if name in probe["modules"]]
+    assert not loaded, f"importing server loaded the LLM stack: {loaded}"
+
+
+def test_import_time_within_budget():
+    probe, importtime_log = run_probe("-X", "importtime")
+    slowest = "\n".join(f"  {us / 1000:8.1f} ms  {name}" for us, name in slowest_imports(importtime_log))
+    print(f"server import: {probe['import_seconds'] * 1000:.1f} ms\nslowest imports:\n{slowest}")
+    assert probe["import_seconds"] < IMPORT_BUDGET_SECONDS, (
+        f"importing server took {probe['import_seconds']:.2f}s (budget {IMPORT_BUDGET_SECONDS}s); slowest:\n{slowest}"
+    )
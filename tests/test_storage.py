@@ -0,0 +1,130 @@
+"""Both storage backends must answer the same calls with the same documents."""
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from tests.datagen import generate_transactions
+from tests.fakes import storage_stand_in
+from database import ensure_indexes
+from storage import DuplicateKey, TransactionFilter
+from search import query_tokens
+from sync import PENDING_LEASE_SECONDS, settled_version
+
+pytestmark = pytest.mark.anyio
+
+NOW = datetime.now(timezone.utc).date()
+
+
+@pytest.fixture(params=["mongo", "sqlite"])
+async def store(request):
+    store = await storage_stand_in(request.param)
+    if request.param == "mongo":
+        await ensure_indexes(store.db)
+    yield store
+    await store.close()
+
+
+async def test_transactions_and_search(store):
+    docs = list(generate_transactions(3, 300, days=30, seed=7))
+    await store.transactions.insert_many(docs)
+    user_id = docs[0]["user_id"]
+    mine = sorted((d for d in docs if d["user_id"] == user_id), key=lambda d: (d["date"], d["id"]), reverse=True)
+
+    recent = await store.transactions.recent(user_id, 5)
+    assert [t["id"] for t in recent] == [d["id"] for d in mine[:5]]
+    assert all("search_tokens" not in t and "_id" not in t for t in recent)
+
+    criteria = TransactionFilter(tokens=tuple(query_tokens("बिक")), amount_min=1000)
+    expected = [d["id"] for d in mine if "बिक्री" in d["description"] and d["amount"] >= 1000]
+    first = await store.transactions.search(user_id, criteria, 4)
+    criteria.after = (first[-1]["date"], first[-1]["id"])
+    rest = await store.transactions.search(user_id, criteria, 1000)
+    assert [t["id"] for t in first + rest] == expected
+
+
+async def test_rollups_incremental_matches_rebuild(store):
+    docs = list(generate_transactions(2, 200, days=20, seed=3))
+    await store.transactions.insert_many(docs)
+    for doc in docs:
+        await store.rollups.apply(doc["user_id"], doc["date"], doc["category"], doc["amount"])
+    user_id = docs[0]["user_id"]
+    first, last = NOW - timedelta(days=400), NOW + timedelta(days=1)
+
+    incremental = {g: await store.rollups.range(user_id, g, first, last) for g in ("day", "month")}
+    incremental_stats = await store.rollups.stats(user_id)
+    await store.rollups.rebuild()
+    for granularity, rollups in incremental.items():
+        rebuilt = await store.rollups.range(user_id, granularity, first, last)
+        assert [r["start"] for r in rollups] == [r["start"] for r in rebuilt]
+        for a, b in zip(rollups, rebuilt):
+            assert a.get("sales", 0) == pytest.approx(b.get("sales", 0))
+            assert a.get("count_sales", 0) == b.get("count_sales", 0)
+    rebuilt_stats = await store.rollups.stats(user_id)
+    for category, moments in rebuilt_stats.items():
+        if category == "user_id":
+            continue
+        assert incremental_stats[category]["n"] == moments["n"]
+        assert incremental_stats[category]["sumsq"] == pytest.approx(moments["sumsq"])
+
+    day = date.fromisoformat(incremental["day"][0]["start"])
+    assert (await store.rollups.get(user_id, "day", day))["start"] == day.isoformat()
+
+
+async def test_users_and_reports(store):
+    await store.users.insert({"id": "u1", "username": "a", "email": "a@example.com", "password": "pw"})
+    assert (await store.users.get_by_email("a@example.com"))["id"] == "u1"
+    assert await store.users.get_by_email("b@example.com") is None
+    with pytest.raises(DuplicateKey):
+        await store.users.insert({"id": "u2", "username": "b", "email": "a@example.com", "password": "pw"})
+
+    for day in (3, 1, 2):
+        await store.reports.insert({"id": f"r{day}", "user_id": "u1", "date": f"2026-10-0{day}T00:00:00+00:00"})
+    assert [r["id"] for r in await store.reports.recent("u1", 2)] == ["r3", "r2"]
+
+
+async def test_sync_versions_and_deletions(store):
+    assert await store.sync.current("u1") == 0
+    docs = []
+    for i in range(4):
+        doc = next(generate_transactions(1, 1, days=5, seed=i))
+        doc.update(user_id="u1", version=await store.sync.bump("u1"))
+        docs.append(doc)
+        await store.transactions.insert(doc)
+        await store.sync.settle("u1", doc["version"])
+    assert await store.sync.current("u1") == 4
+
+    with pytest.raises(DuplicateKey):
+        await store.transactions.insert(docs[0])
+    assert (await store.transactions.get("u1", docs[1]["id"]))["version"] == 2
+    assert await store.transactions.get("u2", docs[1]["id"]) is None
+
+    assert [t["version"] for t in await store.transactions.changed_since("u1", 1, 2)] == [2, 3]
+    assert (await store.transactions.delete("u1", docs[2]["id"]))["id"] == docs[2]["id"]
+    assert await store.transactions.delete("u1", docs[2]["id"]) is None
+    version = await store.sync.bump("u1")
+    await store.sync.record_deletion("u1", "transactions", docs[2]["id"], version)
+
+    assert [t["version"] for t in await store.transactions.changed_since("u1", 1, 10)] == [2, 4]
+    deletions = await store.sync.deletions_since("u1", 4, 10)
+    assert [(d["kind"], d["id"], d["version"]) for d in deletions] == [("transactions", docs[2]["id"], 5)]
+    assert await store.sync.deletions_since("u1", 5, 10) == []
+
+
+async def test_pending_versions_hold_back_the_settled_version(store):
+    first, second = await store.sync.bump("u1"), await store.sync.bump("u1")
+    assert (first, second) == (1, 2) and await store.sync.current("u1") == 0
+    await store.sync.settle("u1", second)
+    # Version 2 has landed but 1 has not: nothing is settled yet.
+    assert await store.sync.current("u1") == 0
+    await store.sync.settle("u1", first)
+    assert await store.sync.current("u1") == 2
+    assert await store.sync.current("nobody") == 0
+
+
+def test_dead_pending_versions_expire():
+    now = datetime(2026, 10, 19, 12, 0, tzinfo=timezone.utc)
+    live = (now - timedelta(seconds=5)).isoformat()
+    dead = (now - timedelta(seconds=PENDING_LEASE_SECONDS + 1)).isoformat()
+    assert settled_version(9, [(4, live), (6, live)], now) == 3
+    assert settled_version(9, [(4, dead), (6, live)], now) == 5
+    assert settled_version(9, [(4, dead)], now) == 9
@@ -0,0 +1,164 @@
+"""Delta sync through /changes, and the version-based ETags built on it."""
+import asyncio
+
+import pytest
+
+from tests.conftest import auth, user
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_changes(client, seeded):
+    uid = user(seeded, 1)
+    since = (await client.get(f"/api/changes/{uid}", headers=auth(uid))).json()["version"]
+    headers = {**auth(uid), "Idempotency-Key": "sync-retry"}
+    form = {"user_id": uid, "category": "sales", "amount": "40", "description": "retried sale"}
+    created = (await client.post("/api/transactions", data=form, headers=headers)).json()
+    retried = (await client.post("/api/transactions", data=form, headers=headers)).json()
+    assert retried == created
+    other = (await client.post("/api/transactions", data={**form, "amount": "60"}, headers=auth(uid))).json()
+
+    response = await client.delete(f"/api/transactions/{uid}/{other['id']}", headers=auth(uid))
+    assert response.json()["version"] > other["version"] > created["version"] > since
+    assert (await client.delete(f"/api/transactions/{uid}/{other['id']}", headers=auth(uid))).status_code == 404
+
+    changes = (await client.get(f"/api/changes/{uid}", params={"since": since}, headers=auth(uid))).json()
+    assert [t["id"] for t in changes["transactions"]] == [created["id"]]
+    assert changes["deleted"]["transactions"] == [other["id"]]
+    assert changes["version"] == response.json()["version"] and not changes["has_more"]
+    page = (await client.get(f"/api/changes/{uid}", params={"since": since, "limit": 1}, headers=auth(uid))).json()
+    assert page["has_more"] and page["version"] == created["version"]
+
+
+async def test_conditional_get(client, seeded):
+    uid = user(seeded, 3)
+    urls = [f"/api/transactions/{uid}", f"/api/reports/{uid}", f"/api/analytics/{uid}?days=7", f"/api/dashboard/{uid}"]
+    tags = {}
+    for url in urls:
+        response = await client.get(url, headers=auth(uid))
+        tags[url] = response.headers["etag"]
+        revalidated = await client.get(url, headers={**auth(uid), "If-None-Match": tags[url]})
+        assert revalidated.status_code == 304 and revalidated.headers["etag"] == tags[url]
+        assert not revalidated.content
+
+    await client.post("/api/transactions", data={"user_id": uid, "category": "expense", "amount": "30"}, headers=auth(uid))
+    for url in urls:
+        response = await client.get(url, headers={**auth(uid), "If-None-Match": tags[url]})
+        assert response.status_code == 200 and response.headers["etag"] != tags[url]
+        tags[url] = response.headers["etag"]
+
+
+async def test_conditional_get_sees_writes_from_other_workers(server, client, seeded):
+    uid = user(seeded, 7)
+    url = f"/api/transactions/{uid}"
+    tag = (await client.get(url, headers=auth(uid))).headers["etag"]
+    assert server.data_versions.get(uid) is not None
+
+    # Another worker's write: the store moves on, this worker's cache does not.
+    await server.store.sync.settle(uid, await server.store.sync.bump(uid))
+    response = await client.get(url, headers={**auth(uid), "If-None-Match": tag})
+    assert response.status_code == 200 and response.headers["etag"] != tag
+
+
+@pytest.mark.parametrize("path, first, second", [
+    ("transactions", {"limit": 10}, {"limit": 500}),
+    ("reports", {"limit": 10}, {"limit": 30}),
+    ("analytics", {"granularity": "day"}, {"granularity": "month"}),
+    ("analytics", {"periods": 6}, {"periods": 12}),
+    ("analytics", {"compare": "false"}, {"compare": "true"}),
+    ("analytics", {"days": 7}, {"days": 30}),
+])
+async def test_tag_covers_the_query(client, seeded, path, first, second):
+    uid = user(seeded, 5)
+    url = f"/api/{path}/{uid}"
+    tag = (await client.get(url, params=first, headers=auth(uid))).headers["etag"]
+    response = await client.get(url, params=second, headers={**auth(uid), "If-None-Match": tag})
+    assert response.status_code == 200 and response.headers["etag"] != tag
+
+
+async def test_tag_waits_for_pending_writes(server, client, seeded):
+    uid = user(seeded, 6)
+    url = f"/api/transactions/{uid}"
+    tag = (await client.get(url, headers=auth(uid))).headers["etag"]
+    # A version taken but not yet written must not move the tag ahead of the body.
+    version = await server.store.sync.bump(uid)
+    assert (await client.get(url, headers={**auth(uid), "If-None-Match": tag})).status_code == 304
+
+    await server.store.sync.settle(uid, version)
+    assert (await client.get(url, headers={**auth(uid), "If-None-Match": tag})).status_code == 200
+
+async def test_cursor_never_skips_a_version_in_flight(server, client, seeded, monkeypatch):
+    uid = user(seeded, 8)
+    since = (await client.get(f"/api/changes/{uid}", headers=auth(uid))).json()["version"]
+    insert, landed, release = server.store.transactions.insert, asyncio.Event(), asyncio.Event()
+
+    async def stalled_insert(doc):
+        if doc["description"] == "slow":
+            landed.set()
+            await release.wait()
+        await insert(doc)
+
+    monkeypatch.setattr(server.store.transactions, "insert", stalled_insert)
+    form = {"user_id": uid, "category": "sales", "amount": "10"}
+    slow = asyncio.create_task(client.post("/api/transactions", data={**form, "description": "slow"}, headers=auth(uid)))
+    await landed.wait()
+    fast = (await client.post("/api/transactions", data={**form, "description": "fast"}, headers=auth(uid))).json()
+
+    # The later version has landed, the earlier one has not: the cursor must stay put.
+    held = (await client.get(f"/api/changes/{uid}", params={"since": since}, headers=auth(uid))).json()
+    assert held["version"] == since and held["transactions"] == []
+
+    release.set()
+    slow = (await slow).json()
+    assert slow["version"] < fast["version"]
+    changes = (await client.get(f"/api/changes/{uid}", params={"since": held["version"]}, headers=auth(uid))).json()
+    assert [t["version"] for t in changes["transactions"]] == [slow["version"], fast["version"]]
+
+
+async def test_cursor_stops_below_another_workers_pending_version(server, client, seeded):
+    uid = user(seeded, 10)
+    since = (await client.get(f"/api/changes/{uid}", headers=auth(uid))).json()["version"]
+    # Another worker took a version and has not written its record yet.
+    pending = await server.store.sync.bump(uid)
+    later = (await client.post(
+        "/api/transactions", data={"user_id": uid, "category": "sales", "amount": "7"}, headers=auth(uid),
+    )).json()
+    assert later["version"] > pending
+
+    held = (await client.get(f"/api/changes/{uid}", params={"since": since}, headers=auth(uid))).json()
+    assert held["version"] == since and held["transactions"] == []
+
+    await server.store.sync.settle(uid, pending)
+    changes = (await client.get(f"/api/changes/{uid}", params={"since": since}, headers=auth(uid))).json()
+    assert [t["id"] for t in changes["transactions"]] == [later["id"]] and changes["version"] == later["version"]
+
+
+async def test_delete_takes_its_version_before_removing_the_record(server, client, seeded, monkeypatch):
+    uid = user(seeded, 9)
+    created = (await client.post(
+        "/api/transactions", data={"user_id": uid, "category": "expense", "amount": "5"}, headers=auth(uid),
+    )).json()
+    delete, removed, release = server.store.transactions.delete, asyncio.Event(), asyncio.Event()
+
+    async def stalled_delete(user_id, transaction_id):
+        doc = await delete(user_id, transaction_id)
+        removed.set()
+        await release.wait()
+        return doc
+
+    monkeypatch.setattr(server.store.transactions, "delete", stalled_delete)
+    deleting = asyncio.create_task(client.delete(f"/api/transactions/{uid}/{created['id']}", headers=auth(uid)))
+    await removed.wait()
+    later = (await client.post(
+        "/api/transactions", data={"user_id": uid, "category": "expense", "amount": "6"}, headers=auth(uid),
+    )).json()
+    # Record gone, tombstone not written yet: the later write must not move the cursor past the delete.
+    held = (await client.get(f"/api/changes/{uid}", params={"since": created["version"]}, headers=auth(uid))).json()
+    assert held["version"] == created["version"]
+
+    release.set()
+    deleted = (await deleting).json()
+    assert created["version"] < deleted["version"] < later["version"]
+    changes = (await client.get(f"/api/changes/{uid}", params={"since": held["version"]}, headers=auth(uid))).json()
+    assert changes["deleted"]["transactions"] == [created["id"]]
+    assert [t["id"] for t in changes["transactions"]] == [later["id"]] and changes["version"] == later["version"]
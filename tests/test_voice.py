@@ -0,0 +1,95 @@
+"""Voice entry: streaming transcription and cached speech."""
+import asyncio
+
+import pytest
+
+import voice
+from tests.conftest import auth, token, user
+from tests.fakes import websocket_exchange
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_voice_stream(server, seeded):
+    frames = ["आज ५०० ".encode(), "रुपये की ".encode(), "बिक्री हुई".encode(), '{"type": "end"}']
+    result = await websocket_exchange(server.app, "/api/voice/stream", frames, f"user_id={seeded[0]}&access_token={token(seeded[0])}")
+    assert result.close_code == 1000
+    partials = [m["text"] for m in result.messages if m["type"] == "partial"]
+    assert partials[0] == "आज ५००" and len(partials) == 3
+    final = result.messages[-1]
+    assert final["type"] == "final" and final["text"] == "आज ५०० रुपये की बिक्री हुई"
+    assert final["transaction"]["category"] == "sales" and final["transaction"]["amount"] == 500
+
+
+async def test_voice_audio(client, seeded):
+    report = (await client.post(f"/api/generate-report/{user(seeded, 0)}", headers=auth(user(seeded, 0)))).json()
+    assert len(report["action_point_audio"]) == len(report["action_points"])
+    # The report's background task has already filled the cache.
+    spoken = (await client.post("/api/voice/speak", json={"text": report["action_points"][0]}, headers=auth(user(seeded, 0)))).json()
+    assert spoken["cached"] and spoken["audio_url"] == report["action_point_audio"][0]
+
+    url = report["action_point_audio"][0]
+    full = await client.get(url)
+    assert full.status_code == 200 and full.headers["accept-ranges"] == "bytes"
+    partial = await client.get(url, headers={"Range": "bytes=3-12"})
+    assert partial.status_code == 206 and partial.content == full.content[3:13]
+    assert partial.headers["content-range"] == f"bytes 3-12/{len(full.content)}"
+    assert (await client.get(url, headers={"Range": "bytes=-4"})).content == full.content[-4:]
+    assert (await client.get(url, headers={"Range": f"bytes={len(full.content)}-"})).status_code == 416
+    assert (await client.get("/api/voice/audio/not-a-key")).status_code == 404
+
+
+async def test_voice_stream_holds_capacity_only_while_transcribing(server, seeded):
+    in_flight = []
+
+    async def hang_up(messages):
+        in_flight.append(server.llm_admission.in_flight)
+
+    query = f"user_id={seeded[0]}&access_token={token(seeded[0])}"
+    result = await websocket_exchange(server.app, "/api/voice/stream", ["बिक्री ".encode()], query, hang_up=hang_up)
+    assert [m["type"] for m in result.messages] == ["partial"]
+    # The client is still connected but sending nothing: no slot is held for it.
+    assert in_flight == [0]
+
+
+async def test_idle_voice_stream_is_closed(server, seeded, monkeypatch):
+    monkeypatch.setattr(server, "VOICE_IDLE_TIMEOUT", 0.05)
+    query = f"user_id={seeded[0]}&access_token={token(seeded[0])}"
+    result = await websocket_exchange(server.app, "/api/voice/stream", ["आज ".encode()], query)
+    assert result.close_code == 1001
+    assert result.messages[-1] == {"type": "error", "detail": "No audio received"}
+
+
+class BlockingWhisper:
+    """WhisperASR with a transcribe call that waits to be released."""
+
+    def __init__(self):
+        self.started, self.release = asyncio.Event(), asyncio.Event()
+
+    def open(self, language, capacity):
+        return voice.WhisperSession(self, language, capacity)
+
+    async def transcribe(self, audio, language, endpoint):
+        self.started.set()
+        await self.release.wait()
+        return audio.decode()
+
+
+async def test_background_partials_hold_capacity(server, seeded, monkeypatch):
+    backend = BlockingWhisper()
+    monkeypatch.setattr(server, "asr_backend", lambda: backend)
+    monkeypatch.setattr(voice, "PARTIAL_INTERVAL", 0)
+    monkeypatch.setattr(voice, "PARTIAL_MIN_BYTES", 0)
+    in_flight = []
+
+    async def hang_up(messages):
+        await backend.started.wait()
+        # feed() returned long ago; the partial call still runs in the background.
+        in_flight.append(server.llm_admission.in_flight)
+        backend.release.set()
+        await asyncio.sleep(0.01)
+        in_flight.append(server.llm_admission.in_flight)
+
+    query = f"user_id={seeded[0]}&access_token={token(seeded[0])}"
+    await websocket_exchange(server.app, "/api/voice/stream", ["बिक्री".encode()], query, hang_up=hang_up)
+    assert in_flight == [1, 0]